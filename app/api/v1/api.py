@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import trains, sections, decisions, analytics, simulation, health
+from app.api.v1.endpoints import trains, sections, decisions, schedules, analytics, simulation, health, conflicts, state, ingest, live, archive, imports
 
 api_router = APIRouter()
 
@@ -8,5 +8,12 @@ api_router.include_router(health.router, prefix="/health", tags=["health"])
 api_router.include_router(trains.router, prefix="/trains", tags=["trains"])
 api_router.include_router(sections.router, prefix="/sections", tags=["sections"])
 api_router.include_router(decisions.router, prefix="/decisions", tags=["decisions"])
+api_router.include_router(schedules.router, prefix="/schedules", tags=["schedules"])
 api_router.include_router(simulation.router, prefix="/simulation", tags=["simulation"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(conflicts.router, prefix="/conflicts", tags=["conflicts"])
+api_router.include_router(state.router, prefix="/state", tags=["state"])
+api_router.include_router(ingest.router, prefix="/ingest", tags=["ingest"])
+api_router.include_router(live.router, prefix="/live", tags=["live"])
+api_router.include_router(archive.router, prefix="/archive", tags=["archive"])
+api_router.include_router(imports.router, prefix="/import", tags=["import"])
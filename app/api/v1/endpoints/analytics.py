@@ -1,68 +1,92 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
 
-from app.core.database import get_db
-from app.models.train import Train
-from app.models.schedule import Schedule
-from app.models.section import Section
-from app.schemas.analytics import KPIResponse, DashboardResponse
+from app.core.database import get_db, get_async_db, SessionLocal
+from app.schemas.analytics import KPIResponse, DashboardResponse, KPITimeseries, DelayHistogram
+from app.services.monitoring.kpis import kpi_rollup
+from app.services.monitoring.history import kpi_history
 
 router = APIRouter()
 
+def _history_range(start: Optional[datetime], end: Optional[datetime]):
+    """Defaults to the last 24 hours ending now"""
+    end = end or datetime.utcnow()
+    return start or end - timedelta(hours=24), end
+
 @router.get("/kpis", response_model=KPIResponse)
-def get_kpis(db: Session = Depends(get_db)):
-    # Load trains to compute punctuality and delays in Python (SQLite-compatible)
-    trains = db.query(Train).all()
-    total_with_arrival = sum(1 for t in trains if t.scheduled_arrival is not None)
-    on_time = sum(1 for t in trains if t.scheduled_arrival and t.actual_arrival and t.actual_arrival <= t.scheduled_arrival)
-    punctuality_rate = (on_time / total_with_arrival * 100) if total_with_arrival > 0 else 0.0
+async def get_kpis(db: AsyncSession = Depends(get_async_db)):
+    return KPIResponse(**await db.run_sync(kpi_rollup.kpis))
+
+@router.post("/kpis/rebuild")
+def rebuild_kpis(db: Session = Depends(get_db)):
+    """Recompute the KPI rollup from SQL aggregates, e.g. after rows were changed outside the API"""
+    return kpi_rollup.rebuild(db)
 
-    delay_values = []
-    for t in trains:
-        if t.scheduled_arrival and t.actual_arrival:
-            delta_minutes = (t.actual_arrival - t.scheduled_arrival).total_seconds() / 60.0
-            if delta_minutes > 0:
-                delay_values.append(delta_minutes)
-    average_delay = sum(delay_values)/len(delay_values) if delay_values else 0.0
+@router.get("/history/timeseries", response_model=KPITimeseries)
+def history_timeseries(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    section_id: Optional[int] = None,
+    resolution: Optional[str] = Query(None, description="1m, 15m or 1h; picked from the range when omitted"),
+    max_points: int = Query(500, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """Completed schedules per time bucket, for one section or the whole network"""
+    start, end = _history_range(start, end)
+    try:
+        return kpi_history.timeseries(db, start, end, section_id=section_id, resolution=resolution, max_points=max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Section throughput per hour (use schedules completed in last 6 hours)
-    now = datetime.utcnow()
-    window_start = now - timedelta(hours=6)
-    completed_in_window = db.query(Schedule).filter(Schedule.actual_exit.isnot(None), Schedule.actual_exit >= window_start).count()
-    throughput_per_hour = completed_in_window / 6.0
+@router.get("/history/delays", response_model=DelayHistogram)
+def history_delays(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    section_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Histogram of exit delays of schedules completed in the range"""
+    start, end = _history_range(start, end)
+    try:
+        return kpi_history.histogram(db, start, end, section_id=section_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Resource utilization percent (average of section utilization)
-    sections = db.query(Section).all()
-    if sections:
-        utilizations = [s.utilization_percentage for s in sections]
-        resource_utilization = sum(utilizations)/len(utilizations)
-    else:
-        resource_utilization = 0.0
+@router.get("/history/stats")
+def history_stats():
+    return kpi_history.stats()
 
-    # Conflict resolution time seconds (placeholder until implemented)
-    conflict_resolution_time_seconds = 0.0
+@router.post("/history/rebuild")
+def rebuild_history(days: int = Query(7, ge=1, le=3650), db: Session = Depends(get_db)):
+    """Recount the last `days` of history from the schedules table, e.g. after a bulk import"""
+    return kpi_history.rebuild(db, datetime.utcnow() - timedelta(days=days))
 
-    return KPIResponse(
-        punctuality_rate=round(punctuality_rate, 2),
-        average_delay_minutes=round(average_delay, 2),
-        section_throughput_per_hour=round(throughput_per_hour, 2),
-        resource_utilization_percent=round(resource_utilization, 2),
-        conflict_resolution_time_seconds=round(conflict_resolution_time_seconds, 2)
-    )
+def _dashboard_history(start: datetime, end: datetime):
+    # The history flush holds a thread lock across its writes, so it stays off the event loop
+    db = SessionLocal()
+    try:
+        return kpi_history.histogram(db, start, end), kpi_history.timeseries(db, start, end, max_points=96)
+    finally:
+        db.close()
 
 @router.get("/dashboard", response_model=DashboardResponse)
-def get_dashboard(db: Session = Depends(get_db)):
-    kpis = get_kpis(db)
-    # Placeholder charts structure
+async def get_dashboard(db: AsyncSession = Depends(get_async_db)):
+    kpis = await get_kpis(db)
+    start, end = _history_range(None, None)
+    delays, throughput = await asyncio.to_thread(_dashboard_history, start, end)
     charts = {
         "delays_histogram": {
             "type": "histogram",
-            "data": []
+            "data": delays["bins"]
         },
         "throughput_timeseries": {
             "type": "timeseries",
-            "data": []
+            "resolution": throughput["resolution"],
+            "data": throughput["points"]
         }
     }
     return DashboardResponse(kpis=kpis, charts=charts)
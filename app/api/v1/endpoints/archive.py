@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime
+from typing import List, Optional
+
+from app.schemas.archive import ArchiveRows, ArchiveSummary
+from app.services.archive.archiver import archiver
+
+router = APIRouter()
+
+@router.get("/stats")
+def archive_stats():
+    return archiver.stats()
+
+@router.post("/run")
+async def run_archive():
+    """Move eligible rows into the archive now instead of waiting for the next scheduled run."""
+    return await run_in_threadpool(archiver.run)
+
+@router.get("/{table}", response_model=ArchiveRows)
+def query_archive(
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    section_id: Optional[int] = None,
+    train_id: Optional[int] = None,
+    status: Optional[str] = None,
+    columns: Optional[List[str]] = Query(None),
+    limit: int = Query(1000, ge=1, le=100000),
+):
+    """Archived rows of schedules, decisions or audit_logs dated between start and end."""
+    equals = {k: v for k, v in (("train_id", train_id), ("status", status)) if v is not None}
+    try:
+        rows = archiver.query(table, start=start, end=end, section_id=section_id, equals=equals,
+                              columns=columns, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ArchiveRows(table=table, count=len(rows), rows=rows)
+
+@router.get("/{table}/summary", response_model=ArchiveSummary)
+def summarize_archive(
+    table: str,
+    group_by: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    section_id: Optional[int] = None,
+):
+    """Row counts per day, section or any other column; schedules also get delay averages."""
+    try:
+        groups = archiver.summary(table, group_by=group_by, start=start, end=end, section_id=section_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ArchiveSummary(table=table, group_by=group_by, groups=groups)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.core.database import get_db
+from app.schemas.schedule import ConflictReport
+from app.services.monitoring.conflicts import schedule_conflicts, CONFLICT_KINDS
+
+router = APIRouter()
+
+@router.get("/", response_model=ConflictReport)
+def list_conflicts(
+    section_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Current conflicts between active schedule rows, earliest first."""
+    if kind and kind not in CONFLICT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown conflict kind '{kind}'")
+    schedule_conflicts.ensure_loaded(db)
+    conflicts = schedule_conflicts.conflicts(section_id=section_id, kind=kind)
+    return ConflictReport(count=len(conflicts), conflicts=conflicts)
+
+@router.get("/schedules/{schedule_id}", response_model=ConflictReport)
+def schedule_conflict_list(schedule_id: int, db: Session = Depends(get_db)):
+    schedule_conflicts.ensure_loaded(db)
+    conflicts = schedule_conflicts.conflicts(schedule_id=schedule_id)
+    return ConflictReport(count=len(conflicts), conflicts=conflicts)
+
+@router.get("/stats")
+def conflict_stats(db: Session = Depends(get_db)):
+    schedule_conflicts.ensure_loaded(db)
+    return schedule_conflicts.stats()
+
+@router.post("/rebuild")
+def rebuild_conflicts(db: Session = Depends(get_db)):
+    """Reload the index from the database, e.g. after bulk SQL updates to schedules."""
+    return schedule_conflicts.rebuild(db)
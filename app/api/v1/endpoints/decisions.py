@@ -1,29 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+import asyncio
 
-from app.core.database import get_db
-from app.models.train import Train
-from app.models.section import Section
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.decision import Decision, DecisionType, DecisionStatus
-from app.schemas.decision import PrecedenceRequest, DecisionRead, DecisionCreate
+from app.schemas.decision import PrecedenceRequest, CrossingRequest, DecisionRead, DecisionCreate
 from app.services.optimization.heuristic import HeuristicOptimizer
+from app.services.optimization.local_search import LOCAL_SEARCH_METHODS
+from app.services.optimization.crossing import CrossingOptimizer
+from app.services.optimization.corridor import CROSSING_LOOP_CAPACITY
+from app.services.monitoring.live_state import live_state
+from app.utils.pagination import KeysetListing, parse_enum
 
 router = APIRouter()
 
+# Newest first by id, which follows insertion like created_at. created_at itself cannot be a
+# keyset column: its server default is stored without microseconds on SQLite and never
+# compares equal to the bound cursor value
+DECISION_LISTING = KeysetListing(Decision, DecisionRead.model_fields, order=("id",), descending=True)
+
+@router.get("/", response_model=List[Dict[str, Any]])
+async def list_decisions(
+    response: Response,
+    status: Optional[str] = None,
+    decision_type: Optional[str] = None,
+    section_id: Optional[int] = None,
+    train_id: Optional[int] = None,
+    start: Optional[datetime] = Query(None, description="Created at or after"),
+    end: Optional[datetime] = Query(None, description="Created before"),
+    fields: Optional[str] = Query(None, description="Comma separated DecisionRead fields; all when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Decisions newest first; X-Next-Cursor is set when there is another page."""
+    try:
+        filters = []
+        if status:
+            filters.append(Decision.status == parse_enum(DecisionStatus, status))
+        if decision_type:
+            filters.append(Decision.decision_type == parse_enum(DecisionType, decision_type))
+        if section_id is not None:
+            filters.append(Decision.section_id == section_id)
+        if train_id is not None:
+            filters.append(Decision.train_id == train_id)
+        if start:
+            filters.append(Decision.created_at >= start)
+        if end:
+            filters.append(Decision.created_at < end)
+        items, next_cursor = await DECISION_LISTING.page(db, filters, limit, cursor, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
 @router.post("/precedence", response_model=DecisionRead)
-def precedence_decision(payload: PrecedenceRequest, db: Session = Depends(get_db)):
-    section = db.get(Section, payload.section_id)
+async def precedence_decision(payload: PrecedenceRequest, db: AsyncSession = Depends(get_async_db)):
+    state = await live_state.snapshot_async(db)
+    section = state.sections.get(payload.section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    trains = db.query(Train).filter(Train.id.in_(payload.train_ids)).all()
+    trains = state.trains_for(payload.train_ids)
     if not trains:
         raise HTTPException(status_code=400, detail="No valid trains provided")
+    if payload.improvement and payload.improvement not in LOCAL_SEARCH_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown improvement '{payload.improvement}'")
+
+    previous_order = None
+    if payload.previous_decision_id:
+        previous = await db.get(Decision, payload.previous_decision_id)
+        if not previous:
+            raise HTTPException(status_code=404, detail="Previous decision not found")
+        previous_order = HeuristicOptimizer.order_from_details(previous.details)
 
     start_time = payload.current_time or datetime.utcnow()
-    schedule = HeuristicOptimizer.build_schedule(trains, section, start_time)
+    schedule = await asyncio.to_thread(
+        HeuristicOptimizer.build_schedule,
+        trains,
+        section,
+        start_time,
+        previous_order=previous_order,
+        affected_ids=payload.affected_train_ids,
+        improvement=payload.improvement,
+        improvement_budget_ms=payload.improvement_budget_ms or settings.LOCAL_SEARCH_BUDGET_MS,
+    )
     metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
 
     details = {
@@ -41,55 +106,81 @@ def precedence_decision(payload: PrecedenceRequest, db: Session = Depends(get_db
         recommended_by="AI"
     )
     db.add(decision)
-    db.commit()
-    db.refresh(decision)
+    await db.commit()
+    await db.refresh(decision)
     return decision
 
 @router.post("/crossing", response_model=DecisionRead)
-def crossing_decision(payload: PrecedenceRequest, db: Session = Depends(get_db)):
-    section = db.get(Section, payload.section_id)
+async def crossing_decision(payload: CrossingRequest, db: AsyncSession = Depends(get_async_db)):
+    state = await live_state.snapshot_async(db)
+    section = state.sections.get(payload.section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    trains = db.query(Train).filter(Train.id.in_(payload.train_ids)).all()
+    trains = state.trains_for(payload.train_ids)
     if not trains:
         raise HTTPException(status_code=400, detail="No valid trains provided")
 
-    # For a simple heuristic: reuse precedence order as crossing plan
     start_time = payload.current_time or datetime.utcnow()
-    schedule = HeuristicOptimizer.build_schedule(trains, section, start_time)
-
-    details = {
-        "crossing_plan": schedule,
-        "note": "Heuristic crossing plan based on precedence; refine with loop/platform constraints in OR model."
-    }
+    if (section.section_type or "single_line") == "single_line":
+        directions = {}
+        for d in payload.directions or []:
+            if d.direction not in ("up", "down"):
+                raise HTTPException(status_code=400, detail=f"Unknown direction '{d.direction}'")
+            directions[d.train_id] = 1 if d.direction == "up" else -1
+
+        res = await asyncio.to_thread(
+            CrossingOptimizer.optimize,
+            trains,
+            section,
+            start_time,
+            directions=directions,
+            headway_minutes=payload.headway_minutes or 2.0,
+            loop_count=payload.loop_count if payload.loop_count is not None else CROSSING_LOOP_CAPACITY,
+            platform_loops=payload.platform_loops,
+            time_limit_seconds=payload.time_limit_seconds or 1.0,
+        )
+        details = {
+            "crossing_plan": res["crossing_plan"],
+            "crossings": res["crossings"],
+            "metrics": res["metrics"],
+        }
+        explanation = "Crossing plan for opposing trains using the crossing station loops, platforms and train loop eligibility."
+    else:
+        # Directions run on separate lines, so the precedence order is the crossing plan
+        schedule = await asyncio.to_thread(HeuristicOptimizer.build_schedule, trains, section, start_time)
+        details = {
+            "crossing_plan": schedule,
+            "note": "Section is not single line; crossing plan follows the precedence order."
+        }
+        explanation = "Crossing plan derived from precedence and section constraints."
 
     decision = Decision(
         decision_type=DecisionType.CROSSING,
         status=DecisionStatus.RECOMMENDED,
         section_id=section.id,
         details=details,
-        explanation="Crossing plan derived from precedence and section constraints.",
+        explanation=explanation,
         recommended_by="AI"
     )
     db.add(decision)
-    db.commit()
-    db.refresh(decision)
+    await db.commit()
+    await db.refresh(decision)
     return decision
 
 @router.put("/{decision_id}/approve", response_model=DecisionRead)
-def approve_decision(decision_id: int, db: Session = Depends(get_db)):
-    decision = db.get(Decision, decision_id)
+async def approve_decision(decision_id: int, db: AsyncSession = Depends(get_async_db)):
+    decision = await db.get(Decision, decision_id)
     if not decision:
         raise HTTPException(status_code=404, detail="Decision not found")
     decision.status = DecisionStatus.APPROVED
-    db.commit()
-    db.refresh(decision)
+    await db.commit()
+    await db.refresh(decision)
     return decision
 
 @router.put("/{decision_id}/override", response_model=DecisionRead)
-def override_decision(decision_id: int, payload: DecisionCreate, db: Session = Depends(get_db)):
-    decision = db.get(Decision, decision_id)
+async def override_decision(decision_id: int, payload: DecisionCreate, db: AsyncSession = Depends(get_async_db)):
+    decision = await db.get(Decision, decision_id)
     if not decision:
         raise HTTPException(status_code=404, detail="Decision not found")
 
@@ -102,6 +193,6 @@ def override_decision(decision_id: int, payload: DecisionCreate, db: Session = D
         decision.explanation = payload.explanation
 
     decision.status = DecisionStatus.OVERRIDDEN
-    db.commit()
-    db.refresh(decision)
+    await db.commit()
+    await db.refresh(decision)
     return decision
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.core.database import get_db, get_redis
 from app.core.config import settings
+from app.utils.audit import audit_writer
 import time
 import psutil
 from datetime import datetime
@@ -54,7 +55,8 @@ async def detailed_health_check(db: Session = Depends(get_db)):
         "response_time_ms": round(response_time, 2),
         "components": {
             "database": db_status,
-            "redis": redis_status
+            "redis": redis_status,
+            "audit_writer": audit_writer.stats()
         },
         "system_metrics": {
             "cpu_percent": cpu_percent,
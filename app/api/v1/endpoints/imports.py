@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.schemas.imports import ImportResult
+from app.services.ingest.bulk import BulkImport, detect_format, read_batches
+from app.utils.audit import record_audit
+
+router = APIRouter()
+
+@router.post("/{entity}", response_model=ImportResult)
+async def bulk_import(
+    entity: str,
+    request: Request,
+    format: Optional[str] = Query(None, description="csv, jsonl or arrow; taken from Content-Type when omitted"),
+    atomic: bool = Query(False, description="Reject the whole import if any row is invalid"),
+    db: Session = Depends(get_db),
+):
+    """
+    Upsert trains (keyed on train_number), sections (section_code) or schedules
+    (train_number, section_code, planned_entry) from a CSV, JSON-lines or Arrow IPC body.
+    """
+    try:
+        fmt = detect_format(format, request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    try:
+        job = BulkImport(db, entity, atomic=atomic)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        async for batch in read_batches(fmt, request.stream(), settings.IMPORT_BATCH_SIZE):
+            await run_in_threadpool(job.add_batch, batch)
+        summary = await run_in_threadpool(job.finish)
+    except ValueError as e:
+        await run_in_threadpool(job.abort)
+        raise HTTPException(status_code=400, detail={"message": str(e), **job.summary()})
+
+    record_audit(
+        action="bulk_import",
+        entity_type=job.spec.entity_type,
+        details={k: v for k, v in summary.items() if k != "errors"},
+        ip_address=(request.client.host if request.client else None),
+        user_agent=request.headers.get("User-Agent"),
+    )
+    return ImportResult(format=fmt, **summary)
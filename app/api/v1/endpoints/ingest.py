@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+
+from app.schemas.ingest import PositionBatch, PositionBatchAccepted
+from app.services.ingest.pipeline import position_ingest
+
+router = APIRouter()
+
+@router.post("/positions", response_model=PositionBatchAccepted)
+async def push_positions(payload: PositionBatch):
+    """Queue a batch of position reports for the ingest pipeline; 429 when the queue is full."""
+    if not position_ingest.running:
+        await position_ingest.start()
+    reports = [p.model_dump(mode="json", exclude_none=True) for p in payload.positions]
+    accepted = position_ingest.offer(reports)
+    if accepted < len(reports):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Ingest queue is full; accepted {accepted} of {len(reports)} reports",
+        )
+    return PositionBatchAccepted(accepted=accepted, queue_depth=position_ingest.stats()["queue_depth"])
+
+@router.get("/stats")
+async def ingest_stats():
+    return position_ingest.stats()
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+
+from app.core.config import settings
+from app.services.monitoring.broadcast import live_broadcaster, RESYNC
+
+router = APIRouter()
+
+@router.websocket("/ws")
+async def live_websocket(websocket: WebSocket):
+    """
+    Push channel: a "snapshot" message on connect, then "diff" messages with changed trains,
+    sections, holds, new or updated decisions, conflict changes and KPI deltas. A client that
+    falls behind is sent a fresh snapshot. Idle connections get a "ping" every WEBSOCKET_TIMEOUT.
+    """
+    await websocket.accept()
+    subscriber = await live_broadcaster.subscribe()
+
+    async def push():
+        await websocket.send_text(live_broadcaster.snapshot_message())
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), settings.WEBSOCKET_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.send_text('{"type":"ping"}')
+                continue
+            await websocket.send_text(live_broadcaster.snapshot_message() if message is RESYNC else message)
+
+    pusher = asyncio.create_task(push())
+    try:
+        # Client messages are ignored; receiving notices the disconnect straight away
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pusher.cancel()
+        live_broadcaster.unsubscribe(subscriber)
+
+@router.get("/stream")
+async def live_stream(request: Request):
+    """The same messages as /ws as server-sent events, for clients without WebSocket."""
+    subscriber = await live_broadcaster.subscribe()
+
+    async def event_stream():
+        try:
+            yield f"event: snapshot\ndata: {live_broadcaster.snapshot_message()}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), settings.WEBSOCKET_TIMEOUT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is RESYNC:
+                    yield f"event: snapshot\ndata: {live_broadcaster.snapshot_message()}\n\n"
+                else:
+                    yield f"event: diff\ndata: {message}\n\n"
+        finally:
+            live_broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/stats")
+async def live_stats():
+    return live_broadcaster.stats()
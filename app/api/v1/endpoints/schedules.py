@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.models.schedule import Schedule, ScheduleStatus
+from app.schemas.schedule import ScheduleRead
+from app.utils.pagination import KeysetListing, parse_enum
+
+router = APIRouter()
+
+SCHEDULE_LISTING = KeysetListing(Schedule, ScheduleRead.model_fields, order=("planned_entry", "id"))
+
+@router.get("/", response_model=List[Dict[str, Any]])
+async def list_schedules(
+    response: Response,
+    status: Optional[str] = None,
+    section_id: Optional[int] = None,
+    train_id: Optional[int] = None,
+    start: Optional[datetime] = Query(None, description="Planned entry at or after"),
+    end: Optional[datetime] = Query(None, description="Planned entry before"),
+    fields: Optional[str] = Query(None, description="Comma separated ScheduleRead fields; all when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Schedule rows by planned entry; X-Next-Cursor is set when there is another page."""
+    try:
+        filters = []
+        if status:
+            filters.append(Schedule.status == parse_enum(ScheduleStatus, status))
+        if section_id is not None:
+            filters.append(Schedule.section_id == section_id)
+        if train_id is not None:
+            filters.append(Schedule.train_id == train_id)
+        if start:
+            filters.append(Schedule.planned_entry >= start)
+        if end:
+            filters.append(Schedule.planned_entry < end)
+        items, next_cursor = await SCHEDULE_LISTING.page(db, filters, limit, cursor, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
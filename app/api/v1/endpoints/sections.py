@@ -1,59 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.section import Section
 from app.schemas.section import SectionCreate, SectionRead, SectionUpdate
 from app.utils.audit import record_audit
+from app.utils.pagination import KeysetListing
 
 router = APIRouter()
 
+SECTION_LISTING = KeysetListing(Section, SectionRead.model_fields, order=("id",))
+
 @router.get("/ping")
 async def ping_sections():
     return {"module": "sections", "status": "ok"}
 
-@router.get("/", response_model=List[SectionRead])
-def list_sections(db: Session = Depends(get_db)):
-    return db.query(Section).all()
+@router.get("/", response_model=List[Dict[str, Any]])
+async def list_sections(
+    response: Response,
+    section_type: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Comma separated SectionRead fields; all when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Sections in id order; X-Next-Cursor is set when there is another page."""
+    filters = []
+    if section_type:
+        filters.append(Section.section_type == section_type)
+    if is_active is not None:
+        filters.append(Section.is_active == is_active)
+    try:
+        items, next_cursor = await SECTION_LISTING.page(db, filters, limit, cursor, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.post("/", response_model=SectionRead)
-def create_section(payload: SectionCreate, db: Session = Depends(get_db), request: Request = None):
+async def create_section(payload: SectionCreate, db: AsyncSession = Depends(get_async_db), request: Request = None):
     # Ensure unique section_code
-    existing = db.query(Section).filter(Section.section_code == payload.section_code).first()
+    existing = await db.scalar(select(Section).where(Section.section_code == payload.section_code).limit(1))
     if existing:
         raise HTTPException(status_code=400, detail="Section code already exists")
 
     section = Section(**payload.dict())
     db.add(section)
-    db.commit()
-    db.refresh(section)
-
-    try:
-        record_audit(
-            db,
-            action="create",
-            entity_type="section",
-            entity_id=section.id,
-            details={"section_code": section.section_code},
-            ip_address=(request.client.host if request and request.client else None),
-            user_agent=(request.headers.get("User-Agent") if request else None)
-        )
-    except Exception:
-        pass
+    await db.commit()
+    await db.refresh(section)
+
+    record_audit(
+        action="create",
+        entity_type="section",
+        entity_id=section.id,
+        details={"section_code": section.section_code},
+        ip_address=(request.client.host if request and request.client else None),
+        user_agent=(request.headers.get("User-Agent") if request else None)
+    )
 
     return section
 
 @router.get("/{section_id}", response_model=SectionRead)
-def get_section(section_id: int, db: Session = Depends(get_db)):
-    section = db.get(Section, section_id)
+async def get_section(section_id: int, db: AsyncSession = Depends(get_async_db)):
+    section = await db.get(Section, section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
     return section
 
 @router.put("/{section_id}", response_model=SectionRead)
-def update_section(section_id: int, payload: SectionUpdate, db: Session = Depends(get_db), request: Request = None):
-    section = db.get(Section, section_id)
+async def update_section(section_id: int, payload: SectionUpdate, db: AsyncSession = Depends(get_async_db), request: Request = None):
+    section = await db.get(Section, section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
@@ -61,43 +82,35 @@ def update_section(section_id: int, payload: SectionUpdate, db: Session = Depend
     for k, v in data.items():
         setattr(section, k, v)
 
-    db.commit()
-    db.refresh(section)
+    await db.commit()
+    await db.refresh(section)
 
-    try:
-        record_audit(
-            db,
-            action="update",
-            entity_type="section",
-            entity_id=section.id,
-            details=data,
-            ip_address=(request.client.host if request and request.client else None),
-            user_agent=(request.headers.get("User-Agent") if request else None)
-        )
-    except Exception:
-        pass
+    record_audit(
+        action="update",
+        entity_type="section",
+        entity_id=section.id,
+        details=data,
+        ip_address=(request.client.host if request and request.client else None),
+        user_agent=(request.headers.get("User-Agent") if request else None)
+    )
 
     return section
 
 @router.delete("/{section_id}")
-def delete_section(section_id: int, db: Session = Depends(get_db), request: Request = None):
-    section = db.get(Section, section_id)
+async def delete_section(section_id: int, db: AsyncSession = Depends(get_async_db), request: Request = None):
+    section = await db.get(Section, section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
-    db.delete(section)
-    db.commit()
-
-    try:
-        record_audit(
-            db,
-            action="delete",
-            entity_type="section",
-            entity_id=section_id,
-            details=None,
-            ip_address=(request.client.host if request and request.client else None),
-            user_agent=(request.headers.get("User-Agent") if request else None)
-        )
-    except Exception:
-        pass
+    await db.delete(section)
+    await db.commit()
+
+    record_audit(
+        action="delete",
+        entity_type="section",
+        entity_id=section_id,
+        details=None,
+        ip_address=(request.client.host if request and request.client else None),
+        user_agent=(request.headers.get("User-Agent") if request else None)
+    )
 
     return {"status": "deleted", "id": section_id}
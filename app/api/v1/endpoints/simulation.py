@@ -1,28 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict
+from typing import Dict, Optional
 from datetime import datetime
+import asyncio
+import json
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.train import Train
 from app.models.section import Section
-from app.schemas.simulation import WhatIfScenario, SimulationResult
+from app.models.schedule import Schedule
+from app.models.decision import Decision
+from app.schemas.simulation import (
+    WhatIfScenario, SimulationResult, MonteCarloScenario, MonteCarloResult, ReplayRequest, ReplayResult,
+    SweepRequest,
+)
 from app.services.optimization.heuristic import HeuristicOptimizer
+from app.services.optimization.local_search import LOCAL_SEARCH_METHODS
+from app.services.simulation.monte_carlo import MonteCarloSimulator
+from app.services.simulation.engine import SimulationEngine
+from app.services.simulation.sweep import ScenarioSweep, RANK_METRICS
+from app.services.optimization.jobs import solver_jobs
+from app.services.optimization.cache import optimization_cache
+from app.services.monitoring.live_state import live_state
 
 router = APIRouter()
 
+# How often a sweep retries submitting while other jobs keep the solver queue full
+SWEEP_RETRY_SECONDS = 0.25
+
+def _section_speed_limit(scenario: WhatIfScenario) -> Optional[int]:
+    for sr in scenario.speed_restrictions or []:
+        if sr.section_id == scenario.section_id:
+            return sr.max_speed_limit
+    return None
+
 @router.post("/what-if", response_model=SimulationResult)
-def run_what_if(scenario: WhatIfScenario, db: Session = Depends(get_db)):
-    section = db.get(Section, scenario.section_id)
+def run_what_if(scenario: WhatIfScenario, response: Response, db: Session = Depends(get_db)):
+    state = live_state.snapshot(db)
+    section = state.sections.get(scenario.section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    trains = db.query(Train).filter(Train.id.in_(scenario.train_ids)).all()
+    trains = state.trains_for(scenario.train_ids)
     if not trains:
         raise HTTPException(status_code=400, detail="No valid trains provided")
+    if scenario.improvement and scenario.improvement not in LOCAL_SEARCH_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown improvement '{scenario.improvement}'")
+
+    start_time = scenario.start_time or datetime.utcnow()
 
-    # Build holds dict
-    holds: Dict[int, int] = {}
+    # Build holds dict: active holds from the live state, overridden by the scenario
+    holds: Dict[int, int] = state.holds_minutes(start_time)
     if scenario.holds:
         for h in scenario.holds:
             holds[h.train_id] = h.hold_minutes
@@ -35,15 +65,220 @@ def run_what_if(scenario: WhatIfScenario, db: Session = Depends(get_db)):
                 section_speed_limit = sr.max_speed_limit
                 break
 
+    improvement_budget_ms = scenario.improvement_budget_ms or settings.LOCAL_SEARCH_BUDGET_MS
+
+    def solve():
+        schedule = HeuristicOptimizer.build_schedule(
+            trains,
+            section,
+            start_time=start_time,
+            holds=holds,
+            section_speed_limit=section_speed_limit,
+            improvement=scenario.improvement,
+            improvement_budget_ms=improvement_budget_ms,
+        )
+        return {"schedule": schedule, "metrics": HeuristicOptimizer.metrics_from_schedule(schedule)}
+
+    key, tags = optimization_cache.problem_key(
+        "what_if", trains, section, start_time,
+        holds=holds, section_speed_limit=section_speed_limit,
+        improvement=scenario.improvement, improvement_budget_ms=improvement_budget_ms,
+    )
+    result, response.headers["X-Cache"] = optimization_cache.get_or_compute(key, tags, solve, start_time)
+    return SimulationResult(**result)
+
+@router.post("/what-if/monte-carlo", response_model=MonteCarloResult)
+def run_what_if_monte_carlo(scenario: MonteCarloScenario, db: Session = Depends(get_db)):
+    state = live_state.snapshot(db)
+    section = state.sections.get(scenario.section_id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    trains = state.trains_for(scenario.train_ids)
+    if not trains:
+        raise HTTPException(status_code=400, detail="No valid trains provided")
+    if scenario.scenarios > settings.MONTE_CARLO_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MONTE_CARLO_MAX_SCENARIOS} scenarios per run")
+
     start_time = scenario.start_time or datetime.utcnow()
+    holds: Dict[int, int] = state.holds_minutes(start_time)
+    holds.update({h.train_id: h.hold_minutes for h in scenario.holds or []})
+    section_speed_limit = _section_speed_limit(scenario)
 
-    schedule = HeuristicOptimizer.build_schedule(
+    return MonteCarloSimulator.run(
         trains,
         section,
         start_time=start_time,
         holds=holds,
         section_speed_limit=section_speed_limit,
+        scenarios=scenario.scenarios,
+        delay_probability=scenario.delay_probability,
+        delay_mean_minutes=scenario.delay_mean_minutes,
+        speed_restriction_probability=scenario.speed_restriction_probability,
+        speed_restriction_kmh=scenario.speed_restriction_kmh,
+        dwell_mean_minutes=scenario.dwell_mean_minutes,
+        seed=scenario.seed,
+    )
+
+@router.post("/what-if/sweep")
+def run_what_if_sweep(payload: SweepRequest, db: Session = Depends(get_db)):
+    """
+    Evaluate many what-if variants on the solver process pool and stream server-sent events:
+    one "scenario" event per finished variant with its current rank, then a "done" event
+    with the final ranking. At most max_workers variants of a sweep are on the shared solver
+    queue at a time; the next one is submitted as each finishes, so a large sweep neither
+    fills the queue nor starves other solver jobs.
+    """
+    state = live_state.snapshot(db)
+    section = state.sections.get(payload.section_id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    trains = state.trains_for(payload.train_ids)
+    if not trains:
+        raise HTTPException(status_code=400, detail="No valid trains provided")
+    if payload.improvement and payload.improvement not in LOCAL_SEARCH_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown improvement '{payload.improvement}'")
+    if payload.rank_by not in RANK_METRICS:
+        raise HTTPException(status_code=400, detail=f"Cannot rank by '{payload.rank_by}'")
+
+    start_time = payload.start_time or datetime.utcnow()
+    base_holds = state.holds_minutes(start_time)
+    base_holds.update({h.train_id: h.hold_minutes for h in payload.holds or []})
+    scenarios = ScenarioSweep.expand(
+        base_holds,
+        _section_speed_limit(payload),
+        variants=[
+            {
+                "name": v.name,
+                "holds": {h.train_id: h.hold_minutes for h in v.holds or []},
+                "section_speed_limit": v.section_speed_limit,
+            }
+            for v in payload.variants or []
+        ],
+        grid_holds=payload.grid.holds if payload.grid else None,
+        grid_speed_limits=payload.grid.section_speed_limits if payload.grid else None,
+    )
+    if not scenarios:
+        raise HTTPException(status_code=400, detail="No variants or grid provided")
+    if len(scenarios) > settings.SWEEP_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SWEEP_MAX_SCENARIOS} scenarios per sweep")
+
+    # Trains and section are read once and shipped to the workers with each variant
+    def submit(scenario):
+        return solver_jobs.submit("what_if", dict(
+            trains=trains,
+            section=section,
+            start_time=start_time,
+            holds=scenario["holds"],
+            section_speed_limit=scenario["section_speed_limit"],
+            improvement=payload.improvement,
+            improvement_budget_ms=payload.improvement_budget_ms or settings.LOCAL_SEARCH_BUDGET_MS,
+        ))
+
+    waiting = list(reversed(scenarios))
+    first = []
+    try:
+        while waiting and len(first) < solver_jobs.max_workers:
+            first.append((waiting[-1], submit(waiting[-1])))
+            waiting.pop()
+    except OverflowError as e:
+        for _, job in first:
+            solver_jobs.cancel(job.job_id)
+        raise HTTPException(status_code=429, detail=str(e))
+
+    async def event_stream():
+        pending = {asyncio.wrap_future(job.future): (scenario, job) for scenario, job in first}
+        finished = []
+        failed = 0
+        try:
+            while pending or waiting:
+                # Top up to max_workers in flight; when other jobs fill the queue, wait for
+                # one of ours to finish, or poll when none is in flight
+                try:
+                    while waiting and len(pending) < solver_jobs.max_workers:
+                        job = submit(waiting[-1])
+                        pending[asyncio.wrap_future(job.future)] = (waiting.pop(), job)
+                except OverflowError:
+                    if not pending:
+                        await asyncio.sleep(SWEEP_RETRY_SECONDS)
+                        continue
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    scenario, job = pending.pop(future)
+                    event = {
+                        "name": scenario["name"],
+                        "holds": scenario["holds"],
+                        "section_speed_limit": scenario["section_speed_limit"],
+                        "job_id": job.job_id,
+                    }
+                    if future.cancelled() or future.exception() is not None:
+                        failed += 1
+                        event["error"] = "cancelled" if future.cancelled() else str(future.exception())
+                        yield f"event: failed\ndata: {json.dumps(event)}\n\n"
+                        continue
+                    event["metrics"] = future.result()["result"]["metrics"]
+                    finished.append(event)
+                    ranking = ScenarioSweep.rank(finished, payload.rank_by)
+                    rank = next(r["rank"] for r in ranking if r["job_id"] == job.job_id)
+                    progress = {"rank": rank, "completed": len(finished) + failed, "total": len(scenarios)}
+                    yield f"event: scenario\ndata: {json.dumps({**event, **progress})}\n\n"
+            done_event = {"rank_by": payload.rank_by, "ranking": ScenarioSweep.rank(finished, payload.rank_by), "failed": failed}
+            yield f"event: done\ndata: {json.dumps(done_event)}\n\n"
+        finally:
+            # Client went away or the sweep ended: drop whatever has not started yet
+            for _, job in pending.values():
+                if not job.future.done():
+                    solver_jobs.cancel(job.job_id)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/replay", response_model=ReplayResult)
+def replay_schedules(payload: ReplayRequest, db: Session = Depends(get_db)):
+    """Replay timetabled Schedule rows through the discrete-event engine under a dispatch policy."""
+    if payload.end_time <= payload.start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+
+    query = db.query(Section)
+    if payload.section_ids:
+        query = query.filter(Section.id.in_(payload.section_ids))
+    sections = query.all()
+    if not sections:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    policy = payload.policy or "fifo"
+    if payload.decision_id:
+        decision = db.get(Decision, payload.decision_id)
+        if not decision:
+            raise HTTPException(status_code=404, detail="Decision not found")
+        order = HeuristicOptimizer.order_from_details(decision.details)
+        policy = {tid: rank for rank, tid in enumerate(order)}
+
+    schedules = (
+        db.query(Schedule)
+        .filter(
+            Schedule.section_id.in_([s.id for s in sections]),
+            Schedule.planned_entry >= payload.start_time,
+            Schedule.planned_entry < payload.end_time,
+        )
+        .all()
     )
-    metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+    by_train: Dict[int, list] = {}
+    for row in schedules:
+        by_train.setdefault(row.train_id, []).append(row)
+    trains = db.query(Train).filter(Train.id.in_(list(by_train))).all() if by_train else []
 
-    return SimulationResult(schedule=schedule, metrics=metrics)
+    try:
+        engine = SimulationEngine(
+            sections,
+            payload.start_time,
+            headway_minutes=payload.headway_minutes or 2.0,
+            policy=policy,
+            horizon_days=max(1, (payload.end_time - payload.start_time).days + 1),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for train in trains:
+        engine.add_train(train, by_train[train.id])
+    res = engine.run()
+    return ReplayResult(metrics=res["metrics"], trains=res["trains"] if payload.include_trains else None)
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from app.core.database import get_db
+from app.schemas.state import HoldSet, HoldRead, TrainPosition, NetworkStateRead
+from app.services.monitoring.live_state import live_state
+
+router = APIRouter()
+
+@router.get("/", response_model=NetworkStateRead)
+def get_network_state(db: Session = Depends(get_db)):
+    state = live_state.snapshot(db)
+    return NetworkStateRead(
+        version=state.version,
+        taken_at=state.taken_at,
+        trains=len(state.trains),
+        trains_on_sections=sum(1 for t in state.trains.values() if t.occupies_section),
+        holds=[HoldRead(train_id=tid, held_until=until) for tid, until in state.holds.items()],
+        sections=[
+            {
+                "section_id": s.id,
+                "section_code": s.section_code,
+                "current_occupancy": s.current_occupancy,
+                "max_trains_per_hour": s.max_trains_per_hour,
+                "utilization_percentage": round(s.utilization_percentage, 2),
+                "is_congested": s.is_congested,
+            }
+            for s in state.sections.values()
+        ],
+    )
+
+@router.get("/trains/{train_id}", response_model=TrainPosition)
+def get_train_position(train_id: int, db: Session = Depends(get_db)):
+    state = live_state.snapshot(db)
+    train = state.trains.get(train_id)
+    if not train:
+        raise HTTPException(status_code=404, detail="Train not found")
+    return TrainPosition(
+        train_id=train.id,
+        train_number=train.train_number,
+        status=train.status.value if train.status else None,
+        current_section_id=train.current_section_id,
+        current_position_km=train.current_position_km,
+        held_until=state.holds.get(train.id),
+    )
+
+@router.put("/holds/{train_id}", response_model=HoldRead)
+def set_hold(train_id: int, payload: HoldSet, db: Session = Depends(get_db)):
+    """Hold a train; optimizers and what-if runs apply active holds unless the request overrides them."""
+    live_state.ensure_loaded(db)
+    until = (payload.from_time or datetime.utcnow()) + timedelta(minutes=payload.hold_minutes)
+    if not live_state.set_hold(train_id, until):
+        raise HTTPException(status_code=404, detail="Train not found")
+    return HoldRead(train_id=train_id, held_until=until)
+
+@router.delete("/holds/{train_id}")
+def clear_hold(train_id: int, db: Session = Depends(get_db)):
+    live_state.ensure_loaded(db)
+    if not live_state.clear_hold(train_id):
+        raise HTTPException(status_code=404, detail="Hold not found")
+    return {"status": "released", "train_id": train_id}
+
+@router.post("/rebuild")
+def rebuild_state(db: Session = Depends(get_db)):
+    """Reload trains and sections from the database, e.g. after bulk SQL updates."""
+    return live_state.rebuild(db)
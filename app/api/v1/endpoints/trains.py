@@ -1,29 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import asyncio
+import json
+import uuid
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.train import Train, TrainType, TrainStatus, Priority
-from app.models.section import Section
+from app.models.decision import Decision
 from app.schemas.train import TrainCreate, TrainRead, TrainUpdate
 from app.schemas.decision import PrecedenceRequest
-from app.schemas.optimization import OROptimizeRequest, OROptimizeResult
+from app.schemas.optimization import (
+    OROptimizeRequest, OROptimizeResult, RollingHorizonRequest, SolverJobRead, SolverQueueMetrics,
+    AnytimeOptimizeRequest, CorridorOptimizeRequest,
+)
 from app.services.optimization.heuristic import HeuristicOptimizer
-from app.services.optimization.or_linear import ORLinearOptimizer
+from app.services.optimization.or_linear import ORLinearOptimizer, FORMULATIONS
+from app.services.optimization.rolling_horizon import RollingHorizonOptimizer
+from app.services.optimization.jobs import solver_jobs
+from app.services.optimization.anytime import AnytimeOptimizer
+from app.services.optimization.corridor import CorridorOptimizer
+from app.services.optimization.cache import optimization_cache
+from app.services.monitoring.live_state import live_state
 from app.utils.audit import record_audit
+from app.utils.pagination import KeysetListing, parse_enum
 
 router = APIRouter()
 
+TRAIN_LISTING = KeysetListing(Train, TrainRead.model_fields, order=("id",))
+
 @router.get("/ping")
 async def ping_trains():
     return {"module": "trains", "status": "ok"}
 
-@router.get("/", response_model=List[TrainRead])
-def list_trains(db: Session = Depends(get_db)):
-    return db.query(Train).all()
+@router.get("/", response_model=List[Dict[str, Any]])
+async def list_trains(
+    response: Response,
+    status: Optional[str] = None,
+    train_type: Optional[str] = None,
+    section_id: Optional[int] = Query(None, description="Trains currently in this section"),
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma separated TrainRead fields; all when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Trains in id order; X-Next-Cursor is set when there is another page."""
+    try:
+        filters = []
+        if status:
+            filters.append(Train.status == parse_enum(TrainStatus, status))
+        if train_type:
+            filters.append(Train.train_type == parse_enum(TrainType, train_type))
+        if section_id is not None:
+            filters.append(Train.current_section_id == section_id)
+        if departure_from:
+            filters.append(Train.scheduled_departure >= departure_from)
+        if departure_to:
+            filters.append(Train.scheduled_departure < departure_to)
+        items, next_cursor = await TRAIN_LISTING.page(db, filters, limit, cursor, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.post("/", response_model=TrainRead)
-def create_train(payload: TrainCreate, db: Session = Depends(get_db), request: Request = None):
+async def create_train(payload: TrainCreate, db: AsyncSession = Depends(get_async_db), request: Request = None):
     try:
         train = Train(
             train_number=payload.train_number,
@@ -46,34 +94,30 @@ def create_train(payload: TrainCreate, db: Session = Depends(get_db), request: R
         raise HTTPException(status_code=400, detail=str(e))
 
     db.add(train)
-    db.commit()
-    db.refresh(train)
+    await db.commit()
+    await db.refresh(train)
 
-    try:
-        record_audit(
-            db,
-            action="create",
-            entity_type="train",
-            entity_id=train.id,
-            details={"train_number": train.train_number},
-            ip_address=(request.client.host if request and request.client else None),
-            user_agent=(request.headers.get("User-Agent") if request else None)
-        )
-    except Exception:
-        pass
+    record_audit(
+        action="create",
+        entity_type="train",
+        entity_id=train.id,
+        details={"train_number": train.train_number},
+        ip_address=(request.client.host if request and request.client else None),
+        user_agent=(request.headers.get("User-Agent") if request else None)
+    )
 
     return train
 
 @router.get("/{train_id}", response_model=TrainRead)
-def get_train(train_id: int, db: Session = Depends(get_db)):
-    train = db.get(Train, train_id)
+async def get_train(train_id: int, db: AsyncSession = Depends(get_async_db)):
+    train = await db.get(Train, train_id)
     if not train:
         raise HTTPException(status_code=404, detail="Train not found")
     return train
 
 @router.put("/{train_id}", response_model=TrainRead)
-def update_train(train_id: int, payload: TrainUpdate, db: Session = Depends(get_db), request: Request = None):
-    train = db.get(Train, train_id)
+async def update_train(train_id: int, payload: TrainUpdate, db: AsyncSession = Depends(get_async_db), request: Request = None):
+    train = await db.get(Train, train_id)
     if not train:
         raise HTTPException(status_code=404, detail="Train not found")
 
@@ -86,85 +130,274 @@ def update_train(train_id: int, payload: TrainUpdate, db: Session = Depends(get_
     for k, v in data.items():
         setattr(train, k, v)
 
-    db.commit()
-    db.refresh(train)
+    await db.commit()
+    await db.refresh(train)
 
-    try:
-        record_audit(
-            db,
-            action="update",
-            entity_type="train",
-            entity_id=train.id,
-            details=data,
-            ip_address=(request.client.host if request and request.client else None),
-            user_agent=(request.headers.get("User-Agent") if request else None)
-        )
-    except Exception:
-        pass
+    record_audit(
+        action="update",
+        entity_type="train",
+        entity_id=train.id,
+        details=data,
+        ip_address=(request.client.host if request and request.client else None),
+        user_agent=(request.headers.get("User-Agent") if request else None)
+    )
 
     return train
 
 @router.delete("/{train_id}")
-def delete_train(train_id: int, db: Session = Depends(get_db), request: Request = None):
-    train = db.get(Train, train_id)
+async def delete_train(train_id: int, db: AsyncSession = Depends(get_async_db), request: Request = None):
+    train = await db.get(Train, train_id)
     if not train:
         raise HTTPException(status_code=404, detail="Train not found")
-    db.delete(train)
-    db.commit()
+    await db.delete(train)
+    await db.commit()
 
-    try:
-        record_audit(
-            db,
-            action="delete",
-            entity_type="train",
-            entity_id=train_id,
-            details=None,
-            ip_address=(request.client.host if request and request.client else None),
-            user_agent=(request.headers.get("User-Agent") if request else None)
-        )
-    except Exception:
-        pass
+    record_audit(
+        action="delete",
+        entity_type="train",
+        entity_id=train_id,
+        details=None,
+        ip_address=(request.client.host if request and request.client else None),
+        user_agent=(request.headers.get("User-Agent") if request else None)
+    )
 
     return {"status": "deleted", "id": train_id}
 
 @router.post("/optimize")
-def optimize_trains(payload: PrecedenceRequest, db: Session = Depends(get_db)):
-    section = db.get(Section, payload.section_id)
+async def optimize_trains(payload: PrecedenceRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
+    state = await live_state.snapshot_async(db)
+    section = state.sections.get(payload.section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    trains = db.query(Train).filter(Train.id.in_(payload.train_ids)).all()
+    trains = state.trains_for(payload.train_ids)
     if not trains:
         raise HTTPException(status_code=400, detail="No valid trains provided")
 
-    schedule = HeuristicOptimizer.build_schedule(trains, section, payload.current_time)
-    metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+    previous_order = None
+    if payload.previous_decision_id:
+        previous = await db.get(Decision, payload.previous_decision_id)
+        if not previous:
+            raise HTTPException(status_code=404, detail="Previous decision not found")
+        previous_order = HeuristicOptimizer.order_from_details(previous.details)
 
-    return {"schedule": schedule, "metrics": metrics}
+    start_time = payload.current_time or datetime.utcnow()
 
-@router.post("/optimize_or", response_model=OROptimizeResult)
-def optimize_trains_or(payload: OROptimizeRequest, db: Session = Depends(get_db)):
-    section = db.get(Section, payload.section_id)
+    def solve():
+        schedule = HeuristicOptimizer.build_schedule(
+            trains,
+            section,
+            start_time,
+            previous_order=previous_order,
+            affected_ids=payload.affected_train_ids,
+        )
+        return {"schedule": schedule, "metrics": HeuristicOptimizer.metrics_from_schedule(schedule)}
+
+    key, tags = optimization_cache.problem_key(
+        "heuristic", trains, section, start_time,
+        previous_order=previous_order, affected_ids=payload.affected_train_ids,
+    )
+    result, response.headers["X-Cache"] = await asyncio.to_thread(optimization_cache.get_or_compute, key, tags, solve, start_time)
+    return result
+
+async def _or_optimize_kwargs(payload: OROptimizeRequest, db: AsyncSession) -> Dict[str, Any]:
+    state = await live_state.snapshot_async(db)
+    section = state.sections.get(payload.section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    trains = db.query(Train).filter(Train.id.in_(payload.train_ids)).all()
+    trains = state.trains_for(payload.train_ids)
     if not trains:
         raise HTTPException(status_code=400, detail="No valid trains provided")
 
-    # Build holds dict
-    holds = {}
+    # Build holds dict: active holds from the live state, overridden by the request
+    start_time = payload.current_time or datetime.utcnow()
+    holds = state.holds_minutes(start_time)
     if payload.holds:
         for h in payload.holds:
             holds[h.train_id] = h.hold_minutes
 
-    res = ORLinearOptimizer.optimize(
+    previous_order = None
+    if payload.previous_decision_id:
+        previous = await db.get(Decision, payload.previous_decision_id)
+        if not previous:
+            raise HTTPException(status_code=404, detail="Previous decision not found")
+        previous_order = HeuristicOptimizer.order_from_details(previous.details)
+
+    return dict(
         trains=trains,
         section=section,
-        start_time=payload.current_time,
+        start_time=start_time,
         headway_minutes=payload.headway_minutes or 2.0,
         holds=holds,
         section_speed_limit=payload.section_speed_limit,
         time_limit_seconds=payload.time_limit_seconds or 10,
+        formulation=payload.formulation or "full",
+        previous_order=previous_order,
+        affected_ids=set(payload.affected_train_ids or []) | set(holds),
     )
+
+@router.post("/optimize_or", response_model=OROptimizeResult)
+async def optimize_trains_or(payload: OROptimizeRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
+    kwargs = await _or_optimize_kwargs(payload, db)
+    params = {k: v for k, v in kwargs.items() if k not in ("trains", "section", "start_time")}
+    key, tags = optimization_cache.problem_key("or_linear", kwargs["trains"], kwargs["section"], kwargs["start_time"], **params)
+    try:
+        res, response.headers["X-Cache"] = await asyncio.to_thread(
+            optimization_cache.get_or_compute, key, tags, lambda: ORLinearOptimizer.optimize(**kwargs), kwargs["start_time"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return res
+
+@router.get("/optimize/cache")
+def optimization_cache_stats():
+    return optimization_cache.stats()
+
+@router.delete("/optimize/cache")
+def clear_optimization_cache():
+    return {"status": "cleared", "entries": optimization_cache.clear()}
+
+@router.post("/optimize_or/jobs", response_model=SolverJobRead)
+async def submit_optimize_or_job(payload: OROptimizeRequest, db: AsyncSession = Depends(get_async_db)):
+    kwargs = await _or_optimize_kwargs(payload, db)
+    if kwargs["formulation"] not in FORMULATIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown formulation '{kwargs['formulation']}'")
+    try:
+        job = solver_jobs.submit("or_linear", kwargs)
+    except OverflowError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.to_dict()
+
+@router.get("/optimize_or/jobs/metrics", response_model=SolverQueueMetrics)
+def optimize_or_job_metrics():
+    return solver_jobs.metrics()
+
+@router.get("/optimize_or/jobs/{job_id}", response_model=SolverJobRead)
+async def get_optimize_or_job(job_id: str, wait_seconds: float = 0.0):
+    job = solver_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Long-poll: hold the request until the job finishes or the wait expires
+    if wait_seconds > 0 and not job.future.done():
+        timeout = min(wait_seconds, settings.OPTIMIZATION_TIMEOUT)
+        await asyncio.wait({asyncio.wrap_future(job.future)}, timeout=timeout)
+    return job.to_dict()
+
+@router.delete("/optimize_or/jobs/{job_id}", response_model=SolverJobRead)
+def cancel_optimize_or_job(job_id: str):
+    job = solver_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/optimize_rolling", response_model=OROptimizeResult)
+async def optimize_trains_rolling(payload: RollingHorizonRequest, db: AsyncSession = Depends(get_async_db)):
+    state = await live_state.snapshot_async(db)
+    section = state.sections.get(payload.section_id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    trains = state.trains_for(payload.train_ids)
+    if not trains:
+        raise HTTPException(status_code=400, detail="No valid trains provided")
+
+    # Build holds dict: active holds from the live state, overridden by the request
+    start_time = payload.current_time or datetime.utcnow()
+    holds = state.holds_minutes(start_time)
+    if payload.holds:
+        for h in payload.holds:
+            holds[h.train_id] = h.hold_minutes
+
+    previous_order = None
+    if payload.previous_decision_id:
+        previous = await db.get(Decision, payload.previous_decision_id)
+        if not previous:
+            raise HTTPException(status_code=404, detail="Previous decision not found")
+        previous_order = HeuristicOptimizer.order_from_details(previous.details)
+
+    try:
+        res = await asyncio.to_thread(
+            RollingHorizonOptimizer.optimize,
+            trains=trains,
+            section=section,
+            start_time=start_time,
+            horizon_minutes=payload.horizon_minutes or settings.ROLLING_HORIZON_MINUTES,
+            step_minutes=payload.step_minutes or settings.ROLLING_STEP_MINUTES,
+            headway_minutes=payload.headway_minutes or 2.0,
+            holds=holds,
+            section_speed_limit=payload.section_speed_limit,
+            time_limit_seconds=payload.time_limit_seconds or 10,
+            formulation=payload.formulation or "compact",
+            previous_order=previous_order,
+            affected_ids=set(payload.affected_train_ids or []) | set(holds),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return res
+
+@router.post("/optimize_anytime")
+async def optimize_trains_anytime(payload: AnytimeOptimizeRequest, db: AsyncSession = Depends(get_async_db)):
+    """Stream the heuristic schedule, each better MILP objective and the final MILP schedule as server-sent events."""
+    kwargs = await _or_optimize_kwargs(payload, db)
+    if kwargs["formulation"] not in FORMULATIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown formulation '{kwargs['formulation']}'")
+
+    run_id = uuid.uuid4().hex
+    # Stoppable as soon as the client has the run id, before the first event is produced
+    AnytimeOptimizer.register(run_id)
+    events = AnytimeOptimizer.stream(**kwargs, run_id=run_id)
+
+    def event_stream():
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Run-Id": run_id},
+        # Also drops the registration when the client left before the stream started
+        background=BackgroundTask(AnytimeOptimizer.discard, run_id),
+    )
+
+@router.post("/optimize_anytime/{run_id}/stop")
+def stop_optimize_anytime(run_id: str):
+    if not AnytimeOptimizer.stop(run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"run_id": run_id, "status": "stopping"}
+
+@router.post("/optimize_corridor", response_model=OROptimizeResult)
+async def optimize_trains_corridor(payload: CorridorOptimizeRequest, db: AsyncSession = Depends(get_async_db)):
+    state = await live_state.snapshot_async(db)
+    sections_by_id = {sid: state.sections[sid] for sid in payload.section_ids if sid in state.sections}
+    missing = [sid for sid in payload.section_ids if sid not in sections_by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Sections not found: {missing}")
+    sections = [sections_by_id[sid] for sid in payload.section_ids]
+
+    trains = state.trains_for(payload.train_ids)
+    if not trains:
+        raise HTTPException(status_code=400, detail="No valid trains provided")
+
+    start_time = payload.current_time or datetime.utcnow()
+    holds = state.holds_minutes(start_time)
+    holds.update({h.train_id: h.hold_minutes for h in payload.holds or []})
+    routes = {r.train_id: r.section_ids for r in payload.routes or []}
+    section_headways = {h.section_id: h.headway_minutes for h in payload.section_headways or []}
+
+    try:
+        res = await asyncio.to_thread(
+            CorridorOptimizer.optimize,
+            trains=trains,
+            sections=sections,
+            routes=routes,
+            start_time=start_time,
+            headway_minutes=payload.headway_minutes or 2.0,
+            section_headways=section_headways,
+            holds=holds,
+            time_limit_seconds=payload.time_limit_seconds or 2.0,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return res
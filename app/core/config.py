@@ -20,6 +20,14 @@ class Settings(BaseSettings):
     # Database Configuration
     # Default to SQLite for ease of local development; can be overridden via env
     DATABASE_URL: str = "sqlite:///./ridss.db"
+    ASYNC_DATABASE_URL: str = ""  # derived from DATABASE_URL when empty
+    # SQLite file databases: WAL, a pool of read-only connections and one queued writer connection
+    SQLITE_PRODUCTION_MODE: bool = False
+    SQLITE_READ_POOL_SIZE: int = 8
+    SQLITE_WRITE_TIMEOUT_SECONDS: float = 30.0  # wait for the writer connection before failing
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_CACHE_SIZE_KB: int = 16384  # per connection
     REDIS_URL: str = "redis://localhost:6379/0"
     
     # Security Configuration
@@ -44,12 +52,52 @@ class Settings(BaseSettings):
     MODEL_PATH: str = "./models/"
     OPTIMIZATION_TIMEOUT: int = 30
     MAX_TRAINS_PER_OPTIMIZATION: int = 100
+    ROLLING_HORIZON_MINUTES: int = 60
+    ROLLING_STEP_MINUTES: int = 20
+    LOCAL_SEARCH_BUDGET_MS: int = 50
+    MONTE_CARLO_MAX_SCENARIOS: int = 50000
+    SWEEP_MAX_SCENARIOS: int = 500
+    CONFLICT_HEADWAY_MINUTES: float = 2.0
     AI_MODEL_VERSION: str = "v1.0"
     
     # Performance Settings
     MAX_WORKERS: int = 4
+    SOLVER_QUEUE_MAX_DEPTH: int = 100
+    SOLVER_JOB_RETENTION_SECONDS: int = 3600
     CACHE_TTL: int = 300
+    LIST_PAGE_SIZE: int = 500
+    LIST_MAX_PAGE_SIZE: int = 5000
+    OPTIMIZATION_CACHE_ENABLED: bool = True
+    OPTIMIZATION_CACHE_MAX_ENTRIES: int = 1000
+    OPTIMIZATION_CACHE_LOCK_SECONDS: float = 30.0
     WEBSOCKET_TIMEOUT: int = 60
+    LIVE_PUSH_INTERVAL_MS: int = 1000
+    LIVE_KPI_INTERVAL_SECONDS: float = 10.0
+    LIVE_SUBSCRIBER_QUEUE_MAX: int = 100
+    KPI_HISTORY_FLUSH_SECONDS: float = 5.0
+    KPI_HISTORY_RETENTION_1M_DAYS: int = 7
+    KPI_HISTORY_RETENTION_15M_DAYS: int = 120
+    KPI_HISTORY_RETENTION_1H_DAYS: int = 730
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_PATH: str = "./archive/"
+    ARCHIVE_INTERVAL_SECONDS: float = 3600.0
+    ARCHIVE_BATCH_SIZE: int = 10000
+    ARCHIVE_SCHEDULE_AGE_DAYS: int = 2
+    ARCHIVE_DECISION_AGE_DAYS: int = 7
+    ARCHIVE_AUDIT_AGE_DAYS: int = 30
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_SPILL_PATH: str = "./audit_spill/"  # empty disables the spill file
+    AUDIT_SPILL_FSYNC: bool = False
+
+    # Position ingest (feeds are "file:<path>", "tcp://host:port" or http(s) URLs)
+    INGEST_ENABLED: bool = False
+    INGEST_FEEDS: List[str] = []
+    INGEST_POLL_INTERVAL_SECONDS: float = 5.0
+    INGEST_BATCH_SIZE: int = 1000
+    INGEST_FLUSH_INTERVAL_MS: int = 250
+    INGEST_QUEUE_MAX: int = 20000
+    IMPORT_BATCH_SIZE: int = 2000
     
     # Monitoring Configuration
     PROMETHEUS_PORT: int = 9090
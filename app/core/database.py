@@ -1,10 +1,135 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import asyncio
+import threading
+from typing import List
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.util import await_only
 import redis
 from app.core.config import settings
 
+def sqlite_pragmas(writer: bool) -> List[str]:
+    """Per-connection PRAGMAs of SQLite production mode"""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+    ]
+    if not writer:
+        # A write that was routed to a reader fails instead of competing for the lock
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def tune_sqlite(engine: Engine, writer: bool) -> None:
+    """Apply sqlite_pragmas to every connection the engine opens (sync engine of an async one too)"""
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas(writer):
+            cursor.execute(pragma)
+        cursor.close()
+
+def _sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return (parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+            and parsed.query.get("mode") != "memory")
+
+class WriterGate:
+    """
+    The one write transaction of SQLite production mode, shared by the sync and asyncio engines.
+
+    Each engine has its own single writer connection, so without the gate a sync and an
+    asyncio transaction could write at once and one would fail with "database is locked" after
+    busy_timeout. Sync sessions wait for the gate in their thread; asyncio sessions wait in a
+    worker thread so the event loop keeps running.
+    """
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout = timeout_seconds
+        self._lock = threading.Lock()
+
+    def acquire(self, asynchronous: bool = False):
+        acquired = self._acquire_async() if asynchronous else self._lock.acquire(timeout=self.timeout)
+        if not acquired:
+            raise PoolTimeoutError(f"Timed out after {self.timeout}s waiting for the SQLite writer")
+
+    def _acquire_async(self) -> bool:
+        # Called inside the asyncio session's greenlet, so await_only suspends the request
+        waiting = asyncio.get_running_loop().run_in_executor(None, self._lock.acquire, True, self.timeout)
+        try:
+            return await_only(asyncio.shield(waiting))
+        except BaseException:
+            # Cancelled while queued: hand the gate back as soon as the worker gets it
+            waiting.add_done_callback(lambda f: f.result() and self._lock.release())
+            raise
+
+    def release(self):
+        self._lock.release()
+
+class RoutingSession(Session):
+    """
+    Session of SQLite production mode: reads go to the reader pool and writes to the writer.
+
+    A transaction moves to the writer at its first INSERT/UPDATE/DELETE or flush and stays
+    there until it ends, so it reads its own writes. Moving to the writer takes the WriterGate,
+    so write transactions from all threads and from asyncio sessions run one at a time instead
+    of failing with "database is locked", and readers never wait on them under WAL. Rows read
+    before the first write come from the reader's snapshot, so like READ COMMITTED a
+    concurrent commit in between is not a conflict. Keep write transactions short: the next
+    writer waits up to SQLITE_WRITE_TIMEOUT_SECONDS for the gate.
+    """
+
+    def __init__(self, *args, reader: Engine, writer: Engine, gate: WriterGate, asynchronous: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reader = reader
+        self.writer = writer
+        self.gate = gate
+        self.asynchronous = asynchronous
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if self.info.get("writing"):
+            return self.writer
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.gate.acquire(self.asynchronous)
+            self.info["writing"] = True
+            return self.writer
+        return self.reader
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _back_to_reader(session, transaction):
+    if transaction.parent is None and session.info.pop("writing", None):
+        session.gate.release()
+
+SQLITE_PRODUCTION = settings.SQLITE_PRODUCTION_MODE and _sqlite_file(settings.DATABASE_URL)
+
 # Configure SQLAlchemy engine conditionally for SQLite vs others
-if settings.DATABASE_URL.startswith("sqlite"):
+if SQLITE_PRODUCTION:
+    # engine is the sync writer: one connection, used while a session holds the WriterGate
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.SQLITE_WRITE_TIMEOUT_SECONDS
+    )
+    read_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=settings.SQLITE_READ_POOL_SIZE
+    )
+    tune_sqlite(engine, writer=True)
+    tune_sqlite(read_engine, writer=False)
+elif settings.DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         settings.DATABASE_URL,
         connect_args={"check_same_thread": False}
@@ -19,7 +144,65 @@ else:
     )
 
 # Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if SQLITE_PRODUCTION:
+    # Write transactions of the sync and asyncio sessions take turns on one gate
+    writer_gate = WriterGate(settings.SQLITE_WRITE_TIMEOUT_SECONDS)
+    SessionLocal = sessionmaker(class_=RoutingSession, reader=read_engine, writer=engine, gate=writer_gate,
+                                autocommit=False, autoflush=False)
+else:
+    read_engine = engine
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Asyncio drivers for the same databases
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio one"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for '{backend}'; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+# Async engine on the same database; ORM session events fire for both engines
+_async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+if SQLITE_PRODUCTION and _async_url.startswith("sqlite"):
+    # aiosqlite defaults to NullPool; pooled connections keep their PRAGMAs and page cache
+    async_write_engine = create_async_engine(
+        _async_url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.SQLITE_WRITE_TIMEOUT_SECONDS
+    )
+    async_engine = create_async_engine(
+        _async_url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=settings.SQLITE_READ_POOL_SIZE
+    )
+    tune_sqlite(async_write_engine.sync_engine, writer=True)
+    tune_sqlite(async_engine.sync_engine, writer=False)
+elif _async_url.startswith("sqlite"):
+    async_engine = async_write_engine = create_async_engine(_async_url)
+else:
+    async_engine = async_write_engine = create_async_engine(
+        _async_url,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_size=10,
+        max_overflow=20
+    )
+
+# Objects stay loaded after commit, since lazy loads cannot run outside the session's await
+if async_write_engine is not async_engine:
+    AsyncSessionLocal = async_sessionmaker(
+        class_=AsyncSession, sync_session_class=RoutingSession,
+        reader=async_engine.sync_engine, writer=async_write_engine.sync_engine, gate=writer_gate, asynchronous=True,
+        autoflush=False, expire_on_commit=False
+    )
+else:
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -35,6 +218,11 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency to get an asyncio database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def get_redis():
     """Dependency to get Redis client"""
     return redis_client
@@ -8,7 +8,13 @@ from pathlib import Path
 
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.core.database import engine, Base
+from app.core.database import engine, read_engine, async_engine, async_write_engine, Base, SQLITE_PRODUCTION
+from app.services.optimization.jobs import solver_jobs
+from app.services.ingest.pipeline import position_ingest, configured_feeds
+from app.services.monitoring.broadcast import live_broadcaster
+from app.services.monitoring.history import kpi_history
+from app.services.archive.archiver import archiver
+from app.utils.audit import audit_writer
 from app import models  # noqa: F401  Ensure models are imported for metadata
 
 # Configure structured logging
@@ -49,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cache"],
 )
 
 # Include API routes
@@ -67,14 +74,40 @@ async def startup_event():
     try:
         Base.metadata.create_all(bind=engine)
         logger.info("Database tables created successfully")
+        if SQLITE_PRODUCTION:
+            logger.info("SQLite production mode", read_pool_size=settings.SQLITE_READ_POOL_SIZE)
     except Exception as e:
         logger.error(f"Failed to create database tables: {e}")
         raise
 
+    if settings.INGEST_ENABLED:
+        feeds = configured_feeds()
+        await position_ingest.start(feeds)
+        logger.info("Position ingest started", feeds=[repr(f) for f in feeds])
+
+    audit_writer.start()
+    await kpi_history.start()
+
+    if settings.ARCHIVE_ENABLED:
+        await archiver.start()
+        logger.info("Archiver started", path=settings.ARCHIVE_PATH)
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on application shutdown"""
     logger.info("Shutting down Railway Intelligent Decision Support System")
+    await position_ingest.stop()
+    await live_broadcaster.stop()
+    await kpi_history.stop()
+    await archiver.stop()
+    audit_writer.stop()
+    solver_jobs.shutdown()
+    # Pooled aiosqlite connections each keep a non-daemon thread alive until closed; closing
+    # the last SQLite connection also checkpoints the WAL
+    await async_engine.dispose()
+    await async_write_engine.dispose()
+    read_engine.dispose()
+    engine.dispose()
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -4,6 +4,7 @@ from .schedule import Schedule
 from .decision import Decision
 from .user import User
 from .audit import AuditLog
+from .kpi import KPIBucket
 
 __all__ = [
     "Train",
@@ -11,5 +12,6 @@ __all__ = [
     "Schedule",
     "Decision",
     "User",
-    "AuditLog"
+    "AuditLog",
+    "KPIBucket"
 ]
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Age cutoff of the archiver
+    __table_args__ = (
+        Index("ix_audit_logs_created", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -19,6 +19,14 @@ class DecisionStatus(enum.Enum):
 
 class Decision(Base):
     __tablename__ = "decisions"
+    # Filter columns followed by the list order (id), for keyset pages; created_at for time
+    # ranges and the archiver
+    __table_args__ = (
+        Index("ix_decisions_created", "created_at", "id"),
+        Index("ix_decisions_section", "section_id", "id"),
+        Index("ix_decisions_train", "train_id", "id"),
+        Index("ix_decisions_status", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from app.core.database import Base
+
+# Upper edges in minutes of the delay histogram bins; the last bin is open-ended
+DELAY_BIN_EDGES = (0, 5, 10, 15, 30, 60)
+DELAY_BIN_COUNT = len(DELAY_BIN_EDGES) + 1
+
+class KPIBucket(Base):
+    """Counters for schedules completed on one section within one time bucket"""
+    __tablename__ = "kpi_buckets"
+    __table_args__ = (
+        UniqueConstraint("resolution_seconds", "bucket_start", "section_id", name="uq_kpi_bucket"),
+        Index("ix_kpi_buckets_section", "section_id", "resolution_seconds", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    section_id = Column(Integer, ForeignKey("sections.id"), nullable=False)
+    resolution_seconds = Column(Integer, nullable=False)  # 60, 900 or 3600
+    bucket_start = Column(DateTime, nullable=False)
+
+    completed = Column(Integer, default=0, nullable=False)
+    on_time = Column(Integer, default=0, nullable=False)
+    delayed = Column(Integer, default=0, nullable=False)
+    delay_minutes_sum = Column(Float, default=0.0, nullable=False)
+
+    # Delay histogram: <= 0, (0, 5], (5, 10], (10, 15], (15, 30], (30, 60], > 60 minutes
+    delay_bin_0 = Column(Integer, default=0, nullable=False)
+    delay_bin_1 = Column(Integer, default=0, nullable=False)
+    delay_bin_2 = Column(Integer, default=0, nullable=False)
+    delay_bin_3 = Column(Integer, default=0, nullable=False)
+    delay_bin_4 = Column(Integer, default=0, nullable=False)
+    delay_bin_5 = Column(Integer, default=0, nullable=False)
+    delay_bin_6 = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<KPIBucket section={self.section_id} {self.resolution_seconds}s @ {self.bucket_start}: {self.completed}>"
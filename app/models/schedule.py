@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Float, Index, text
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func
 import enum
 from app.core.database import Base
@@ -13,17 +13,29 @@ class ScheduleStatus(enum.Enum):
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    # Filter columns followed by the list order (planned_entry, id), for keyset pages
+    __table_args__ = (
+        Index("ix_schedules_planned_entry", "planned_entry", "id"),
+        Index("ix_schedules_section_entry", "section_id", "planned_entry", "id"),
+        Index("ix_schedules_train_entry", "train_id", "planned_entry", "id"),
+        Index("ix_schedules_status_entry", "status", "planned_entry", "id"),
+        # Completion windows for the KPI rollup and history rebuild
+        Index("ix_schedules_actual_exit", "actual_exit"),
+        # The archiver dates a schedule by its actual exit, or planned exit if it never ran
+        Index("ix_schedules_archive_at", text("coalesce(actual_exit, planned_exit)")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     train_id = Column(Integer, ForeignKey("trains.id"), nullable=False)
-    section_id = Column(Integer, ForeignKey("sections.id"), nullable=False)
+    # Previous values are loaded on change so KPI history can retract a corrected completion
+    section_id = column_property(Column(Integer, ForeignKey("sections.id"), nullable=False), active_history=True)
 
     planned_entry = Column(DateTime, nullable=False)
-    planned_exit = Column(DateTime, nullable=False)
+    planned_exit = column_property(Column(DateTime, nullable=False), active_history=True)
 
     actual_entry = Column(DateTime)
-    actual_exit = Column(DateTime)
+    actual_exit = column_property(Column(DateTime), active_history=True)
 
     platform = Column(String(10))
     track = Column(String(10))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -26,6 +26,13 @@ class Priority(enum.Enum):
 
 class Train(Base):
     __tablename__ = "trains"
+    # Filter columns followed by the list order (id), for keyset pages
+    __table_args__ = (
+        Index("ix_trains_status", "status", "id"),
+        Index("ix_trains_type", "train_type", "id"),
+        Index("ix_trains_section", "current_section_id", "id"),
+        Index("ix_trains_departure", "scheduled_departure", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     train_number = Column(String(10), unique=True, index=True, nullable=False)
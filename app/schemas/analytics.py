@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 
 class KPIResponse(BaseModel):
     punctuality_rate: float
@@ -11,3 +12,32 @@ class KPIResponse(BaseModel):
 class DashboardResponse(BaseModel):
     kpis: KPIResponse
     charts: Dict[str, Any]  # Keyed by chart name, values are chart data structures
+
+class KPIHistoryPoint(BaseModel):
+    bucket_start: datetime
+    completed: int
+    on_time: int
+    delayed: int
+    average_delay_minutes: float
+    throughput_per_hour: float
+
+class KPITimeseries(BaseModel):
+    section_id: Optional[int] = None
+    resolution: str  # "1m", "15m" or "1h"
+    start: datetime
+    end: datetime
+    points: List[KPIHistoryPoint]
+
+class DelayHistogramBin(BaseModel):
+    label: str
+    min_minutes: Optional[float] = None
+    max_minutes: Optional[float] = None
+    count: int
+
+class DelayHistogram(BaseModel):
+    section_id: Optional[int] = None
+    resolution: str
+    start: datetime
+    end: datetime
+    total: int
+    bins: List[DelayHistogramBin]
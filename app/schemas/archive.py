@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List, Dict, Any
+
+class ArchiveRows(BaseModel):
+    table: str
+    count: int
+    rows: List[Dict[str, Any]]
+
+class ArchiveSummary(BaseModel):
+    table: str
+    group_by: str
+    groups: List[Dict[str, Any]]  # {<group_by>: value, "rows": n, ...}
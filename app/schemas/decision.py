@@ -6,6 +6,21 @@ class PrecedenceRequest(BaseModel):
     section_id: int
     train_ids: List[int]
     current_time: Optional[datetime] = None
+    previous_decision_id: Optional[int] = None  # warm start from this decision's order
+    affected_train_ids: Optional[List[int]] = None  # trains to re-sequence on warm start
+    improvement: Optional[str] = None  # "descent", "tabu" or "annealing"
+    improvement_budget_ms: Optional[int] = None  # defaults to settings.LOCAL_SEARCH_BUDGET_MS
+
+class TrainDirection(BaseModel):
+    train_id: int
+    direction: str  # "up" (start_station -> end_station) or "down"
+
+class CrossingRequest(PrecedenceRequest):
+    directions: Optional[List[TrainDirection]] = None  # inferred from origin/destination if omitted
+    loop_count: Optional[int] = None  # loops at the crossing station, defaults to 1
+    platform_loops: Optional[int] = None  # loops with a platform, defaults to all of them
+    headway_minutes: Optional[float] = 2.0
+    time_limit_seconds: Optional[float] = 1.0
 
 class DecisionCreate(BaseModel):
     decision_type: str
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class ScheduleImport(BaseModel):
+    """One schedule row of a bulk import; the train and section are referenced by their keys"""
+    train_number: str
+    section_code: str
+    planned_entry: datetime
+    planned_exit: datetime
+    actual_entry: Optional[datetime] = None
+    actual_exit: Optional[datetime] = None
+    platform: Optional[str] = None
+    track: Optional[str] = None
+    status: Optional[str] = None
+    dwell_time_minutes: Optional[float] = None
+
+class ImportRowError(BaseModel):
+    row: int  # 1-based data row, header excluded
+    error: str
+
+class ImportResult(BaseModel):
+    entity: str
+    format: str
+    rows: int
+    inserted: int
+    updated: int
+    duplicates: int  # later rows with the same key replaced earlier ones
+    invalid: int
+    errors: List[ImportRowError]  # first invalid rows only
+    duration_ms: float
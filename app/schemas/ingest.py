@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class PositionReport(BaseModel):
+    train_id: Optional[int] = None
+    train_number: Optional[str] = None
+    section_id: Optional[int] = None
+    position_km: float = 0.0
+    status: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+class PositionBatch(BaseModel):
+    positions: List[PositionReport]
+
+class PositionBatchAccepted(BaseModel):
+    accepted: int
+    queue_depth: int
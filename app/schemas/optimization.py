@@ -11,9 +11,62 @@ class OROptimizeRequest(BaseModel):
     holds: Optional[List[HoldInstruction]] = None
     section_speed_limit: Optional[int] = None
     time_limit_seconds: Optional[int] = 10
+    formulation: Optional[str] = "full"  # "full" or "compact"
+    previous_decision_id: Optional[int] = None  # warm start from this decision's order
+    affected_train_ids: Optional[List[int]] = None  # trains to re-sequence on warm start
+
+class RollingHorizonRequest(OROptimizeRequest):
+    formulation: Optional[str] = "compact"
+    horizon_minutes: Optional[float] = None  # defaults to settings.ROLLING_HORIZON_MINUTES
+    step_minutes: Optional[float] = None  # defaults to settings.ROLLING_STEP_MINUTES
+
+class AnytimeOptimizeRequest(OROptimizeRequest):
+    formulation: Optional[str] = "compact"
+
+class TrainRoute(BaseModel):
+    train_id: int
+    section_ids: List[int]  # in travel order
+
+class SectionHeadway(BaseModel):
+    section_id: int
+    headway_minutes: float
+
+class CorridorOptimizeRequest(BaseModel):
+    section_ids: List[int]  # ordered chain of adjacent sections
+    train_ids: List[int]
+    routes: Optional[List[TrainRoute]] = None  # trains without a route run the whole chain
+    current_time: Optional[datetime] = None
+    headway_minutes: Optional[float] = 2.0
+    section_headways: Optional[List[SectionHeadway]] = None
+    holds: Optional[List[HoldInstruction]] = None
+    time_limit_seconds: Optional[float] = 2.0
 
 class OROptimizeResult(BaseModel):
     status: Optional[str] = None
     objective: Optional[float] = None
     schedule: List[Any]
     metrics: Any
+
+class SolverJobRead(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # queued, running, completed, failed, cancelled
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    wait_seconds: float
+    result: Optional[OROptimizeResult] = None
+    error: Optional[str] = None
+
+class SolverQueueMetrics(BaseModel):
+    max_workers: int
+    max_queued: int
+    queue_depth: int
+    queued: int
+    running: int
+    completed: int
+    failed: int
+    cancelled: int
+    avg_wait_seconds: float
+    max_wait_seconds: float
+    avg_run_seconds: float
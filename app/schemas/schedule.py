@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class ScheduleRead(BaseModel):
@@ -17,3 +17,18 @@ class ScheduleRead(BaseModel):
     model_config = {
         "from_attributes": True
     }
+
+class ScheduleConflict(BaseModel):
+    kind: str  # "overlap", "headway" or "train_overlap"
+    schedule_ids: List[int]  # earlier entry first
+    train_ids: List[int]
+    section_ids: List[int]
+    track: Optional[str] = None
+    start: datetime
+    end: datetime
+    separation_minutes: float  # negative when the intervals overlap
+    required_minutes: float
+
+class ConflictReport(BaseModel):
+    count: int
+    conflicts: List[ScheduleConflict]
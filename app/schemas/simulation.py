@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class HoldInstruction(BaseModel):
@@ -16,7 +16,67 @@ class WhatIfScenario(BaseModel):
     holds: Optional[List[HoldInstruction]] = None
     speed_restrictions: Optional[List[SpeedRestriction]] = None
     start_time: Optional[datetime] = None
+    improvement: Optional[str] = None  # "descent", "tabu" or "annealing"
+    improvement_budget_ms: Optional[int] = None  # defaults to settings.LOCAL_SEARCH_BUDGET_MS
 
 class SimulationResult(BaseModel):
     schedule: list
     metrics: dict
+
+class ScenarioVariant(BaseModel):
+    name: Optional[str] = None
+    holds: Optional[List[HoldInstruction]] = None  # applied on top of the base holds
+    section_speed_limit: Optional[int] = None
+
+class ScenarioGrid(BaseModel):
+    holds: Optional[Dict[int, List[int]]] = None  # hold minutes to try per train_id
+    section_speed_limits: Optional[List[Optional[int]]] = None
+
+class SweepRequest(WhatIfScenario):
+    variants: Optional[List[ScenarioVariant]] = None
+    grid: Optional[ScenarioGrid] = None  # every combination is evaluated
+    rank_by: str = "objective"  # "objective", "makespan_minutes" or "throughput_per_hour"
+
+class ReplayRequest(BaseModel):
+    start_time: datetime  # replays Schedule rows with planned_entry in [start_time, end_time)
+    end_time: datetime
+    section_ids: Optional[List[int]] = None  # defaults to all sections
+    policy: Optional[str] = "fifo"  # "fifo" or "priority"
+    decision_id: Optional[int] = None  # dispatch by this decision's precedence order instead
+    headway_minutes: Optional[float] = 2.0
+    include_trains: bool = False
+
+class ReplayResult(BaseModel):
+    metrics: dict
+    trains: Optional[list] = None
+
+class MonteCarloScenario(WhatIfScenario):
+    scenarios: int = Field(1000, gt=0)  # capped at settings.MONTE_CARLO_MAX_SCENARIOS
+    delay_probability: float = Field(0.3, ge=0, le=1)
+    delay_mean_minutes: float = Field(5.0, ge=0)
+    speed_restriction_probability: float = Field(0.1, ge=0, le=1)
+    speed_restriction_kmh: int = Field(50, gt=0)
+    dwell_mean_minutes: float = Field(1.0, ge=0)
+    seed: Optional[int] = None
+
+class Distribution(BaseModel):
+    mean: float
+    p50: float
+    p90: float
+    max: float
+
+class TrainDelayDistribution(BaseModel):
+    train_id: int
+    train_number: str
+    p50_delay_minutes: float
+    p90_delay_minutes: float
+    conflict_probability: float
+
+class MonteCarloResult(BaseModel):
+    scenarios: int
+    planned_schedule: list
+    train_delay_minutes: Distribution
+    total_delay_minutes: Distribution
+    throughput_per_hour: Distribution
+    conflict_probability: float  # share of scenarios with at least one conflict
+    trains: List[TrainDelayDistribution]
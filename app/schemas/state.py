@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class HoldSet(BaseModel):
+    hold_minutes: int
+    from_time: Optional[datetime] = None  # defaults to now
+
+class HoldRead(BaseModel):
+    train_id: int
+    held_until: datetime
+
+class TrainPosition(BaseModel):
+    train_id: int
+    train_number: str
+    status: Optional[str] = None
+    current_section_id: Optional[int] = None
+    current_position_km: Optional[float] = None
+    held_until: Optional[datetime] = None
+
+class SectionOccupancy(BaseModel):
+    section_id: int
+    section_code: str
+    current_occupancy: int
+    max_trains_per_hour: Optional[int] = None
+    utilization_percentage: float
+    is_congested: bool
+
+class NetworkStateRead(BaseModel):
+    version: int
+    taken_at: datetime
+    trains: int
+    trains_on_sections: int
+    holds: List[HoldRead]
+    sections: List[SectionOccupancy]
@@ -0,0 +1 @@
+# Archival services
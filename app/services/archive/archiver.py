@@ -0,0 +1,313 @@
+from __future__ import annotations
+import asyncio
+import enum
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import structlog
+from sqlalchemy import Boolean, DateTime, Float, Integer, JSON, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.audit import AuditLog
+from app.models.decision import Decision, DecisionStatus
+from app.models.schedule import Schedule, ScheduleStatus
+
+logger = structlog.get_logger()
+
+# Directory names for the hive-style partitions; rows without a section use the null fallback
+DAY_PARTITION = "day"
+SECTION_PARTITION = "section_id"
+
+
+def _arrow_type(column) -> pa.DataType:
+    kind = column.type
+    if isinstance(kind, Boolean):
+        return pa.bool_()
+    if isinstance(kind, Integer):
+        return pa.int64()
+    if isinstance(kind, Float):
+        return pa.float64()
+    if isinstance(kind, DateTime):
+        return pa.timestamp("us")
+    # Strings, text, enum values and JSON documents (encoded)
+    return pa.string()
+
+
+def _arrow_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(column.type, JSON):
+        return json.dumps(value, default=str)
+    return value
+
+
+class ArchivedTable:
+    """How one table is archived: which rows are old enough and which timestamp dates them."""
+
+    def __init__(self, name: str, model, day_column, eligible: Callable[[datetime], Any],
+                 max_age_days: int, by_section: bool):
+        self.name = name
+        self.model = model
+        self.table = model.__table__
+        self.day_column = day_column
+        self.eligible = eligible
+        self.max_age_days = max_age_days
+        self.by_section = by_section
+        self.schema = pa.schema(
+            [(c.key, _arrow_type(c)) for c in self.table.columns if not (by_section and c.key == SECTION_PARTITION)]
+            + [(DAY_PARTITION, pa.string())]
+            + ([(SECTION_PARTITION, pa.int64())] if by_section else [])
+        )
+        self.partitioning = ds.partitioning(
+            pa.schema([(DAY_PARTITION, pa.string())] + ([(SECTION_PARTITION, pa.int64())] if by_section else [])),
+            flavor="hive",
+        )
+
+
+ARCHIVED_TABLES: Dict[str, ArchivedTable] = {
+    t.name: t for t in (
+        ArchivedTable(
+            "schedules", Schedule, func.coalesce(Schedule.actual_exit, Schedule.planned_exit),
+            lambda cutoff: (
+                Schedule.status.in_([ScheduleStatus.COMPLETED, ScheduleStatus.CANCELLED])
+                & (func.coalesce(Schedule.actual_exit, Schedule.planned_exit) < cutoff)
+            ),
+            settings.ARCHIVE_SCHEDULE_AGE_DAYS, by_section=True,
+        ),
+        ArchivedTable(
+            "decisions", Decision, Decision.created_at,
+            lambda cutoff: (
+                Decision.status.in_([DecisionStatus.IMPLEMENTED, DecisionStatus.OVERRIDDEN, DecisionStatus.REJECTED])
+                & (Decision.created_at < cutoff)
+            ),
+            settings.ARCHIVE_DECISION_AGE_DAYS, by_section=True,
+        ),
+        ArchivedTable(
+            "audit_logs", AuditLog, AuditLog.created_at,
+            lambda cutoff: AuditLog.created_at < cutoff,
+            settings.ARCHIVE_AUDIT_AGE_DAYS, by_section=False,
+        ),
+    )
+}
+
+
+class Archiver:
+    """
+    Moves finished rows out of the OLTP tables into Parquet files under archive_path.
+
+    Files are laid out as <table>/day=YYYY-MM-DD/section_id=N/part-*.parquet (audit logs by
+    day only) and each run appends new part files. A batch is written to disk before its
+    rows are deleted, and the files are removed again if the delete fails, so a row is never
+    lost and at worst archived twice. Rows are deleted with plain SQL, so completed schedules
+    stay counted in the KPI history. Queries read the files through a pyarrow dataset and
+    prune partitions by day and section.
+    """
+
+    def __init__(self, archive_path: str, batch_size: int, interval_seconds: float):
+        self.root = Path(archive_path)
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def _table(self, name: str) -> ArchivedTable:
+        spec = ARCHIVED_TABLES.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown archived table '{name}', expected one of {', '.join(ARCHIVED_TABLES)}")
+        return spec
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Archive every table once; returns rows moved and files written per table."""
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        result: Dict[str, Any] = {}
+        try:
+            with self._lock:
+                for spec in ARCHIVED_TABLES.values():
+                    db = SessionLocal()
+                    try:
+                        result[spec.name] = self._archive(db, spec, now - timedelta(days=spec.max_age_days))
+                    finally:
+                        db.close()
+        except Exception as e:
+            # Tables archived before the failure stay listed
+            result["error"] = str(e)
+            raise
+        finally:
+            self.last_run = {"finished_at": datetime.utcnow(), "duration_ms": round((time.perf_counter() - started) * 1000, 1), **result}
+        return self.last_run
+
+    def _archive(self, db: Session, spec: ArchivedTable, cutoff: datetime) -> Dict[str, int]:
+        moved = files = 0
+        pk = spec.table.c.id
+        query = (
+            select(*spec.table.columns, spec.day_column.label("_archive_at"))
+            .where(spec.eligible(cutoff))
+            # Oldest first along the day column's index; ordering by id would walk the whole table
+            .order_by(spec.day_column)
+            .limit(self.batch_size)
+        )
+        while True:
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            written: List[str] = []
+            try:
+                ds.write_dataset(
+                    self._to_arrow(spec, rows), str(self.root / spec.name),
+                    format="parquet",
+                    partitioning=spec.partitioning,
+                    basename_template=f"part-{int(time.time() * 1000)}-{os.getpid()}-{{i}}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                    file_visitor=lambda f: written.append(f.path),
+                )
+                db.execute(delete(spec.table).where(pk.in_([r.id for r in rows])))
+                db.commit()
+            except Exception:
+                db.rollback()
+                for path in written:
+                    Path(path).unlink(missing_ok=True)
+                raise
+            moved += len(rows)
+            files += len(written)
+            if len(rows) < self.batch_size:
+                break
+        return {"rows": moved, "files": files}
+
+    @staticmethod
+    def _to_arrow(spec: ArchivedTable, rows) -> pa.Table:
+        columns: Dict[str, List[Any]] = {}
+        for column in spec.table.columns:
+            columns[column.key] = [_arrow_value(column, getattr(r, column.key)) for r in rows]
+        columns[DAY_PARTITION] = [r._archive_at.strftime("%Y-%m-%d") if r._archive_at else None for r in rows]
+        return pa.Table.from_pydict(columns, schema=spec.schema)
+
+    def _dataset(self, spec: ArchivedTable) -> Optional[ds.Dataset]:
+        path = self.root / spec.name
+        if not path.exists():
+            return None
+        return ds.dataset(str(path), format="parquet", schema=spec.schema, partitioning=spec.partitioning)
+
+    @staticmethod
+    def _filter(spec: ArchivedTable, start: Optional[datetime], end: Optional[datetime],
+                section_id: Optional[int], equals: Optional[Dict[str, Any]]):
+        expression = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        # Day partitions first so whole directories are skipped
+        if start is not None:
+            expression = both(expression, ds.field(DAY_PARTITION) >= start.strftime("%Y-%m-%d"))
+        if end is not None:
+            expression = both(expression, ds.field(DAY_PARTITION) <= end.strftime("%Y-%m-%d"))
+        if section_id is not None:
+            if not spec.by_section:
+                raise ValueError(f"'{spec.name}' is not partitioned by section")
+            expression = both(expression, ds.field(SECTION_PARTITION) == section_id)
+        for name, value in (equals or {}).items():
+            if name not in spec.schema.names:
+                raise ValueError(f"Unknown column '{name}' for '{spec.name}'")
+            expression = both(expression, ds.field(name) == pa.scalar(value).cast(spec.schema.field(name).type))
+        return expression
+
+    def query(self, table: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              section_id: Optional[int] = None, equals: Optional[Dict[str, Any]] = None,
+              columns: Optional[List[str]] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Archived rows whose day falls in [start, end], filtered on partitions before any file is read."""
+        spec = self._table(table)
+        for name in columns or []:
+            if name not in spec.schema.names:
+                raise ValueError(f"Unknown column '{name}' for '{spec.name}'")
+        expression = self._filter(spec, start, end, section_id, equals)
+        dataset = self._dataset(spec)
+        if dataset is None:
+            return []
+        result = dataset.head(limit, columns=columns or None, filter=expression) if limit else \
+            dataset.to_table(columns=columns or None, filter=expression)
+        return result.to_pylist()
+
+    def summary(self, table: str, group_by: str = DAY_PARTITION, start: Optional[datetime] = None,
+                end: Optional[datetime] = None, section_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Row counts per group; schedules also get completed count and average exit delay."""
+        spec = self._table(table)
+        if group_by not in spec.schema.names:
+            raise ValueError(f"Unknown column '{group_by}' for '{spec.name}'")
+        expression = self._filter(spec, start, end, section_id, None)
+        dataset = self._dataset(spec)
+        if dataset is None:
+            return []
+        aggregates = [("id", "count")]
+        columns = [group_by, "id"]
+        if spec.model is Schedule:
+            columns += ["actual_exit", "planned_exit"]
+        data = dataset.to_table(columns=list(dict.fromkeys(columns)), filter=expression)
+        if spec.model is Schedule:
+            delay = pc.divide(
+                pc.cast(pc.subtract(data["actual_exit"], data["planned_exit"]), pa.int64()), 60_000_000.0
+            )
+            data = data.append_column("delay_minutes", delay)
+            aggregates += [("actual_exit", "count"), ("delay_minutes", "mean")]
+        grouped = data.group_by(group_by).aggregate(aggregates).sort_by(group_by)
+        return [
+            {
+                group_by: row[group_by],
+                "rows": row["id_count"],
+                **({
+                    "completed": row["actual_exit_count"],
+                    "average_delay_minutes": round(row["delay_minutes_mean"], 2) if row["delay_minutes_mean"] is not None else None,
+                } if spec.model is Schedule else {}),
+            }
+            for row in grouped.to_pylist()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        tables = {}
+        for name in ARCHIVED_TABLES:
+            files = list((self.root / name).rglob("*.parquet")) if (self.root / name).exists() else []
+            tables[name] = {"files": len(files), "bytes": sum(f.stat().st_size for f in files)}
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "path": str(self.root),
+            "tables": tables,
+            "last_run": self.last_run,
+        }
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run)
+            except Exception as e:
+                logger.error("Archive run failed", error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Shared archiver for the API process
+archiver = Archiver(
+    archive_path=settings.ARCHIVE_PATH,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    interval_seconds=settings.ARCHIVE_INTERVAL_SECONDS,
+)
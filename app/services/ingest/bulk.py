@@ -0,0 +1,366 @@
+from __future__ import annotations
+import csv
+import json
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Any, Optional, Tuple
+
+import pyarrow as pa
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, select, tuple_, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.schedule import Schedule, ScheduleStatus
+from app.models.section import Section
+from app.models.train import Train, TrainType, TrainStatus, Priority
+from app.schemas.imports import ScheduleImport
+from app.schemas.section import SectionCreate
+from app.schemas.train import TrainCreate
+from app.services.monitoring.conflicts import schedule_conflicts
+from app.services.monitoring.history import kpi_history
+from app.services.monitoring.kpis import kpi_rollup
+from app.services.monitoring.live_state import live_state
+
+IMPORT_FORMATS = ("csv", "jsonl", "arrow")
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/x-jsonlines": "jsonl",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+}
+
+# Row errors kept for the response; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(requested: Optional[str], content_type: Optional[str]) -> str:
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported format '{requested}', expected one of {', '.join(IMPORT_FORMATS)}")
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CONTENT_TYPES:
+        return CONTENT_TYPES[media_type]
+    raise ValueError(f"Cannot tell the import format from content type '{media_type}'; pass ?format=")
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Complete text lines, line endings kept, as the body streams in."""
+    tail = b""
+    first = True
+    async for chunk in chunks:
+        tail += chunk
+        cut = tail.rfind(b"\n")
+        if cut < 0:
+            continue
+        # Cutting at a newline never splits a UTF-8 sequence
+        text, tail = tail[:cut + 1].decode("utf-8"), tail[cut + 1:]
+        if first:
+            text, first = text.lstrip("\ufeff"), False
+        for line in text.splitlines(keepends=True):
+            yield line
+    if tail:
+        yield tail.decode("utf-8").lstrip("\ufeff") if first else tail.decode("utf-8")
+
+
+async def read_rows(fmt: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Raw rows from a streamed body. CSV and JSON lines are parsed line by line as they arrive;
+    an Arrow IPC stream or file is read whole and split into its record batches. A row that
+    cannot be parsed is yielded as an Exception so it is reported like a validation error.
+    """
+    if fmt == "arrow":
+        body = b"".join([chunk async for chunk in chunks])
+        try:
+            reader = pa.ipc.open_stream(body)
+        except pa.ArrowInvalid:
+            reader = pa.ipc.open_file(body)
+        batches = reader if isinstance(reader, pa.ipc.RecordBatchStreamReader) else \
+            (reader.get_batch(i) for i in range(reader.num_record_batches))
+        for batch in batches:
+            for row in batch.to_pylist():
+                yield row
+        return
+
+    if fmt == "jsonl":
+        async for line in _lines(chunks):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"invalid JSON: {e}")
+                continue
+            yield row if isinstance(row, dict) else ValueError("expected a JSON object")
+        return
+
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    async for line in _lines(chunks):
+        # A quoted field may span lines: wait until the quotes balance
+        record.append(line)
+        if sum(part.count('"') for part in record) % 2:
+            continue
+        text, record = "".join(record), []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield ValueError(f"expected {len(header)} fields, got {len(values)}")
+            continue
+        yield dict(zip(header, values))
+    if record:
+        yield ValueError("unterminated quoted field")
+
+
+async def read_batches(fmt: str, chunks: AsyncIterator[bytes], batch_size: int) -> AsyncIterator[List[Any]]:
+    batch: List[Any] = []
+    async for row in read_rows(fmt, chunks):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _train_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    if "train_type" in data:
+        data["train_type"] = TrainType(data["train_type"])
+    if "status" in data:
+        data["status"] = TrainStatus(data["status"])
+    if "priority" in data:
+        data["priority"] = Priority(data["priority"])
+    return data
+
+
+def _schedule_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    if "status" in data:
+        data["status"] = ScheduleStatus(data["status"])
+    if data["planned_exit"] < data["planned_entry"]:
+        raise ValueError("planned_exit is before planned_entry")
+    return data
+
+
+class ImportSpec:
+    def __init__(self, name: str, entity_type: str, model, schema: type[BaseModel], key: Optional[str],
+                 convert: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self.name = name
+        self.entity_type = entity_type
+        self.model = model
+        self.table = model.__table__
+        self.schema = schema
+        self.key = key
+        self.convert = convert
+
+
+IMPORT_SPECS: Dict[str, ImportSpec] = {
+    spec.name: spec for spec in (
+        ImportSpec("trains", "train", Train, TrainCreate, "train_number", _train_row),
+        ImportSpec("sections", "section", Section, SectionCreate, "section_code", lambda data: data),
+        ImportSpec("schedules", "schedule", Schedule, ScheduleImport, None, _schedule_row),
+    )
+}
+
+
+class BulkImport:
+    """
+    One bulk import of trains, sections or schedules.
+
+    Batches are validated row by row against the entity's create schema and written with
+    executemany: trains and sections as INSERT ... ON CONFLICT (train_number / section_code)
+    DO UPDATE, so a re-import updates rows in place. Schedules have no unique key, so their
+    train_number and section_code are resolved to ids, and rows matching an existing
+    (train, section, planned_entry) are updated by primary key while the rest are inserted.
+    Only the columns a row provides are written. Rows bypass the ORM, so completions are
+    handed to the KPI history as each batch commits, and the live state, conflict index and
+    KPI rollup are reloaded once at the end.
+
+    Invalid rows are skipped and reported, and each batch is committed as soon as it is
+    written, so the database writer is never held while the rest of the body streams in. With
+    atomic=True the import is one transaction, rolled back if any row is invalid; under SQLite
+    production mode it keeps other writers waiting until it ends.
+    """
+
+    def __init__(self, db: Session, entity: str, atomic: bool = False):
+        self.spec = IMPORT_SPECS.get(entity)
+        if self.spec is None:
+            raise ValueError(f"Unknown import entity '{entity}', expected one of {', '.join(IMPORT_SPECS)}")
+        self.db = db
+        self.atomic = atomic
+        self.dialect = db.get_bind().dialect.name
+        self.started = time.perf_counter()
+        self.rows = self.inserted = self.updated = self.invalid = self.duplicates = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._completions: List[Tuple[int, Any, Any, int]] = []
+        self._committed = False
+
+    def _fail(self, row_number: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def _validate(self, batch: List[Any]) -> List[Tuple[int, Dict[str, Any]]]:
+        valid = []
+        for raw in batch:
+            self.rows += 1
+            if isinstance(raw, Exception):
+                self._fail(self.rows, str(raw))
+                continue
+            # Empty cells mean "not given", so an import never blanks a column
+            data = {k: v for k, v in raw.items() if v is not None and v != ""}
+            try:
+                model = self.spec.schema.model_validate(data)
+                valid.append((self.rows, self.spec.convert(model.model_dump(exclude_unset=True))))
+            except ValidationError as e:
+                self._fail(self.rows, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            except ValueError as e:
+                self._fail(self.rows, str(e))
+        return valid
+
+    def add_batch(self, batch: List[Any]):
+        valid = self._validate(batch)
+        if self.atomic and self.invalid:
+            return
+        if self.spec.model is Schedule:
+            valid = self._resolve_schedule_refs(valid)
+            self._upsert_schedules([data for _, data in valid])
+        elif valid:
+            self._upsert_keyed([data for _, data in valid])
+        if not self.atomic:
+            self._commit()
+
+    def _dedupe(self, rows: List[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any]) -> Dict[Any, Dict[str, Any]]:
+        # Last row wins, so one statement never touches the same row twice
+        by_key: Dict[Any, Dict[str, Any]] = {}
+        for data in rows:
+            k = key(data)
+            if k in by_key:
+                self.duplicates += 1
+            by_key[k] = data
+        return by_key
+
+    def _upsert_keyed(self, rows: List[Dict[str, Any]]):
+        spec = self.spec
+        key_column = spec.table.c[spec.key]
+        by_key = self._dedupe(rows, lambda data: data[spec.key])
+        existing = set(self.db.execute(select(key_column).where(key_column.in_(list(by_key)))).scalars())
+        self.updated += len(existing)
+        self.inserted += len(by_key) - len(existing)
+
+        if self.dialect == "postgresql":
+            dialect_insert = postgresql.insert
+        elif self.dialect == "sqlite":
+            dialect_insert = sqlite.insert
+        else:
+            raise ValueError(f"Bulk upsert is not supported on '{self.dialect}'")
+        for columns, group in self._group_by_columns(by_key.values()):
+            statement = dialect_insert(spec.table)
+            changes = {name: statement.excluded[name] for name in columns if name != spec.key}
+            if "updated_at" in spec.table.c:
+                changes["updated_at"] = func.now()
+            self.db.execute(statement.on_conflict_do_update(index_elements=[key_column], set_=changes), group)
+
+    @staticmethod
+    def _group_by_columns(rows: Iterable[Dict[str, Any]]):
+        # executemany needs the same columns in every row of a statement
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for data in rows:
+            groups.setdefault(tuple(sorted(data)), []).append(data)
+        return groups.items()
+
+    def _resolve_schedule_refs(self, valid: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        numbers = {data["train_number"] for _, data in valid}
+        codes = {data["section_code"] for _, data in valid}
+        trains = dict(self.db.execute(select(Train.train_number, Train.id).where(Train.train_number.in_(numbers))).all())
+        sections = dict(self.db.execute(select(Section.section_code, Section.id).where(Section.section_code.in_(codes))).all())
+        resolved = []
+        for row_number, data in valid:
+            train_id = trains.get(data.pop("train_number"))
+            section_id = sections.get(data.pop("section_code"))
+            if train_id is None or section_id is None:
+                self._fail(row_number, "unknown train_number" if train_id is None else "unknown section_code")
+                continue
+            data["train_id"], data["section_id"] = train_id, section_id
+            resolved.append((row_number, data))
+        return resolved
+
+    def _upsert_schedules(self, rows: List[Dict[str, Any]]):
+        if not rows or (self.atomic and self.invalid):
+            return
+        by_key = self._dedupe(rows, lambda data: (data["train_id"], data["section_id"], data["planned_entry"]))
+        existing = {
+            (r.train_id, r.section_id, r.planned_entry): r
+            for r in self.db.execute(
+                select(Schedule.id, Schedule.train_id, Schedule.section_id, Schedule.planned_entry,
+                       Schedule.planned_exit, Schedule.actual_exit)
+                .where(tuple_(Schedule.train_id, Schedule.section_id, Schedule.planned_entry).in_(list(by_key)))
+            ).all()
+        }
+        inserts, updates = [], []
+        for key, data in by_key.items():
+            old = existing.get(key)
+            if old is None:
+                inserts.append(data)
+                self._completions.append((data["section_id"], data["planned_exit"], data.get("actual_exit"), 1))
+                continue
+            updates.append({"id": old.id, **data})
+            if "actual_exit" in data or data["planned_exit"] != old.planned_exit:
+                self._completions.append((old.section_id, old.planned_exit, old.actual_exit, -1))
+                self._completions.append((old.section_id, data["planned_exit"], data.get("actual_exit", old.actual_exit), 1))
+        for _, group in self._group_by_columns(inserts):
+            self.db.execute(insert(Schedule.__table__), group)
+        for _, group in self._group_by_columns(updates):
+            self.db.execute(update(Schedule), group)
+        self.inserted += len(inserts)
+        self.updated += len(updates)
+
+    def _commit(self):
+        self.db.commit()
+        self._committed = True
+        for section_id, planned_exit, actual_exit, sign in self._completions:
+            kpi_history.record(section_id, planned_exit, actual_exit, sign)
+        self._completions = []
+
+    def finish(self) -> Dict[str, Any]:
+        """Commit, or roll back when atomic and any row was invalid; returns the summary."""
+        if self.atomic and self.invalid:
+            self.db.rollback()
+            raise ValueError(f"{self.invalid} invalid rows; nothing was imported")
+        self._commit()
+        self._reload()
+        return self.summary()
+
+    def abort(self):
+        """Roll back the batch in progress; batches already committed stay imported."""
+        self.db.rollback()
+        self._completions = []
+        if self._committed:
+            self._reload()
+
+    def _reload(self):
+        if self.spec.model is Schedule:
+            if schedule_conflicts.loaded:
+                schedule_conflicts.rebuild(self.db)
+            if kpi_rollup.loaded:
+                kpi_rollup.rebuild(self.db)
+        elif live_state.loaded:
+            live_state.rebuild(self.db)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "entity": self.spec.name,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+        }
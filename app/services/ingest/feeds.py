@@ -0,0 +1,172 @@
+from __future__ import annotations
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Any, Optional
+
+import httpx
+
+from app.models.train import TrainStatus
+
+# Seconds between reconnect attempts of a dropped feed
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+class PositionEvent:
+    __slots__ = ("train_id", "train_number", "section_id", "position_km", "status", "timestamp")
+
+    def __init__(self, train_id: Optional[int], train_number: Optional[str], section_id: Optional[int],
+                 position_km: float, status: Optional[TrainStatus], timestamp: Optional[datetime]):
+        self.train_id = train_id
+        self.train_number = train_number
+        self.section_id = section_id
+        self.position_km = position_km
+        self.status = status
+        self.timestamp = timestamp
+
+
+def parse_event(raw: Dict[str, Any]) -> Optional[PositionEvent]:
+    """
+    One position report: {"train_id" or "train_number", "section_id", "position_km",
+    optional "status" (a TrainStatus value) and "timestamp" (ISO)}. None when malformed.
+    """
+    try:
+        train_id = raw.get("train_id")
+        train_number = raw.get("train_number")
+        if train_id is None and not train_number:
+            return None
+        section_id = raw.get("section_id")
+        timestamp = datetime.fromisoformat(raw["timestamp"]) if raw.get("timestamp") else None
+        if timestamp is not None and timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        status = raw.get("status")
+        return PositionEvent(
+            train_id=int(train_id) if train_id is not None else None,
+            train_number=str(train_number) if train_number else None,
+            section_id=int(section_id) if section_id is not None else None,
+            position_km=float(raw.get("position_km") or 0.0),
+            status=TrainStatus(status) if status else None,
+            timestamp=timestamp,
+        )
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _parse_line(line: bytes | str) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        raw = json.loads(line)
+    except ValueError:
+        return {}
+    return raw if isinstance(raw, dict) else {}
+
+
+class FileReplaySource:
+    """Replays a JSON-lines file of position reports, optionally paced to rate events per second."""
+
+    def __init__(self, path: str, rate: Optional[float] = None, repeat: bool = False, chunk_lines: int = 1000):
+        self.path = path
+        self.rate = rate
+        self.repeat = repeat
+        self.chunk_lines = chunk_lines
+
+    def __repr__(self):
+        return f"file:{self.path}"
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        while True:
+            with open(self.path, "r", encoding="utf-8") as f:
+                started = loop.time()
+                sent = 0
+                while True:
+                    # Read off the event loop, a chunk at a time
+                    lines: List[str] = await asyncio.to_thread(f.readlines, self.chunk_lines * 100)
+                    if not lines:
+                        break
+                    for line in lines:
+                        raw = _parse_line(line)
+                        if raw is None:
+                            continue
+                        yield raw
+                        sent += 1
+                        if self.rate:
+                            ahead = sent / self.rate - (loop.time() - started)
+                            if ahead > 0.01:
+                                await asyncio.sleep(ahead)
+            if not self.repeat:
+                return
+
+
+class SocketSource:
+    """Reads JSON-lines position reports from a TCP feed, reconnecting when it drops."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    def __repr__(self):
+        return f"tcp://{self.host}:{self.port}"
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                continue
+            try:
+                async for line in reader:
+                    raw = _parse_line(line)
+                    if raw is not None:
+                        yield raw
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+class HttpPollSource:
+    """
+    Polls an HTTP feed such as the TMS or signaling API. The response is a JSON list of
+    position reports or an object with a "positions" list.
+    """
+
+    def __init__(self, url: str, interval_seconds: float, api_key: Optional[str] = None):
+        self.url = url
+        self.interval_seconds = interval_seconds
+        self.api_key = api_key
+
+    def __repr__(self):
+        return self.url
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        headers = {"X-API-Key": self.api_key} if self.api_key else {}
+        async with httpx.AsyncClient(headers=headers, timeout=self.interval_seconds) as client:
+            while True:
+                try:
+                    response = await client.get(self.url)
+                    response.raise_for_status()
+                    body = response.json()
+                except (httpx.HTTPError, ValueError):
+                    await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                    continue
+                positions = body.get("positions", []) if isinstance(body, dict) else body
+                for raw in positions if isinstance(positions, list) else []:
+                    yield raw if isinstance(raw, dict) else {}
+                await asyncio.sleep(self.interval_seconds)
+
+
+def feed_from_url(url: str, poll_interval_seconds: float, api_key: Optional[str] = None):
+    """Build a feed source from "file:<path>", "tcp://host:port" or an http(s) URL."""
+    if url.startswith("file:"):
+        return FileReplaySource(url[len("file:"):])
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://"):].rpartition(":")
+        return SocketSource(host, int(port))
+    if url.startswith(("http://", "https://")):
+        return HttpPollSource(url, poll_interval_seconds, api_key)
+    raise ValueError(f"Unsupported feed '{url}'")
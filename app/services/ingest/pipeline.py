@@ -0,0 +1,247 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Callable, Dict, List, Any, Optional
+
+import structlog
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.train import Train
+from app.services.ingest.feeds import PositionEvent, parse_event, feed_from_url
+from app.services.monitoring.live_state import live_state
+
+logger = structlog.get_logger()
+
+def write_positions(rows: List[Dict[str, Any]]):
+    """Bulk UPDATE by primary key in one transaction; rows carry id plus the changed columns."""
+    db = SessionLocal()
+    try:
+        db.execute(update(Train), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+class PositionIngestPipeline:
+    """
+    Streams position reports from feed sources into the live state and the trains table.
+
+    Sources push raw reports onto a bounded queue. A single batcher drains it, coalescing
+    reports per train so only the newest position survives, and flushes every
+    flush_interval_ms or once batch_size trains are pending. A flush hands the batch to one
+    bulk UPDATE in a worker thread and applies it to the live state once it is written, so
+    the live state never shows a position the database does not have. The next batch
+    builds while that write runs. If the write is still running when the next batch is due,
+    the batcher waits for it. The queue then fills and sources block on put, which is the
+    back-pressure. Reports older than the last one applied for a train are dropped, as are
+    reports for a section that does not exist.
+
+    When a bulk UPDATE fails its rows are retried one at a time, so one bad row does not
+    take the rest of the batch with it. Rows that still fail are logged and left out of
+    the live state.
+    """
+
+    def __init__(self, batch_size: int, flush_interval_ms: int, queue_max: int,
+                 write: Callable[[List[Dict[str, Any]]], None] = write_positions):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.queue_max = queue_max
+        self.write = write
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._sources: List[asyncio.Task] = []
+        self._writing: Optional[asyncio.Task] = None
+        self._last_seen: Dict[int, Any] = {}
+        self._numbers: Dict[str, int] = {}
+        self._counts = {
+            "received": 0, "invalid": 0, "unknown_train": 0, "unknown_section": 0, "stale": 0, "coalesced": 0,
+            "written": 0, "batches": 0, "write_errors": 0,
+        }
+        self._started_at: Optional[float] = None
+        self._last_write_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._batcher is not None and not self._batcher.done()
+
+    async def start(self, sources: Optional[List[Any]] = None):
+        if not self.running:
+            await asyncio.to_thread(self._load_state)
+            self._queue = asyncio.Queue(maxsize=self.queue_max)
+            self._started_at = time.monotonic()
+            self._batcher = asyncio.create_task(self._run())
+        for source in sources or []:
+            self._sources.append(asyncio.create_task(self._pump(source), name=repr(source)))
+
+    @staticmethod
+    def _load_state():
+        db = SessionLocal()
+        try:
+            live_state.ensure_loaded(db)
+        finally:
+            db.close()
+
+    async def stop(self):
+        for task in self._sources:
+            task.cancel()
+        await asyncio.gather(*self._sources, return_exceptions=True)
+        self._sources = []
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+            self._writing = None
+
+    async def _pump(self, source):
+        async for raw in source:
+            await self._queue.put(raw)
+
+    def offer(self, reports: List[Dict[str, Any]]) -> int:
+        """Queue reports without waiting; returns how many fit before the queue was full."""
+        accepted = 0
+        for raw in reports:
+            try:
+                self._queue.put_nowait(raw)
+            except asyncio.QueueFull:
+                break
+            accepted += 1
+        return accepted
+
+    def _resolve(self, event: PositionEvent, trains) -> Optional[int]:
+        if event.train_id is not None:
+            return event.train_id if event.train_id in trains else None
+        train_id = self._numbers.get(event.train_number)
+        if train_id is None or train_id not in trains:
+            self._numbers = {t.train_number: t.id for t in trains.values()}
+            train_id = self._numbers.get(event.train_number)
+        return train_id
+
+    def _add(self, raw: Dict[str, Any], pending: Dict[int, PositionEvent], state):
+        self._counts["received"] += 1
+        event = parse_event(raw)
+        if event is None:
+            self._counts["invalid"] += 1
+            return
+        train_id = self._resolve(event, state.trains)
+        if train_id is None:
+            self._counts["unknown_train"] += 1
+            return
+        if event.section_id is not None and event.section_id not in state.sections:
+            self._counts["unknown_section"] += 1
+            return
+        event.train_id = train_id
+        newest = pending.get(train_id)
+        last = newest.timestamp if newest is not None else self._last_seen.get(train_id)
+        if event.timestamp is not None and last is not None and event.timestamp < last:
+            self._counts["stale"] += 1
+            return
+        if newest is not None:
+            self._counts["coalesced"] += 1
+        pending[train_id] = event
+
+    async def _run(self):
+        pending: Dict[int, PositionEvent] = {}
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                deadline = loop.time() + self.flush_interval
+                state = live_state.snapshot()
+                while len(pending) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        raw = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    self._add(raw, pending, state)
+                    # Drain whatever is already queued without a wait per report
+                    while len(pending) < self.batch_size and not self._queue.empty():
+                        self._add(self._queue.get_nowait(), pending, state)
+                if pending:
+                    await self._flush(pending)
+                    pending = {}
+        finally:
+            if pending:
+                await self._flush(pending)
+
+    async def _flush(self, batch: Dict[int, PositionEvent]):
+        for e in batch.values():
+            if e.timestamp is not None:
+                self._last_seen[e.train_id] = e.timestamp
+
+        # One write in flight: wait for the previous one before starting the next
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        self._writing = asyncio.create_task(self._write(list(batch.values())))
+
+    async def _write(self, events: List[PositionEvent]):
+        if not events:
+            return
+        started = time.perf_counter()
+        # Rows with and without a status change go in separate executemany batches
+        groups: Dict[bool, List[Dict[str, Any]]] = {}
+        for e in events:
+            row = {"id": e.train_id, "current_section_id": e.section_id, "current_position_km": e.position_km}
+            if e.status is not None:
+                row["status"] = e.status
+            groups.setdefault("status" in row, []).append(row)
+        written = set()
+        for group in groups.values():
+            try:
+                await asyncio.to_thread(self.write, group)
+            except Exception as e:
+                logger.warning("Position batch write failed, retrying rows", rows=len(group), error=str(e))
+                written.update(await self._write_rows(group))
+            else:
+                written.update(row["id"] for row in group)
+        live_state.update_positions(
+            (e.train_id, e.section_id, e.position_km, e.status) for e in events if e.train_id in written
+        )
+        self._last_write_ms = (time.perf_counter() - started) * 1000
+        self._counts["written"] += len(written)
+        self._counts["batches"] += 1
+
+    async def _write_rows(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """Write rows one per transaction; returns the ids that were written."""
+        written = []
+        for row in rows:
+            try:
+                await asyncio.to_thread(self.write, [row])
+            except Exception as e:
+                self._counts["write_errors"] += 1
+                logger.error("Position write failed", train_id=row["id"],
+                             section_id=row["current_section_id"], error=str(e))
+            else:
+                written.append(row["id"])
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "running": self.running,
+            "feeds": [task.get_name() for task in self._sources if not task.done()],
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_max": self.queue_max,
+            **self._counts,
+            "events_per_second": round(self._counts["received"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "last_write_ms": round(self._last_write_ms, 2),
+        }
+
+
+def configured_feeds() -> List[Any]:
+    """Feeds from INGEST_FEEDS, or the TMS and signaling APIs when none are listed."""
+    urls = settings.INGEST_FEEDS or [settings.TMS_API_URL, settings.SIGNALING_API_URL]
+    return [feed_from_url(url, settings.INGEST_POLL_INTERVAL_SECONDS, settings.RAILWAY_API_KEY) for url in urls]
+
+
+# Shared pipeline for the API process
+position_ingest = PositionIngestPipeline(
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+    queue_max=settings.INGEST_QUEUE_MAX,
+)
@@ -0,0 +1,262 @@
+from __future__ import annotations
+import asyncio
+import enum
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Any, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.decision import Decision
+from app.services.monitoring.conflicts import schedule_conflicts
+from app.services.monitoring.kpis import kpi_rollup
+from app.services.monitoring.live_state import live_state, NetworkSnapshot, TrainRecord, SectionRecord
+
+logger = structlog.get_logger()
+
+# Queued to a subscriber that fell behind in place of the diffs it missed
+RESYNC = None
+
+TRAIN_PUSH_FIELDS = (
+    "id", "train_number", "train_name", "train_type", "status", "priority", "current_section_id",
+    "current_position_km", "max_speed", "origin_station", "destination_station",
+    "scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival",
+)
+SECTION_PUSH_FIELDS = (
+    "id", "section_code", "section_name", "section_type", "start_station", "end_station", "length_km",
+    "max_speed_limit", "max_trains_per_hour", "current_occupancy", "is_active",
+)
+DECISION_PUSH_FIELDS = (
+    "id", "decision_type", "status", "train_id", "section_id", "explanation", "recommended_by", "approved_by",
+)
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return str(value)
+
+
+def _encode(message: Dict[str, Any]) -> str:
+    return json.dumps(message, default=_json_default, separators=(",", ":"))
+
+
+def _train_payload(t: TrainRecord) -> Dict[str, Any]:
+    return {name: getattr(t, name) for name in TRAIN_PUSH_FIELDS}
+
+
+def _section_payload(s: SectionRecord) -> Dict[str, Any]:
+    payload = {name: getattr(s, name) for name in SECTION_PUSH_FIELDS}
+    payload["utilization_percentage"] = round(s.utilization_percentage, 2)
+    return payload
+
+
+class Subscriber:
+    __slots__ = ("queue",)
+
+    def __init__(self, queue_max: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_max)
+
+
+class LiveBroadcaster:
+    """
+    Pushes network changes to any number of WebSocket/SSE subscribers.
+
+    One broadcast loop wakes every interval_ms and diffs the current live-state snapshot
+    against the last one it sent. Records are replaced on write, so a changed train or section
+    is one whose record is no longer the same object. New and updated decisions and conflict
+    changes are queued by commit hooks. KPIs are recomputed every kpi_interval_seconds and only
+    the changed values are sent. Each tick encodes at most one diff message and every
+    subscriber receives the same string. A subscriber whose queue overflows gets RESYNC
+    instead of the diffs it missed and must be sent a full snapshot.
+    """
+
+    def __init__(self, interval_ms: int, kpi_interval_seconds: float, subscriber_queue_max: int):
+        self.interval = interval_ms / 1000.0
+        self.kpi_interval = kpi_interval_seconds
+        self.subscriber_queue_max = subscriber_queue_max
+        self._subscribers: Set[Subscriber] = set()
+        self._events: Deque[Tuple[str, Any]] = deque()  # appended from worker threads
+        self._task: Optional[asyncio.Task] = None
+        self._last_state: Optional[NetworkSnapshot] = None
+        self._kpis: Dict[str, float] = {}
+        self._kpis_at = 0.0
+        self.messages_sent = 0
+        self.resyncs = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            await asyncio.to_thread(self._load)
+            self._last_state = live_state.snapshot()
+            self._task = asyncio.create_task(self._run())
+
+    @staticmethod
+    def _load():
+        db = SessionLocal()
+        try:
+            live_state.ensure_loaded(db)
+            schedule_conflicts.ensure_loaded(db)
+        finally:
+            db.close()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def subscribe(self) -> Subscriber:
+        await self.start()
+        subscriber = Subscriber(self.subscriber_queue_max)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def notify(self, kind: str, payload: Any):
+        """Queue a "decision" or "conflicts" change for the next tick; safe from any thread."""
+        if self._task is not None:
+            self._events.append((kind, payload))
+
+    def snapshot_message(self) -> str:
+        state = live_state.snapshot()
+        return _encode({
+            "type": "snapshot",
+            "version": state.version,
+            "trains": [_train_payload(t) for t in state.trains.values()],
+            "sections": [_section_payload(s) for s in state.sections.values()],
+            "holds": {str(tid): until for tid, until in state.holds.items()},
+            "kpis": self._kpis,
+        })
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                message = await self._tick()
+            except Exception as e:
+                self.errors += 1
+                # A failure that repeats every tick is logged once
+                if str(e) != self.last_error:
+                    logger.error("Live broadcast tick failed", error=str(e))
+                self.last_error = str(e)
+                continue
+            if message is None or not self._subscribers:
+                continue
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Slow consumer: drop its backlog and have it reload
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    subscriber.queue.put_nowait(RESYNC)
+                    self.resyncs += 1
+            self.messages_sent += 1
+
+    async def _tick(self) -> Optional[str]:
+        message: Dict[str, Any] = {}
+        state = live_state.snapshot()
+        previous = self._last_state
+        if previous is not None and state.version != previous.version:
+            message.update(self._diff("trains", previous.trains, state.trains, _train_payload))
+            message.update(self._diff("sections", previous.sections, state.sections, _section_payload))
+            if state.holds != previous.holds:
+                message["holds"] = {str(tid): until for tid, until in state.holds.items()}
+        self._last_state = state
+
+        decisions: Dict[int, Dict[str, Any]] = {}
+        added: List[Dict[str, Any]] = []
+        resolved: List[Dict[str, Any]] = []
+        while self._events:
+            kind, payload = self._events.popleft()
+            if kind == "decision":
+                decisions[payload["id"]] = payload
+            elif kind == "conflicts":
+                added.extend(payload[0])
+                resolved.extend(payload[1])
+        if decisions:
+            message["decisions"] = list(decisions.values())
+        if added or resolved:
+            message["conflicts"] = {"added": added, "resolved": resolved}
+
+        if self._subscribers and time.monotonic() - self._kpis_at >= self.kpi_interval:
+            self._kpis_at = time.monotonic()
+            kpis = await asyncio.to_thread(self._compute_kpis)
+            changed = {k: v for k, v in kpis.items() if self._kpis.get(k) != v}
+            self._kpis = kpis
+            if changed:
+                message["kpis"] = changed
+
+        if not message:
+            return None
+        return _encode({"type": "diff", "version": state.version, **message})
+
+    @staticmethod
+    def _diff(name: str, before: Dict[int, Any], after: Dict[int, Any], payload) -> Dict[str, Any]:
+        if before is after:
+            return {}
+        changed = [payload(r) for key, r in after.items() if before.get(key) is not r]
+        removed = [key for key in before if key not in after]
+        if not changed and not removed:
+            return {}
+        return {name: {"changed": changed, "removed": removed}}
+
+    @staticmethod
+    def _compute_kpis() -> Dict[str, float]:
+        db = SessionLocal()
+        try:
+            return kpi_rollup.kpis(db)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "subscribers": len(self._subscribers),
+            "messages_sent": self.messages_sent,
+            "resyncs": self.resyncs,
+            "pending_events": len(self._events),
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+# Shared broadcaster for the API process
+live_broadcaster = LiveBroadcaster(
+    interval_ms=settings.LIVE_PUSH_INTERVAL_MS,
+    kpi_interval_seconds=settings.LIVE_KPI_INTERVAL_SECONDS,
+    subscriber_queue_max=settings.LIVE_SUBSCRIBER_QUEUE_MAX,
+)
+
+schedule_conflicts.subscribe(lambda added, resolved: live_broadcaster.notify("conflicts", (added, resolved)))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_decisions(session: Session, flush_context):
+    pending = session.info.setdefault("decision_changes", [])
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Decision) and obj.id is not None:
+            pending.append({name: getattr(obj, name) for name in DECISION_PUSH_FIELDS})
+
+
+@event.listens_for(Session, "after_commit")
+def _push_decisions(session: Session):
+    for decision in session.info.pop("decision_changes", None) or []:
+        live_broadcaster.notify("decision", decision)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_decisions(session: Session):
+    session.info.pop("decision_changes", None)
@@ -0,0 +1,288 @@
+from __future__ import annotations
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Any, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.schedule import Schedule, ScheduleStatus
+
+# Rows in these states no longer claim the section
+INACTIVE_STATUSES = (ScheduleStatus.CANCELLED, ScheduleStatus.COMPLETED)
+
+CONFLICT_KINDS = ("overlap", "headway", "train_overlap")
+
+ConflictKey = Tuple[str, int, int]  # (kind, lower schedule_id, higher schedule_id)
+
+
+class _Row:
+    __slots__ = ("schedule_id", "train_id", "section_id", "track", "entry", "exit")
+
+    def __init__(self, schedule_id: int, train_id: int, section_id: int, track: Optional[str],
+                 entry: datetime, exit: datetime):
+        self.schedule_id = schedule_id
+        self.train_id = train_id
+        self.section_id = section_id
+        self.track = track
+        self.entry = entry
+        self.exit = max(entry, exit)
+
+    @staticmethod
+    def from_schedule(row: Any) -> Optional["_Row"]:
+        """Snapshot of a Schedule (or a row with its columns); None when it no longer claims the section."""
+        if row.status in INACTIVE_STATUSES or row.planned_entry is None or row.planned_exit is None:
+            return None
+        return _Row(row.id, row.train_id, row.section_id, row.track or None, row.planned_entry, row.planned_exit)
+
+
+class _Lane:
+    """Intervals sharing one resource, sorted by entry, for range queries in O(log n + k)."""
+    __slots__ = ("items", "max_length")
+
+    def __init__(self):
+        self.items: List[Tuple[datetime, datetime, int]] = []  # (entry, exit, schedule_id)
+        self.max_length = timedelta(0)  # only grows, which keeps queries correct if slightly wider
+
+    def add(self, row: _Row):
+        insort(self.items, (row.entry, row.exit, row.schedule_id))
+        self.max_length = max(self.max_length, row.exit - row.entry)
+
+    def remove(self, row: _Row):
+        key = (row.entry, row.exit, row.schedule_id)
+        i = bisect_left(self.items, key)
+        if i < len(self.items) and self.items[i] == key:
+            del self.items[i]
+
+    def near(self, start: datetime, end: datetime) -> Iterable[int]:
+        """schedule_ids of intervals with entry < end and exit > start."""
+        lo = bisect_left(self.items, (start - self.max_length,))
+        hi = bisect_left(self.items, (end,))
+        for entry, exit, schedule_id in self.items[lo:hi]:
+            if exit > start:
+                yield schedule_id
+
+
+class ScheduleConflictIndex:
+    """
+    Conflicts between active Schedule rows, kept current as rows change:
+    - overlap: two rows hold the same section and track at the same time
+    - headway: two rows on the same section and track follow closer than headway_minutes
+    - train_overlap: one train is planned on two sections at the same time
+    Rows without a track share one lane per section. Intervals are indexed per lane sorted by
+    entry; a full build is a sweep line in O(n log n + k) and a single row change re-checks only
+    the rows near it in O(log n + k).
+
+    The index is filled from the database on first use and then follows Schedule rows committed
+    through ORM sessions. Bulk query.update()/delete() skip the ORM, so call rebuild after those.
+    """
+
+    def __init__(self, headway_minutes: float):
+        self.headway = timedelta(minutes=headway_minutes)
+        self.loaded = False
+        self._rows: Dict[int, _Row] = {}
+        self._lanes: Dict[Tuple[int, Optional[str]], _Lane] = {}
+        self._train_lanes: Dict[int, _Lane] = {}
+        self._conflicts: Dict[ConflictKey, Dict[str, Any]] = {}
+        self._by_schedule: Dict[int, Set[ConflictKey]] = {}
+        self._listeners: List[Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]] = []
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.rebuild(db)
+
+    def rebuild(self, db: Session) -> Dict[str, Any]:
+        rows = (
+            db.query(
+                Schedule.id, Schedule.train_id, Schedule.section_id, Schedule.track,
+                Schedule.planned_entry, Schedule.planned_exit, Schedule.status,
+            )
+            .filter(Schedule.status.notin_(INACTIVE_STATUSES))
+            .all()
+        )
+        self.load([r for r in map(_Row.from_schedule, rows) if r is not None])
+        return self.stats()
+
+    def load(self, rows: List[_Row]):
+        """Replace the index contents, finding every conflict with one sweep per lane."""
+        lanes: Dict[Tuple[int, Optional[str]], List[_Row]] = {}
+        train_lanes: Dict[int, List[_Row]] = {}
+        for row in rows:
+            lanes.setdefault((row.section_id, row.track), []).append(row)
+            train_lanes.setdefault(row.train_id, []).append(row)
+
+        with self._lock:
+            self._rows = {row.schedule_id: row for row in rows}
+            self._lanes, self._train_lanes = {}, {}
+            self._conflicts, self._by_schedule = {}, {}
+            for key, lane_rows in lanes.items():
+                self._lanes[key] = self._sweep(lane_rows, self.headway, same_train_lane=False)
+            for key, lane_rows in train_lanes.items():
+                self._train_lanes[key] = self._sweep(lane_rows, timedelta(0), same_train_lane=True)
+            self.loaded = True
+
+    def _sweep(self, rows: List[_Row], headway: timedelta, same_train_lane: bool) -> _Lane:
+        rows.sort(key=lambda r: (r.entry, r.exit, r.schedule_id))
+        active: List[Tuple[datetime, int]] = []  # min-heap of (exit + headway, schedule_id)
+        for row in rows:
+            while active and active[0][0] <= row.entry:
+                heapq.heappop(active)
+            for _, other_id in active:
+                self._record(self._rows[other_id], row, same_train_lane)
+            heapq.heappush(active, (row.exit + headway, row.schedule_id))
+        lane = _Lane()
+        lane.items = [(r.entry, r.exit, r.schedule_id) for r in rows]
+        lane.max_length = max((r.exit - r.entry for r in rows), default=timedelta(0))
+        return lane
+
+    def _record(self, a: _Row, b: _Row, same_train_lane: bool) -> Optional[Dict[str, Any]]:
+        if same_train_lane:
+            if a.section_id == b.section_id or not (a.entry < b.exit and b.entry < a.exit):
+                return None
+            kind = "train_overlap"
+        else:
+            kind = "overlap" if a.entry < b.exit and b.entry < a.exit else "headway"
+        first, second = (a, b) if (a.entry, a.schedule_id) <= (b.entry, b.schedule_id) else (b, a)
+        key = (kind, min(a.schedule_id, b.schedule_id), max(a.schedule_id, b.schedule_id))
+        conflict = {
+            "kind": kind,
+            "schedule_ids": [first.schedule_id, second.schedule_id],
+            "train_ids": [first.train_id, second.train_id],
+            "section_ids": [first.section_id, second.section_id],
+            "track": first.track if not same_train_lane else None,
+            "start": second.entry if kind != "headway" else first.exit,
+            "end": min(first.exit, second.exit) if kind != "headway" else second.entry,
+            # Negative when the intervals overlap
+            "separation_minutes": round((second.entry - first.exit).total_seconds() / 60.0, 2),
+            "required_minutes": round(self.headway.total_seconds() / 60.0, 2) if kind == "headway" else 0.0,
+        }
+        self._conflicts[key] = conflict
+        self._by_schedule.setdefault(a.schedule_id, set()).add(key)
+        self._by_schedule.setdefault(b.schedule_id, set()).add(key)
+        return conflict
+
+    def _drop(self, schedule_id: int) -> List[Dict[str, Any]]:
+        resolved = []
+        for key in self._by_schedule.pop(schedule_id, set()):
+            conflict = self._conflicts.pop(key, None)
+            if conflict is None:
+                continue
+            resolved.append(conflict)
+            other = key[2] if key[1] == schedule_id else key[1]
+            keys = self._by_schedule.get(other)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_schedule[other]
+        return resolved
+
+    def apply(self, changes: Dict[int, Optional[_Row]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Apply row changes keyed by schedule_id (None removes the row) and return the
+        (added, resolved) conflicts. A conflict re-found unchanged for a moved row is in neither.
+        """
+        with self._lock:
+            before: Dict[ConflictKey, Dict[str, Any]] = {}
+            after: Dict[ConflictKey, Dict[str, Any]] = {}
+            for schedule_id, row in changes.items():
+                old = self._rows.pop(schedule_id, None)
+                if old is not None:
+                    self._lanes[(old.section_id, old.track)].remove(old)
+                    self._train_lanes[old.train_id].remove(old)
+                    for conflict in self._drop(schedule_id):
+                        key = (conflict["kind"], *sorted(conflict["schedule_ids"]))
+                        if after.pop(key, None) is None:
+                            before.setdefault(key, conflict)
+                if row is None:
+                    continue
+                self._rows[schedule_id] = row
+                lane = self._lanes.setdefault((row.section_id, row.track), _Lane())
+                for other_id in lane.near(row.entry - self.headway, row.exit + self.headway):
+                    conflict = self._record(self._rows[other_id], row, same_train_lane=False)
+                    after[(conflict["kind"], *sorted(conflict["schedule_ids"]))] = conflict
+                lane.add(row)
+                train_lane = self._train_lanes.setdefault(row.train_id, _Lane())
+                for other_id in train_lane.near(row.entry, row.exit):
+                    conflict = self._record(self._rows[other_id], row, same_train_lane=True)
+                    if conflict is not None:
+                        after[(conflict["kind"], *sorted(conflict["schedule_ids"]))] = conflict
+                train_lane.add(row)
+
+            added = [c for key, c in after.items() if before.get(key) != c]
+            resolved = [c for key, c in before.items() if key not in after]
+            listeners = list(self._listeners)
+        if added or resolved:
+            for listener in listeners:
+                listener(added, resolved)
+        return added, resolved
+
+    def subscribe(self, listener: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]):
+        """Call listener(added, resolved) after every change that alters the conflict set."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def conflicts(
+        self,
+        section_id: Optional[int] = None,
+        kind: Optional[str] = None,
+        schedule_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            if schedule_id is not None:
+                found = [self._conflicts[k] for k in self._by_schedule.get(schedule_id, ())]
+            else:
+                found = list(self._conflicts.values())
+        if section_id is not None:
+            found = [c for c in found if section_id in c["section_ids"]]
+        if kind is not None:
+            found = [c for c in found if c["kind"] == kind]
+        found.sort(key=lambda c: (c["start"], c["schedule_ids"]))
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {k: 0 for k in CONFLICT_KINDS}
+            for key in self._conflicts:
+                counts[key[0]] += 1
+            return {
+                "schedules": len(self._rows),
+                "lanes": len(self._lanes),
+                "conflicts": len(self._conflicts),
+                **counts,
+            }
+
+
+# Shared index for the API process
+schedule_conflicts = ScheduleConflictIndex(headway_minutes=settings.CONFLICT_HEADWAY_MINUTES)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_schedule_changes(session: Session, flush_context):
+    pending = session.info.setdefault("schedule_changes", {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Schedule) and obj.id is not None:
+            pending[obj.id] = _Row.from_schedule(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Schedule) and obj.id is not None:
+            pending[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_schedule_changes(session: Session):
+    pending = session.info.pop("schedule_changes", None)
+    if pending and schedule_conflicts.loaded:
+        schedule_conflicts.apply(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_schedule_changes(session: Session):
+    session.info.pop("schedule_changes", None)
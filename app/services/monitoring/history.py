@@ -0,0 +1,354 @@
+from __future__ import annotations
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from sqlalchemy import event, delete, func, select
+from sqlalchemy.orm import Session, attributes
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.kpi import KPIBucket, DELAY_BIN_EDGES, DELAY_BIN_COUNT
+from app.models.schedule import Schedule
+
+# Bucket sizes kept, finest first
+RESOLUTIONS: Dict[str, int] = {"1m": 60, "15m": 900, "1h": 3600}
+
+BIN_FIELDS = tuple(f"delay_bin_{i}" for i in range(DELAY_BIN_COUNT))
+COUNTER_FIELDS = ("completed", "on_time", "delayed", "delay_minutes_sum") + BIN_FIELDS
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(at: datetime, seconds: int) -> datetime:
+    elapsed = int((at - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _delay_bin(delay_minutes: float) -> int:
+    for i, edge in enumerate(DELAY_BIN_EDGES):
+        if delay_minutes <= edge:
+            return i
+    return len(DELAY_BIN_EDGES)
+
+
+def _terms(planned_exit: datetime, actual_exit: datetime, sign: int) -> List[float]:
+    """Counter increments, in COUNTER_FIELDS order, for one completed schedule."""
+    delay = (actual_exit - planned_exit).total_seconds() / 60.0
+    terms = [sign, sign if delay <= 0 else 0, sign if delay > 0 else 0, sign * delay if delay > 0 else 0.0]
+    bins = [0] * DELAY_BIN_COUNT
+    bins[_delay_bin(delay)] = sign
+    return terms + bins
+
+
+def _bin_labels() -> List[Tuple[str, Optional[float], Optional[float]]]:
+    labels = [("on time", None, 0.0)]
+    for low, high in zip(DELAY_BIN_EDGES, DELAY_BIN_EDGES[1:]):
+        labels.append((f"{low}-{high} min", float(low), float(high)))
+    labels.append((f">{DELAY_BIN_EDGES[-1]} min", float(DELAY_BIN_EDGES[-1]), None))
+    return labels
+
+
+class KPIHistory:
+    """
+    Per-section KPI counters in 1 min, 15 min and 1 h buckets (the kpi_buckets table).
+
+    Completed schedules are counted from ORM commits into an in-memory buffer of 1 min
+    deltas. A flush, every flush_seconds and before each read, folds the buffer into each
+    resolution and adds it onto the stored rows, so the coarse buckets are downsampled at write
+    time and late or corrected completions land in every resolution. Rows older than a
+    resolution's retention are deleted. Reads pick the finest resolution that is still retained
+    for the requested range and fits max_points, and aggregate buckets in SQL; the schedules
+    table is only scanned by rebuild.
+    """
+
+    def __init__(self, retention: Dict[int, timedelta], flush_seconds: float):
+        self.retention = retention
+        self.flush_seconds = flush_seconds
+        self._buffer: Dict[Tuple[int, datetime], List[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_at: Optional[datetime] = None
+        self.rows_written = 0
+
+    def record(self, section_id: Optional[int], planned_exit: Optional[datetime],
+               actual_exit: Optional[datetime], sign: int = 1):
+        """Count (sign=1) or retract (sign=-1) one completion; safe from any thread."""
+        if section_id is None or planned_exit is None or actual_exit is None:
+            return
+        terms = _terms(planned_exit, actual_exit, sign)
+        key = (section_id, bucket_start(actual_exit, RESOLUTIONS["1m"]))
+        with self._lock:
+            counters = self._buffer.get(key)
+            if counters is None:
+                self._buffer[key] = terms
+            else:
+                for i, value in enumerate(terms):
+                    counters[i] += value
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """Write buffered deltas; returns the number of bucket rows touched."""
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, {}
+            own_session = db is None
+            db = db or SessionLocal()
+            try:
+                written = self._write(db, buffer) if buffer else 0
+                if self._pruned_at is None or datetime.utcnow() - self._pruned_at >= timedelta(hours=1):
+                    self._prune(db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Keep the deltas for the next flush
+                for (section_id, start), terms in buffer.items():
+                    with self._lock:
+                        counters = self._buffer.setdefault((section_id, start), [0] * len(COUNTER_FIELDS))
+                        for i, value in enumerate(terms):
+                            counters[i] += value
+                raise
+            finally:
+                if own_session:
+                    db.close()
+        self.rows_written += written
+        return written
+
+    def _write(self, db: Session, buffer: Dict[Tuple[int, datetime], List[float]]) -> int:
+        now = datetime.utcnow()
+        written = 0
+        for seconds, kept in self.retention.items():
+            deltas: Dict[Tuple[int, datetime], List[float]] = {}
+            for (section_id, minute), terms in buffer.items():
+                start = bucket_start(minute, seconds)
+                if start + timedelta(seconds=seconds) < now - kept:
+                    continue
+                counters = deltas.setdefault((section_id, start), [0] * len(COUNTER_FIELDS))
+                for i, value in enumerate(terms):
+                    counters[i] += value
+            if not deltas:
+                continue
+            starts = [start for _, start in deltas]
+            existing = {
+                (row.section_id, row.bucket_start): row
+                for row in db.execute(
+                    select(KPIBucket).where(
+                        KPIBucket.resolution_seconds == seconds,
+                        KPIBucket.bucket_start.between(min(starts), max(starts)),
+                        KPIBucket.section_id.in_({section_id for section_id, _ in deltas}),
+                    )
+                ).scalars()
+            }
+            for (section_id, start), counters in deltas.items():
+                row = existing.get((section_id, start))
+                if row is None:
+                    row = KPIBucket(section_id=section_id, resolution_seconds=seconds, bucket_start=start,
+                                    **{name: 0 for name in COUNTER_FIELDS})
+                    db.add(row)
+                for name, value in zip(COUNTER_FIELDS, counters):
+                    setattr(row, name, getattr(row, name) + value)
+                written += 1
+        return written
+
+    def _prune(self, db: Session):
+        now = datetime.utcnow()
+        for seconds, kept in self.retention.items():
+            db.execute(delete(KPIBucket).where(
+                KPIBucket.resolution_seconds == seconds,
+                KPIBucket.bucket_start < now - kept - timedelta(seconds=seconds),
+            ))
+        self._pruned_at = now
+
+    def resolution_for(self, start: datetime, end: datetime, max_points: int,
+                       resolution: Optional[str] = None) -> int:
+        if resolution is not None:
+            if resolution not in RESOLUTIONS:
+                raise ValueError(f"Unknown resolution '{resolution}', expected one of {', '.join(RESOLUTIONS)}")
+            return RESOLUTIONS[resolution]
+        now = datetime.utcnow()
+        span = (end - start).total_seconds()
+        for seconds in sorted(self.retention):
+            if start >= now - self.retention[seconds] and span / seconds <= max_points:
+                return seconds
+        return max(self.retention)
+
+    def _filters(self, seconds: int, start: datetime, end: datetime, section_id: Optional[int]):
+        filters = [
+            KPIBucket.resolution_seconds == seconds,
+            KPIBucket.bucket_start >= bucket_start(start, seconds),
+            KPIBucket.bucket_start < end,
+        ]
+        if section_id is not None:
+            filters.append(KPIBucket.section_id == section_id)
+        return filters
+
+    def timeseries(self, db: Session, start: datetime, end: datetime, section_id: Optional[int] = None,
+                   resolution: Optional[str] = None, max_points: int = 500) -> Dict[str, Any]:
+        if end <= start:
+            raise ValueError("end must be after start")
+        self.flush(db)
+        seconds = self.resolution_for(start, end, max_points, resolution)
+        rows = db.execute(
+            select(
+                KPIBucket.bucket_start,
+                func.sum(KPIBucket.completed),
+                func.sum(KPIBucket.on_time),
+                func.sum(KPIBucket.delayed),
+                func.sum(KPIBucket.delay_minutes_sum),
+            )
+            .where(*self._filters(seconds, start, end, section_id))
+            .group_by(KPIBucket.bucket_start)
+            .order_by(KPIBucket.bucket_start)
+        ).all()
+        hours = seconds / 3600.0
+        points = [
+            {
+                "bucket_start": at,
+                "completed": int(completed),
+                "on_time": int(on_time),
+                "delayed": int(delayed),
+                "average_delay_minutes": round(delay_sum / delayed, 2) if delayed else 0.0,
+                "throughput_per_hour": round(completed / hours, 2),
+            }
+            for at, completed, on_time, delayed, delay_sum in rows
+        ]
+        return {
+            "section_id": section_id,
+            "resolution": next(name for name, s in RESOLUTIONS.items() if s == seconds),
+            "start": start,
+            "end": end,
+            "points": points,
+        }
+
+    def histogram(self, db: Session, start: datetime, end: datetime, section_id: Optional[int] = None,
+                  max_points: int = 500) -> Dict[str, Any]:
+        if end <= start:
+            raise ValueError("end must be after start")
+        self.flush(db)
+        seconds = self.resolution_for(start, end, max_points)
+        totals = db.execute(
+            select(*[func.coalesce(func.sum(getattr(KPIBucket, name)), 0) for name in BIN_FIELDS])
+            .where(*self._filters(seconds, start, end, section_id))
+        ).one()
+        bins = [
+            {"label": label, "min_minutes": low, "max_minutes": high, "count": int(count)}
+            for (label, low, high), count in zip(_bin_labels(), totals)
+        ]
+        return {
+            "section_id": section_id,
+            "resolution": next(name for name, s in RESOLUTIONS.items() if s == seconds),
+            "start": start,
+            "end": end,
+            "total": sum(b["count"] for b in bins),
+            "bins": bins,
+        }
+
+    def rebuild(self, db: Session, since: datetime) -> Dict[str, Any]:
+        """Recount buckets from `since` (rounded down to the hour) by scanning completed schedules."""
+        since = bucket_start(since, max(RESOLUTIONS.values()))
+        self.flush(db)
+        with self._flush_lock:
+            db.execute(delete(KPIBucket).where(KPIBucket.bucket_start >= since))
+            buffer: Dict[Tuple[int, datetime], List[float]] = {}
+            scanned = 0
+            rows = db.execute(
+                select(Schedule.section_id, Schedule.planned_exit, Schedule.actual_exit)
+                .where(Schedule.actual_exit >= since)
+            )
+            for section_id, planned_exit, actual_exit in rows:
+                scanned += 1
+                key = (section_id, bucket_start(actual_exit, RESOLUTIONS["1m"]))
+                counters = buffer.setdefault(key, [0] * len(COUNTER_FIELDS))
+                for i, value in enumerate(_terms(planned_exit, actual_exit, 1)):
+                    counters[i] += value
+            written = self._write(db, buffer)
+            db.commit()
+        return {"since": since, "schedules_scanned": scanned, "buckets_written": written}
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                continue
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending_buckets": pending,
+            "rows_written": self.rows_written,
+            "retention_days": {
+                name: self.retention[seconds].days for name, seconds in RESOLUTIONS.items()
+            },
+        }
+
+
+# Shared history store for the API process
+kpi_history = KPIHistory(
+    retention={
+        RESOLUTIONS["1m"]: timedelta(days=settings.KPI_HISTORY_RETENTION_1M_DAYS),
+        RESOLUTIONS["15m"]: timedelta(days=settings.KPI_HISTORY_RETENTION_15M_DAYS),
+        RESOLUTIONS["1h"]: timedelta(days=settings.KPI_HISTORY_RETENTION_1H_DAYS),
+    },
+    flush_seconds=settings.KPI_HISTORY_FLUSH_SECONDS,
+)
+
+
+# Schedule columns a completion is counted by
+_HISTORY_FIELDS = ("section_id", "planned_exit", "actual_exit")
+
+
+def _old_and_new(obj: Schedule) -> Optional[Tuple[tuple, tuple]]:
+    """Pre- and post-flush (section_id, planned_exit, actual_exit); None when none changed."""
+    histories = [attributes.get_history(obj, name) for name in _HISTORY_FIELDS]
+    if not any(h.has_changes() for h in histories):
+        return None
+    old = tuple(h.deleted[0] if h.deleted else getattr(obj, name) for h, name in zip(histories, _HISTORY_FIELDS))
+    new = tuple(getattr(obj, name) for name in _HISTORY_FIELDS)
+    return old, new
+
+
+# Before the flush so deleted schedules can still be read
+@event.listens_for(Session, "before_flush")
+def _collect_history(session: Session, flush_context, instances):
+    pending = session.info.setdefault("kpi_history", [])
+    for obj in session.new:
+        if isinstance(obj, Schedule) and obj.actual_exit is not None:
+            pending.append((obj.section_id, obj.planned_exit, obj.actual_exit, 1))
+    for obj in session.dirty:
+        if isinstance(obj, Schedule):
+            changed = _old_and_new(obj)
+            if changed is not None:
+                # Retract under the old section and planned exit, count under the new ones
+                old, new = changed
+                pending.append(old + (-1,))
+                pending.append(new + (1,))
+    for obj in session.deleted:
+        if isinstance(obj, Schedule) and obj.actual_exit is not None:
+            pending.append((obj.section_id, obj.planned_exit, obj.actual_exit, -1))
+
+
+@event.listens_for(Session, "after_commit")
+def _record_history(session: Session):
+    for section_id, planned_exit, actual_exit, sign in session.info.pop("kpi_history", None) or []:
+        kpi_history.record(section_id, planned_exit, actual_exit, sign)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_history(session: Session):
+    session.info.pop("kpi_history", None)
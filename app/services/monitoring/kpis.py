@@ -0,0 +1,214 @@
+from __future__ import annotations
+import bisect
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from sqlalchemy import event, func, select, case
+from sqlalchemy.orm import Session
+
+from app.models.schedule import Schedule
+from app.models.train import Train
+from app.services.monitoring.live_state import live_state, TrainRecord, SectionRecord
+
+# Section throughput is schedules completed over this trailing window
+THROUGHPUT_WINDOW_HOURS = 6
+
+# Times a rebuild is retried when the live state changes under it
+_REBUILD_ATTEMPTS = 5
+
+
+def _delay_minutes_sql(dialect: str):
+    """Minutes actual_arrival is after scheduled_arrival, in the database's date arithmetic."""
+    if dialect == "sqlite":
+        return (func.julianday(Train.actual_arrival) - func.julianday(Train.scheduled_arrival)) * 1440.0
+    return func.extract("epoch", Train.actual_arrival - Train.scheduled_arrival) / 60.0
+
+
+def _train_terms(t: Optional[TrainRecord]):
+    """(with_arrival, on_time, delayed, delay_minutes) one train contributes."""
+    if t is None or t.scheduled_arrival is None:
+        return 0, 0, 0, 0.0
+    if t.actual_arrival is None:
+        return 1, 0, 0, 0.0
+    if t.actual_arrival <= t.scheduled_arrival:
+        return 1, 1, 0, 0.0
+    return 1, 0, 1, (t.actual_arrival - t.scheduled_arrival).total_seconds() / 60.0
+
+
+def _section_terms(s: Optional[SectionRecord]):
+    """(count, utilization percent) one section contributes."""
+    if s is None:
+        return 0, 0.0
+    if not s.max_trains_per_hour:
+        return 1, 0.0
+    return 1, (s.current_occupancy or 0) / s.max_trains_per_hour * 100
+
+
+class KPIRollup:
+    """
+    Running totals behind the network KPIs, so reading them is O(1) however many trains and
+    schedules the database holds.
+
+    Totals are seeded by SQL aggregates over trains and schedules, and from the live state for
+    section utilization since occupancy lives there. After that they are kept current by
+    deltas: the live state reports every train and section record it replaces, and completed
+    schedules are counted from ORM commits. Completions inside the throughput window are kept
+    sorted by time, and by schedule id so a changed actual_exit replaces its old entry; both
+    are pruned as the window moves. A full live-state reload marks the rollup
+    stale and the next read rebuilds it.
+    """
+
+    def __init__(self, window_hours: float = THROUGHPUT_WINDOW_HOURS):
+        self.window = timedelta(hours=window_hours)
+        self.loaded = False
+        self.rebuilt_at: Optional[datetime] = None
+        self._with_arrival = 0
+        self._on_time = 0
+        self._delayed = 0
+        self._delay_sum = 0.0
+        self._sections = 0
+        self._utilization_sum = 0.0
+        self._completions: List[Tuple[datetime, int]] = []  # (actual_exit, schedule id), sorted
+        self._completed: Dict[int, datetime] = {}
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.rebuild(db)
+
+    def rebuild(self, db: Session) -> Dict[str, Any]:
+        delay = _delay_minutes_sql(db.get_bind().dialect.name)
+        on_time = Train.actual_arrival <= Train.scheduled_arrival
+        late = Train.actual_arrival > Train.scheduled_arrival
+        train_query = select(
+            func.count(Train.scheduled_arrival),
+            func.coalesce(func.sum(case((on_time, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((late, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((late, delay), else_=0.0)), 0.0),
+        )
+        window_start = datetime.utcnow() - self.window
+        completion_query = select(Schedule.actual_exit, Schedule.id).where(Schedule.actual_exit >= window_start)
+
+        for attempt in range(_REBUILD_ATTEMPTS):
+            state = live_state.snapshot(db)
+            with_arrival, on_time_count, delayed, delay_sum = db.execute(train_query).one()
+            completions = sorted(tuple(r) for r in db.execute(completion_query).all())
+            section_terms = [_section_terms(s) for s in state.sections.values()]
+            with self._lock:
+                # Deltas are only applied once loaded, so any write since the snapshot means retry
+                if live_state.version == state.version or attempt == _REBUILD_ATTEMPTS - 1:
+                    self._with_arrival = int(with_arrival)
+                    self._on_time = int(on_time_count)
+                    self._delayed = int(delayed)
+                    self._delay_sum = float(delay_sum)
+                    self._sections = len(section_terms)
+                    self._utilization_sum = sum(u for _, u in section_terms)
+                    self._completions = completions
+                    self._completed = {sid: at for at, sid in completions}
+                    self.rebuilt_at = datetime.utcnow()
+                    self.loaded = True
+                    break
+        return self.stats()
+
+    def on_live_change(self, kind: str, old, new):
+        """live_state listener: swap one record's contribution for its replacement's."""
+        with self._lock:
+            if kind == "reset":
+                self.loaded = False
+            elif not self.loaded:
+                return
+            elif kind == "train":
+                before, after = _train_terms(old), _train_terms(new)
+                self._with_arrival += after[0] - before[0]
+                self._on_time += after[1] - before[1]
+                self._delayed += after[2] - before[2]
+                self._delay_sum += after[3] - before[3]
+            elif kind == "section":
+                before, after = _section_terms(old), _section_terms(new)
+                self._sections += after[0] - before[0]
+                self._utilization_sum += after[1] - before[1]
+
+    def on_completions(self, changes: Dict[int, Optional[datetime]]):
+        """Committed actual_exit per schedule id; None for schedules not completed or deleted."""
+        with self._lock:
+            if not self.loaded:
+                return
+            window_start = datetime.utcnow() - self.window
+            for schedule_id, at in changes.items():
+                previous = self._completed.pop(schedule_id, None)
+                if previous is not None:
+                    i = bisect.bisect_left(self._completions, (previous, schedule_id))
+                    if i < len(self._completions) and self._completions[i] == (previous, schedule_id):
+                        del self._completions[i]
+                if at is not None and at >= window_start:
+                    self._completed[schedule_id] = at
+                    bisect.insort(self._completions, (at, schedule_id))
+
+    def _completed_in_window(self) -> int:
+        start = bisect.bisect_left(self._completions, (datetime.utcnow() - self.window, 0))
+        if start:
+            for _, schedule_id in self._completions[:start]:
+                self._completed.pop(schedule_id, None)
+            del self._completions[:start]
+        return len(self._completions)
+
+    def kpis(self, db: Session) -> Dict[str, float]:
+        self.ensure_loaded(db)
+        with self._lock:
+            punctuality_rate = (self._on_time / self._with_arrival * 100) if self._with_arrival > 0 else 0.0
+            average_delay = self._delay_sum / self._delayed if self._delayed else 0.0
+            throughput_per_hour = self._completed_in_window() / (self.window.total_seconds() / 3600)
+            resource_utilization = self._utilization_sum / self._sections if self._sections else 0.0
+
+        # Conflict resolution time seconds (placeholder until implemented)
+        conflict_resolution_time_seconds = 0.0
+
+        return {
+            "punctuality_rate": round(punctuality_rate, 2),
+            "average_delay_minutes": round(average_delay, 2),
+            "section_throughput_per_hour": round(throughput_per_hour, 2),
+            "resource_utilization_percent": round(resource_utilization, 2),
+            "conflict_resolution_time_seconds": round(conflict_resolution_time_seconds, 2),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "rebuilt_at": self.rebuilt_at,
+                "trains_with_arrival": self._with_arrival,
+                "on_time": self._on_time,
+                "delayed": self._delayed,
+                "sections": self._sections,
+                "completions_in_window": self._completed_in_window(),
+            }
+
+
+# Shared rollup for the API process
+kpi_rollup = KPIRollup()
+
+live_state.subscribe(kpi_rollup.on_live_change)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_completions(session: Session, flush_context):
+    pending = session.info.setdefault("kpi_completions", {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Schedule) and obj.id is not None:
+            pending[obj.id] = obj.actual_exit
+    for obj in session.deleted:
+        if isinstance(obj, Schedule) and obj.id is not None:
+            pending[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_completions(session: Session):
+    pending = session.info.pop("kpi_completions", None)
+    if pending:
+        kpi_rollup.on_completions(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_completions(session: Session):
+    session.info.pop("kpi_completions", None)
@@ -0,0 +1,315 @@
+from __future__ import annotations
+import math
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.train import Train, TrainStatus
+from app.models.section import Section
+
+# Trains in these states no longer occupy their current section
+OFF_NETWORK_STATUSES = (TrainStatus.CANCELLED, TrainStatus.COMPLETED)
+
+# Server-side timestamps are expired after a flush and not needed on the hot path
+_SKIPPED_COLUMNS = ("created_at", "updated_at")
+TRAIN_FIELDS = tuple(c.key for c in Train.__table__.columns if c.key not in _SKIPPED_COLUMNS)
+SECTION_FIELDS = tuple(c.key for c in Section.__table__.columns if c.key not in _SKIPPED_COLUMNS)
+
+
+class _Record:
+    """Immutable-by-convention copy of one table row; writers publish a replaced record."""
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def __init__(self, **values):
+        for name in self._fields:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_row(cls, row: Any):
+        return cls(**{name: getattr(row, name) for name in cls._fields})
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self._fields}
+        values.update(changes)
+        return type(self)(**values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields}
+
+
+class TrainRecord(_Record):
+    """Stands in for a Train in optimizers and simulations."""
+    __slots__ = TRAIN_FIELDS
+    _fields = TRAIN_FIELDS
+
+    is_delayed = Train.is_delayed
+    delay_minutes = Train.delay_minutes
+    get_priority_score = Train.get_priority_score
+
+    @property
+    def occupies_section(self) -> bool:
+        return self.current_section_id is not None and self.status not in OFF_NETWORK_STATUSES
+
+    def __repr__(self):
+        return f"<TrainRecord {self.train_number}: section {self.current_section_id} @ {self.current_position_km} km>"
+
+
+class SectionRecord(_Record):
+    """Stands in for a Section; current_occupancy is maintained by the store."""
+    __slots__ = SECTION_FIELDS
+    _fields = SECTION_FIELDS
+
+    is_congested = Section.is_congested
+    utilization_percentage = Section.utilization_percentage
+    can_accommodate_train = Section.can_accommodate_train
+    get_travel_time_minutes = Section.get_travel_time_minutes
+
+    def __repr__(self):
+        return f"<SectionRecord {self.section_code}: {self.current_occupancy} trains>"
+
+
+class NetworkSnapshot:
+    """A consistent view of the network; later writes to the store never show through."""
+    __slots__ = ("version", "taken_at", "trains", "sections", "holds")
+
+    def __init__(self, version: int, trains: Dict[int, TrainRecord], sections: Dict[int, SectionRecord],
+                 holds: Dict[int, datetime]):
+        self.version = version
+        self.taken_at = datetime.utcnow()
+        self.trains = trains
+        self.sections = sections
+        self.holds = holds  # train_id -> held until
+
+    def trains_for(self, train_ids: Iterable[int]) -> List[TrainRecord]:
+        """Known trains among train_ids in id order, like an IN query."""
+        return [self.trains[i] for i in sorted(set(train_ids)) if i in self.trains]
+
+    def holds_minutes(self, start_time: datetime) -> Dict[int, int]:
+        """Active holds as whole minutes after start_time, the form the optimizers take."""
+        return {
+            tid: math.ceil((until - start_time).total_seconds() / 60.0)
+            for tid, until in self.holds.items()
+            if until > start_time
+        }
+
+
+class LiveNetworkState:
+    """
+    Authoritative in-memory state of trains, section occupancy and active holds.
+
+    Filled from the database on first use, then kept current from Train and Section rows
+    committed through ORM sessions and from direct writes such as update_position. Readers take
+    a NetworkSnapshot: the dicts it holds are never mutated, because the first write after a
+    snapshot copies them and records are replaced rather than changed in place. A snapshot
+    therefore costs nothing to take and stays consistent however long an optimizer runs.
+
+    Section occupancy counts trains whose current_section_id is the section and whose status is
+    not cancelled or completed; the current_occupancy column is not trusted.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.version = 0
+        self._trains: Dict[int, TrainRecord] = {}
+        self._sections: Dict[int, SectionRecord] = {}
+        self._holds: Dict[int, datetime] = {}
+        self._snapshot: Optional[NetworkSnapshot] = None
+        self._listeners: List[Callable[[str, Optional[_Record], Optional[_Record]], None]] = []
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.rebuild(db)
+
+    def rebuild(self, db: Session) -> Dict[str, Any]:
+        # Plain rows: no identity map or ORM instances are built
+        trains = {r.id: TrainRecord.from_row(r) for r in db.execute(select(Train.__table__)).all()}
+        sections = {r.id: SectionRecord.from_row(r) for r in db.execute(select(Section.__table__)).all()}
+        occupancy: Dict[int, int] = {}
+        for t in trains.values():
+            if t.occupies_section:
+                occupancy[t.current_section_id] = occupancy.get(t.current_section_id, 0) + 1
+        for sid, s in sections.items():
+            s.current_occupancy = occupancy.get(sid, 0)
+
+        with self._lock:
+            self._trains, self._sections = trains, sections
+            self._holds = {tid: until for tid, until in self._holds.items() if tid in trains}
+            self._snapshot = None
+            self.version += 1
+            self.loaded = True
+            self._notify("reset", None, None)
+        return self.stats()
+
+    def subscribe(self, listener: Callable[[str, Optional[_Record], Optional[_Record]], None]):
+        """
+        Call listener(kind, old, new) under the write lock for every record replaced: kind is
+        "train" or "section", and old or new is None for an added or removed record. A full
+        reload calls listener("reset", None, None). Listeners must be quick and must not write.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, kind: str, old: Optional[_Record], new: Optional[_Record]):
+        for listener in self._listeners:
+            listener(kind, old, new)
+
+    def snapshot(self, db: Optional[Session] = None) -> NetworkSnapshot:
+        if db is not None:
+            self.ensure_loaded(db)
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = NetworkSnapshot(self.version, self._trains, self._sections, self._holds)
+            return self._snapshot
+
+    async def snapshot_async(self, db: AsyncSession) -> NetworkSnapshot:
+        """snapshot() for async endpoints; only a first load touches the database."""
+        if not self.loaded:
+            await db.run_sync(self.ensure_loaded)
+        return self.snapshot()
+
+    def _begin_write(self):
+        # Copy-on-write: only copy what a published snapshot may still be reading
+        if self._snapshot is not None:
+            self._trains = dict(self._trains)
+            self._sections = dict(self._sections)
+            self._holds = dict(self._holds)
+            self._snapshot = None
+        self.version += 1
+
+    def _occupy(self, section_id: Optional[int], delta: int):
+        section = self._sections.get(section_id) if section_id is not None else None
+        if section is not None:
+            record = section.replace(current_occupancy=max(0, (section.current_occupancy or 0) + delta))
+            self._sections[section_id] = record
+            self._notify("section", section, record)
+
+    def _put_train(self, train_id: int, record: Optional[TrainRecord]):
+        old = self._trains.get(train_id)
+        if old is not None and old.occupies_section:
+            self._occupy(old.current_section_id, -1)
+        if record is None:
+            self._trains.pop(train_id, None)
+            self._holds.pop(train_id, None)
+        else:
+            self._trains[train_id] = record
+            if record.occupies_section:
+                self._occupy(record.current_section_id, 1)
+        self._notify("train", old, record)
+
+    def _put_section(self, section_id: int, record: Optional[SectionRecord]):
+        old = self._sections.get(section_id)
+        if record is None:
+            self._sections.pop(section_id, None)
+            self._notify("section", old, None)
+            return
+        if old is not None:
+            occupancy = old.current_occupancy
+        else:
+            occupancy = sum(1 for t in self._trains.values() if t.occupies_section and t.current_section_id == section_id)
+        record = record.replace(current_occupancy=occupancy)
+        self._sections[section_id] = record
+        self._notify("section", old, record)
+
+    def apply(self, changes: List[Tuple[str, int, Optional[_Record]]]):
+        """Apply ("train" | "section", id, record or None to remove) changes as one write."""
+        with self._lock:
+            self._begin_write()
+            # Sections first so trains moving onto a new section are counted on it
+            for kind, key, record in sorted(changes, key=lambda c: c[0] != "section"):
+                if kind == "section":
+                    self._put_section(key, record)
+                else:
+                    self._put_train(key, record)
+
+    def update_position(
+        self,
+        train_id: int,
+        section_id: Optional[int],
+        position_km: float,
+        status: Optional[TrainStatus] = None,
+    ) -> Optional[TrainRecord]:
+        """Move a train without a database round trip; None if the train is unknown."""
+        moved = self.update_positions([(train_id, section_id, position_km, status)])
+        return moved[0] if moved else None
+
+    def update_positions(
+        self, updates: Iterable[Tuple[int, Optional[int], float, Optional[TrainStatus]]]
+    ) -> List[TrainRecord]:
+        """Move many trains as one write; unknown train_ids are skipped."""
+        moved = []
+        with self._lock:
+            self._begin_write()
+            for train_id, section_id, position_km, status in updates:
+                old = self._trains.get(train_id)
+                if old is None:
+                    continue
+                changes: Dict[str, Any] = {"current_section_id": section_id, "current_position_km": position_km}
+                if status is not None:
+                    changes["status"] = status
+                record = old.replace(**changes)
+                self._put_train(train_id, record)
+                moved.append(record)
+        return moved
+
+    def set_hold(self, train_id: int, until: datetime) -> bool:
+        with self._lock:
+            if train_id not in self._trains:
+                return False
+            self._begin_write()
+            self._holds[train_id] = until
+            return True
+
+    def clear_hold(self, train_id: int) -> bool:
+        with self._lock:
+            if train_id not in self._holds:
+                return False
+            self._begin_write()
+            del self._holds[train_id]
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.snapshot()
+        return {
+            "version": state.version,
+            "trains": len(state.trains),
+            "trains_on_sections": sum(1 for t in state.trains.values() if t.occupies_section),
+            "sections": len(state.sections),
+            "holds": len(state.holds),
+        }
+
+
+# Shared store for the API process
+live_state = LiveNetworkState()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_state_changes(session: Session, flush_context):
+    pending = session.info.setdefault("live_state_changes", [])
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Train) and obj.id is not None:
+            pending.append(("train", obj.id, TrainRecord.from_row(obj)))
+        elif isinstance(obj, Section) and obj.id is not None:
+            pending.append(("section", obj.id, SectionRecord.from_row(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Train) and obj.id is not None:
+            pending.append(("train", obj.id, None))
+        elif isinstance(obj, Section) and obj.id is not None:
+            pending.append(("section", obj.id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_state_changes(session: Session):
+    pending = session.info.pop("live_state_changes", None)
+    if pending and live_state.loaded:
+        live_state.apply(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_state_changes(session: Session):
+    session.info.pop("live_state_changes", None)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+import os
+import pty
+import re
+import select
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable, Iterator
+
+import pulp
+
+from app.models.train import Train
+from app.models.section import Section
+from app.services.optimization.heuristic import HeuristicOptimizer
+from app.services.optimization.or_linear import ORLinearOptimizer, FORMULATIONS
+
+ANYTIME_STOP_GRACE_SECONDS = 1.0  # how long an interrupted CBC may take to write its solution
+_POLL_SECONDS = 0.1
+_TOLERANCE_MINUTES = 1e-4  # CBC's solution file rounds start times
+
+_INCUMBENT_LINE = re.compile(r"Integer solution of (-?[\d.eE+-]+) found")
+_BOUND_LINE = re.compile(r"best possible (-?[\d.eE+-]+)")
+
+# Stop flags of runs currently streaming, keyed by run_id
+_stop_events: Dict[str, threading.Event] = {}
+
+
+class AnytimeOptimizer:
+    @staticmethod
+    def stream(
+        trains: List[Train],
+        section: Section,
+        start_time: Optional[datetime] = None,
+        headway_minutes: float = 2.0,
+        holds: Optional[Dict[int, int]] = None,
+        section_speed_limit: Optional[int] = None,
+        time_limit_seconds: int = 10,
+        formulation: str = "compact",
+        previous_order: Optional[List[int]] = None,
+        affected_ids: Optional[Iterable[int]] = None,
+        run_id: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield progressively better schedules for the ORLinearOptimizer model:
+        - "heuristic": HeuristicOptimizer.build_schedule, available immediately, with its
+          weighted completion time as heuristic_objective
+        - "incumbent": every improved MILP objective with its gap, as CBC reports it
+        - "done": the reason the run ended and the best MILP schedule with its objective and
+          gap (schedule and objective None if CBC found nothing or had to be killed)
+        One CBC process runs for the whole time limit, so branch-and-bound keeps its tree and
+        bound; its log is read as it is written. The CBC command line only writes variable
+        values when it exits, so incumbent events carry the objective and the schedule comes
+        with "done". stop() and the time limit both interrupt CBC, which writes its incumbent
+        at the next node (on its own -sec limit it writes the current LP point instead). CBC
+        is killed after ANYTIME_STOP_GRACE_SECONDS when it is stuck in the root node; "done"
+        then falls back to the MIP start, if there is one.
+        Callers that hand out run_id before iterating should register() it first, so a stop
+        sent before the first event is not lost.
+        """
+        if formulation not in FORMULATIONS:
+            raise ValueError(f"Unknown formulation '{formulation}', expected one of {FORMULATIONS}")
+        if start_time is None:
+            start_time = datetime.utcnow()
+        holds = holds or {}
+        run_id = run_id or uuid.uuid4().hex
+        stop = AnytimeOptimizer.register(run_id)
+        started = time.monotonic()
+
+        def elapsed() -> float:
+            return round(time.monotonic() - started, 3)
+
+        try:
+            ids, release, travel, weights, effective_section_speed = ORLinearOptimizer.problem_data(
+                trains, section, start_time, holds, section_speed_limit
+            )
+
+            heuristic = HeuristicOptimizer.build_schedule(
+                trains, section, start_time, holds=holds, section_speed_limit=section_speed_limit
+            )
+            heuristic_objective = 0.0
+            for item in heuristic:
+                exit_minutes = (datetime.fromisoformat(item["planned_exit"]) - start_time).total_seconds() / 60.0
+                heuristic_objective += weights[item["train_id"]] * exit_minutes
+            yield {
+                "event": "heuristic",
+                "run_id": run_id,
+                "heuristic_objective": heuristic_objective,
+                "gap": None,
+                "elapsed_seconds": elapsed(),
+                "schedule": heuristic,
+                "metrics": HeuristicOptimizer.metrics_from_schedule(heuristic),
+            }
+            if len(ids) <= 1:
+                # A lone train starts at its release
+                schedule = ORLinearOptimizer.schedule_from_starts(
+                    ids, release, start_time, release, travel, weights, section.id, effective_section_speed
+                )
+                objective = sum(weights[tid] * (release[tid] + travel[tid]) for tid in ids)
+                yield {"event": "done", "run_id": run_id, "reason": "optimal", "objective": objective, "gap": 0.0,
+                       "heuristic_objective": heuristic_objective, "elapsed_seconds": elapsed(),
+                       "schedule": schedule, "metrics": HeuristicOptimizer.metrics_from_schedule(schedule)}
+                return
+
+            warm_order, free_ids = None, None
+            if previous_order:
+                warm_order, free_ids = ORLinearOptimizer.warm_start_order(
+                    ids, previous_order, affected_ids or [], release, travel, weights, headway_minutes
+                )
+            prob, t_vars = ORLinearOptimizer.build_problem(
+                ids, release, travel, weights, headway_minutes, formulation,
+                warm_order=warm_order, free_ids=free_ids,
+            )
+            mip_start = {tid: t_vars[tid].varValue for tid in ids}
+            # The MPS file has no objective constant, so CBC's log leaves it out
+            constant = prob.objective.constant
+
+            # The heuristic does not model section occupancy the way the MILP does,
+            # so incumbents are only compared against each other
+            best: Optional[float] = None
+            bound: Optional[float] = None
+            optimal = False
+            solver = pulp.PULP_CBC_CMD(msg=False, warmStart=True)
+            with tempfile.TemporaryDirectory() as tmp:
+                mps_path, mst_path, sol_path = (os.path.join(tmp, f"anytime.{ext}") for ext in ("mps", "mst", "sol"))
+                variables, variable_names, constraint_names, _ = prob.writeMPS(mps_path, rename=1)
+                solver.writesol(mst_path, prob, variables, variable_names, constraint_names)
+                # CBC preprocessing is disabled because it can crash on large MIP starts
+                args = [solver.path, mps_path, "-mips", mst_path, "-preprocess", "off",
+                        "-solve", "-printingOptions", "all", "-solution", sol_path]
+
+                for line in AnytimeOptimizer._cbc_log(args, stop, started + time_limit_seconds):
+                    match = _BOUND_LINE.search(line)
+                    if match:
+                        bound = float(match.group(1)) + constant
+                    if "Optimal solution found" in line:
+                        optimal = True
+                    match = _INCUMBENT_LINE.search(line)
+                    if match is None:
+                        continue
+                    objective = float(match.group(1)) + constant
+                    if best is not None and objective >= best - 1e-6:
+                        continue
+                    best = objective
+                    yield {
+                        "event": "incumbent",
+                        "run_id": run_id,
+                        "objective": best,
+                        "gap": AnytimeOptimizer._gap(best, bound),
+                        "elapsed_seconds": elapsed(),
+                    }
+
+                starts = None
+                if os.path.exists(sol_path):
+                    _, values, _, _, _, _ = solver.readsol_MPS(sol_path, prob, variables, variable_names, constraint_names)
+                    starts = {tid: values.get(t_vars[tid].name) for tid in ids}
+                # A killed run leaves no solution file; the MIP start is then the best schedule known
+                for candidate in (starts, mip_start):
+                    if candidate and AnytimeOptimizer._feasible(candidate, ids, release, travel, headway_minutes):
+                        starts = candidate
+                        break
+                else:
+                    starts = None
+
+            reason = "stopped" if stop.is_set() else "optimal" if optimal else "time_limit"
+            done = {"event": "done", "run_id": run_id, "reason": reason, "objective": None, "gap": None,
+                    "heuristic_objective": heuristic_objective, "elapsed_seconds": elapsed(),
+                    "schedule": None, "metrics": None}
+            if starts is not None:
+                schedule = ORLinearOptimizer.schedule_from_starts(
+                    ids, starts, start_time, release, travel, weights, section.id, effective_section_speed
+                )
+                objective = sum(weights[tid] * (starts[tid] + travel[tid]) for tid in ids)
+                done.update(objective=objective, gap=0.0 if optimal else AnytimeOptimizer._gap(objective, bound),
+                            schedule=schedule, metrics=HeuristicOptimizer.metrics_from_schedule(schedule))
+            yield done
+        finally:
+            AnytimeOptimizer.discard(run_id)
+
+    @staticmethod
+    def register(run_id: str) -> threading.Event:
+        """Make run_id stoppable before its stream starts; returns its stop flag."""
+        return _stop_events.setdefault(run_id, threading.Event())
+
+    @staticmethod
+    def discard(run_id: str):
+        """Forget a run whose stream ended or was never started."""
+        _stop_events.pop(run_id, None)
+
+    @staticmethod
+    def stop(run_id: str) -> bool:
+        """Ask a streaming run to interrupt CBC and finish with its best solution."""
+        event = _stop_events.get(run_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    @staticmethod
+    def _cbc_log(args: List[str], stop: threading.Event, deadline: float) -> Iterator[str]:
+        """
+        Run CBC and yield its log lines as they are written. CBC block-buffers a pipe, so it
+        writes to a pseudo-terminal. Once stop is set or the monotonic deadline passes, CBC
+        gets SIGINT, and it is killed if it has not exited ANYTIME_STOP_GRACE_SECONDS later.
+        """
+        master, slave = pty.openpty()
+        try:
+            process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=slave, stderr=slave)
+        finally:
+            os.close(slave)
+        kill_at = None
+        pending = ""
+        try:
+            while True:
+                if kill_at is None and (stop.is_set() or time.monotonic() >= deadline):
+                    process.send_signal(signal.SIGINT)
+                    kill_at = time.monotonic() + ANYTIME_STOP_GRACE_SECONDS
+                if kill_at is not None and time.monotonic() > kill_at:
+                    process.kill()
+                    break
+                ready, _, _ = select.select([master], [], [], _POLL_SECONDS)
+                if not ready:
+                    if process.poll() is not None:
+                        break
+                    continue
+                try:
+                    chunk = os.read(master, 4096)
+                except OSError:
+                    # EIO once CBC has exited and the terminal is closed
+                    break
+                if not chunk:
+                    break
+                *lines, pending = (pending + chunk.decode(errors="replace")).split("\n")
+                yield from lines
+            if pending:
+                yield pending
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            os.close(master)
+
+    @staticmethod
+    def _gap(objective: float, bound: Optional[float]) -> Optional[float]:
+        if bound is None or bound > objective or not objective:
+            return None
+        return max(0.0, (objective - bound) / abs(objective))
+
+    @staticmethod
+    def _feasible(starts: Dict[int, Optional[float]], ids: List[int], release: Dict[int, float],
+                  travel: Dict[int, float], headway_minutes: float) -> bool:
+        """Whether starts respect every release and keep the section to one train plus headway."""
+        if any(starts.get(tid) is None or starts[tid] < release[tid] - _TOLERANCE_MINUTES for tid in ids):
+            return False
+        order = sorted(ids, key=lambda tid: starts[tid])
+        return all(
+            starts[second] >= starts[first] + travel[first] + headway_minutes - _TOLERANCE_MINUTES
+            for first, second in zip(order, order[1:])
+        )
@@ -0,0 +1,413 @@
+from __future__ import annotations
+import enum
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Any, List, Optional, Set, Tuple
+
+import structlog
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import redis_client
+from app.services.monitoring.live_state import live_state
+
+logger = structlog.get_logger()
+
+# Only what the cached solvers read; position and status updates leave cached results valid
+TRAIN_KEY_FIELDS = ("id", "train_type", "priority", "max_speed", "scheduled_departure")
+SECTION_KEY_FIELDS = ("id", "length_km", "max_speed_limit")
+
+# Absolute times in a cached result, moved onto the start time of the request it serves
+REBASED_FIELDS = ("planned_entry", "planned_exit")
+
+# How long to stop trying Redis after it fails
+_REDIS_RETRY_SECONDS = 30.0
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted(_canonical(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def _shift(value: Any, delta: timedelta) -> Any:
+    if isinstance(value, datetime):
+        return value + delta
+    if isinstance(value, str):
+        return (datetime.fromisoformat(value) + delta).isoformat()
+    return value
+
+
+def _rebase(value: Any, delta: timedelta) -> Any:
+    if isinstance(value, dict):
+        return {k: _shift(v, delta) if k in REBASED_FIELDS else _rebase(v, delta) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rebase(v, delta) for v in value]
+    return value
+
+
+def _json_default(value: Any):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+class OptimizationCache:
+    """
+    Results of optimizer runs keyed by a hash of the canonical problem.
+
+    The key covers the solver kind, the solver-relevant fields of every train and of the
+    section and the remaining solver parameters (holds, headway, speed limit and so on). Times
+    enter relative to the start time: each train by its release, max(start, scheduled
+    departure), as an offset from the start, and by the rank of its scheduled departure. The
+    solvers depend on nothing else about time, so an entry solved for one start is the exact
+    answer for any start with the same key once its planned times are moved by the difference
+    between the two starts, which every hit does.
+
+    Entries live in Redis with a TTL, and an LRU index evicts the least recently used beyond
+    max_entries; while Redis is unreachable an in-process LRU with the same TTL takes over.
+    Every entry is tagged with its train and section ids and is dropped when the live state
+    sees one of those rows change a keyed field. Concurrent requests for the same key wait on
+    one solve: within a process on a shared future, across processes on a short Redis lock.
+    """
+
+    def __init__(self, client, ttl_seconds: int, max_entries: int, lock_timeout_seconds: float,
+                 enabled: bool = True, prefix: str = "optcache:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lru_key = f"{prefix}lru"
+        self._memory: "OrderedDict[str, Tuple[float, str, Tuple[str, ...]]]" = OrderedDict()
+        self._memory_tags: Dict[str, Set[str]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._stale: Set[str] = set()  # tags queued for invalidation by the live state
+        self._flush_all = False
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0, "redis_errors": 0}
+        self.last_error: Optional[str] = None
+
+    # Keys
+
+    def problem_key(self, kind: str, trains: Iterable[Any], section: Any, start_time: datetime,
+                    **params: Any) -> Tuple[str, Tuple[str, ...]]:
+        """The cache key for one problem and the tags that invalidate it."""
+        trains = sorted(trains, key=lambda t: t.id)
+        start_time = start_time.replace(tzinfo=None)
+        departures = sorted({t.scheduled_departure for t in trains if t.scheduled_departure is not None})
+        fields = [f for f in TRAIN_KEY_FIELDS if f != "scheduled_departure"]
+
+        def train_key(t) -> List[Any]:
+            key = [_canonical(getattr(t, f, None)) for f in fields]
+            if t.scheduled_departure is None:
+                return key + [None, None]
+            release = max(0.0, (t.scheduled_departure - start_time).total_seconds())
+            return key + [release, departures.index(t.scheduled_departure)]
+
+        problem = {
+            "kind": kind,
+            "trains": [train_key(t) for t in trains],
+            "section": [_canonical(getattr(section, f, None)) for f in SECTION_KEY_FIELDS],
+            "params": _canonical(params),
+        }
+        digest = hashlib.sha256(json.dumps(problem, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+        tags = tuple([f"section:{section.id}"] + [f"train:{t.id}" for t in trains])
+        return f"{self.prefix}{kind}:{digest}", tags
+
+    # Lookup
+
+    def get_or_compute(self, key: str, tags: Tuple[str, ...], compute: Callable[[], Any],
+                       start_time: datetime) -> Tuple[Any, str]:
+        """
+        The cached result for key, or compute() stored under it; start_time is the one the
+        request's problem_key was built with. Returns the result and how it was served: "hit",
+        "coalesced" (waited on another request's solve) or "miss". Exceptions from compute()
+        are raised to every waiter and nothing is stored.
+        """
+        if not self.enabled:
+            return compute(), "miss"
+        start_time = start_time.replace(tzinfo=None)
+        self._apply_invalidations()
+        cached = self._get(key)
+        if cached is not None:
+            self._count("hits")
+            return self._rebased(cached, start_time), "hit"
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            solved_for, result = future.result()
+            return _rebase(result, start_time - solved_for) if solved_for != start_time else result, "coalesced"
+
+        token = None
+        try:
+            token, cached = self._acquire_remote(key)
+            if cached is not None:
+                self._count("coalesced")
+                result = self._rebased(cached, start_time)
+                future.set_result((start_time, result))
+                return result, "coalesced"
+            self._count("misses")
+            result = compute()
+            payload = json.dumps({"start": start_time, "result": result}, default=_json_default)
+            self._put(key, payload, tags)
+            future.set_result((start_time, result))
+            return result, "miss"
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if token is not None:
+                self._release_remote(key, token)
+
+    @staticmethod
+    def _rebased(entry: Dict[str, Any], start_time: datetime) -> Any:
+        delta = start_time - datetime.fromisoformat(entry["start"])
+        return _rebase(entry["result"], delta) if delta else entry["result"]
+
+    def _get(self, key: str) -> Optional[Any]:
+        if self._redis_available():
+            try:
+                payload = self.client.get(key)
+                if payload is not None:
+                    self.client.zadd(self._lru_key, {key: time.time()})
+                    return json.loads(payload)
+                return None
+            except RedisError as e:
+                self._redis_failed(e)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop_memory(key)
+                return None
+            self._memory.move_to_end(key)
+            payload = entry[1]
+        return json.loads(payload)
+
+    def _put(self, key: str, payload: str, tags: Tuple[str, ...]):
+        if self._redis_available():
+            try:
+                pipe = self.client.pipeline()
+                pipe.set(key, payload, ex=self.ttl_seconds)
+                pipe.zadd(self._lru_key, {key: time.time()})
+                for tag in tags:
+                    pipe.sadd(self.prefix + tag, key)
+                    pipe.expire(self.prefix + tag, self.ttl_seconds)
+                pipe.zcard(self._lru_key)
+                size = pipe.execute()[-1]
+                if size > self.max_entries:
+                    evicted = [k for k, _ in self.client.zpopmin(self._lru_key, size - self.max_entries)]
+                    if evicted:
+                        self.client.delete(*evicted)
+                        self._count("evictions", len(evicted))
+                return
+            except RedisError as e:
+                self._redis_failed(e)
+        with self._lock:
+            self._drop_memory(key)
+            self._memory[key] = (time.monotonic() + self.ttl_seconds, payload, tags)
+            for tag in tags:
+                self._memory_tags.setdefault(tag, set()).add(key)
+            while len(self._memory) > self.max_entries:
+                self._drop_memory(next(iter(self._memory)))
+                self._counts["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        # Lock held
+        entry = self._memory.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._memory_tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._memory_tags[tag]
+
+    # Single-flight across processes
+
+    def _acquire_remote(self, key: str) -> Tuple[Optional[str], Optional[Any]]:
+        """Take the solve lock for key, or wait for its holder's result; (token, result)."""
+        if not self._redis_available():
+            return None, None
+        token = uuid.uuid4().hex
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.lock_timeout_seconds
+        try:
+            while True:
+                locked = self.client.set(lock_key, token, nx=True, px=int(self.lock_timeout_seconds * 1000))
+                # Checked after taking the lock too: the previous holder may have just stored it
+                payload = self.client.get(key)
+                if payload is not None:
+                    if locked:
+                        self._release_remote(key, token)
+                    return None, json.loads(payload)
+                if locked:
+                    return token, None
+                if time.monotonic() >= deadline:
+                    # Holder is gone or slow; solve without the lock
+                    return None, None
+                time.sleep(0.05)
+        except RedisError as e:
+            self._redis_failed(e)
+            return None, None
+
+    def _release_remote(self, key: str, token: str):
+        lock_key = f"{key}:lock"
+        try:
+            if self.client.get(lock_key) == token:
+                self.client.delete(lock_key)
+        except RedisError as e:
+            self._redis_failed(e)
+
+    # Invalidation
+
+    def on_live_change(self, kind: str, old: Optional[Any], new: Optional[Any]):
+        """live_state listener; runs under its write lock, so only queues the tags."""
+        if kind == "reset":
+            with self._lock:
+                self._flush_all = True
+            return
+        fields = TRAIN_KEY_FIELDS if kind == "train" else SECTION_KEY_FIELDS
+        if old is not None and new is not None and all(getattr(old, f) == getattr(new, f) for f in fields):
+            return
+        record = old if old is not None else new
+        with self._lock:
+            self._stale.add(f"{kind}:{record.id}")
+
+    def invalidate(self, kind: str, entity_id: int) -> int:
+        """Drop every entry that involves one train or section; returns entries dropped."""
+        return self._invalidate_tags([f"{kind}:{entity_id}"])
+
+    def _apply_invalidations(self):
+        with self._lock:
+            flush_all, self._flush_all = self._flush_all, False
+            stale, self._stale = self._stale, set()
+        if flush_all:
+            self.clear()
+        elif stale:
+            self._invalidate_tags(stale)
+
+    def _invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        dropped = 0
+        if self._redis_available():
+            try:
+                pipe = self.client.pipeline()
+                for tag in tags:
+                    pipe.smembers(self.prefix + tag)
+                keys = set().union(*pipe.execute()) if tags else set()
+                if keys:
+                    self.client.delete(*keys)
+                    self.client.zrem(self._lru_key, *keys)
+                self.client.delete(*[self.prefix + tag for tag in tags])
+                dropped += len(keys)
+            except RedisError as e:
+                self._redis_failed(e)
+        with self._lock:
+            for tag in tags:
+                for key in list(self._memory_tags.get(tag, ())):
+                    self._drop_memory(key)
+                    dropped += 1
+            self._counts["invalidations"] += dropped
+        return dropped
+
+    def clear(self) -> int:
+        """Drop every entry; returns entries dropped."""
+        dropped = 0
+        if self._redis_available():
+            try:
+                keys = list(self.client.scan_iter(match=f"{self.prefix}*", count=1000))
+                if keys:
+                    dropped += self.client.zcard(self._lru_key)
+                    self.client.delete(*keys)
+            except RedisError as e:
+                self._redis_failed(e)
+        with self._lock:
+            dropped += len(self._memory)
+            self._memory.clear()
+            self._memory_tags.clear()
+            self._counts["invalidations"] += dropped
+        return dropped
+
+    # Backend health
+
+    def _redis_available(self) -> bool:
+        return self.client is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, error: Exception):
+        with self._lock:
+            first = self._redis_down_until == 0.0 or time.monotonic() >= self._redis_down_until
+            self._redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+            self._counts["redis_errors"] += 1
+            self.last_error = str(error)
+        if first:
+            logger.warning("Optimization cache falling back to memory", error=str(error))
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counts[name] += n
+
+    def stats(self) -> Dict[str, Any]:
+        backend = "redis" if self._redis_available() else "memory"
+        size = None
+        if backend == "redis":
+            try:
+                size = self.client.zcard(self._lru_key)
+            except RedisError as e:
+                self._redis_failed(e)
+                backend = "memory"
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "backend": backend,
+                "entries": size if size is not None else len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "inflight": len(self._inflight),
+                **self._counts,
+                "last_error": self.last_error,
+            }
+
+
+# Shared cache for the API process
+optimization_cache = OptimizationCache(
+    redis_client,
+    ttl_seconds=settings.CACHE_TTL,
+    max_entries=settings.OPTIMIZATION_CACHE_MAX_ENTRIES,
+    lock_timeout_seconds=settings.OPTIMIZATION_CACHE_LOCK_SECONDS,
+    enabled=settings.OPTIMIZATION_CACHE_ENABLED,
+)
+
+live_state.subscribe(optimization_cache.on_live_change)
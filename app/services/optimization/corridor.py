@@ -0,0 +1,342 @@
+from __future__ import annotations
+import bisect
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.models.train import Train
+from app.models.section import Section
+from app.services.optimization.heuristic import HeuristicOptimizer
+
+CROSSING_LOOP_CAPACITY = 1  # loops at a crossing station unless stated otherwise
+
+# (block index, direction, running minutes) for each block a train traverses
+Leg = Tuple[int, int, float]
+# (entry, exit, station track the train stood on before entry or None) per leg, in minutes
+LegPlan = Tuple[float, float, Optional[str]]
+
+
+class _Track:
+    """Occupations of one block track, kept sorted and separated by the headway."""
+
+    def __init__(self, headway: float):
+        self.headway = headway
+        self.starts: List[float] = []
+        self.intervals: List[Tuple[float, float]] = []
+
+    def earliest(self, t: float, duration: float) -> float:
+        """Earliest start >= t at which the track is free for duration minutes."""
+        h = self.headway
+        idx = max(0, bisect.bisect_right(self.starts, t) - 1)
+        while idx < len(self.intervals):
+            a, b = self.intervals[idx]
+            if b + h <= t:
+                idx += 1
+                continue
+            if t + duration + h <= a:
+                break
+            t = max(t, b + h)
+            idx += 1
+        return t
+
+    def is_free(self, start: float, end: float) -> bool:
+        return self.earliest(start, end - start) <= start + 1e-9
+
+    def reserve(self, start: float, end: float):
+        idx = bisect.bisect_right(self.starts, start)
+        self.starts.insert(idx, start)
+        self.intervals.insert(idx, (start, end))
+
+
+class _Station:
+    """
+    Tracks a train can stand on between two blocks: loop_count loops, the first platform_loops
+    of which have a platform, and the main line if main_line_standing. Trains pass through on
+    the main line, or on a free loop while another train stands on the main line.
+    """
+
+    def __init__(
+        self,
+        loop_count: int = CROSSING_LOOP_CAPACITY,
+        platform_loops: Optional[int] = None,
+        main_line_standing: bool = False,
+    ):
+        if platform_loops is None:
+            platform_loops = loop_count
+        self.main_line_standing = main_line_standing
+        # (name, is_loop, has_platform)
+        self.tracks: List[Tuple[str, bool, bool]] = [(f"loop{i + 1}", True, i < platform_loops) for i in range(loop_count)]
+        if main_line_standing:
+            self.tracks.append(("main", False, True))
+        self.occupied: Dict[str, List[Tuple[float, float]]] = {name: [] for name, _, _ in self.tracks}
+
+    def _eligible(self, train: Train, standing: bool) -> List[str]:
+        names = []
+        for name, is_loop, has_platform in self.tracks:
+            if is_loop and train.can_use_loop_line is False:
+                continue
+            if standing and train.requires_platform and not has_platform:
+                continue
+            names.append(name)
+        # Keep the main line clear for through trains while a loop is free
+        return names if standing else sorted(names, key=lambda n: n != "main")
+
+    def track_for(self, train: Train, start: float, end: float) -> Optional[str]:
+        """A free track for standing from start to end; start == end means passing through."""
+        standing = end > start
+        if not standing and not self.main_line_standing:
+            return "main"
+        for name in self._eligible(train, standing):
+            if all(not (a < end and b > start) for a, b in self.occupied[name]):
+                return name
+        return None
+
+    def next_clear(self, train: Train, t: float) -> float:
+        """Earliest time after t at which one of the train's tracks is clear to pass through."""
+        ends = [b for name in self._eligible(train, False) for a, b in self.occupied[name] if a < t < b]
+        return min(ends) if ends else t
+
+    def reserve(self, name: str, start: float, end: float):
+        # Passing trains are kept too, so nobody is later put to stand in their way
+        if name in self.occupied:
+            self.occupied[name].append((start, end))
+
+
+def release_and_weights(
+    trains: List[Train], start_time: datetime, holds: Dict[int, int]
+) -> Tuple[Dict[int, float], Dict[int, float]]:
+    """Release times in minutes from start_time and priority weights, as in ORLinearOptimizer."""
+    release = {}
+    weights = {}
+    for t in trains:
+        r_time = max(start_time, t.scheduled_departure or start_time)
+        if holds.get(t.id, 0) > 0:
+            r_time = max(r_time, start_time + timedelta(minutes=holds[t.id]))
+        release[t.id] = (r_time - start_time).total_seconds() / 60.0
+        weights[t.id] = float(getattr(t.priority, "value", 2))
+    return release, weights
+
+
+def delay_metrics(
+    plans: Dict[int, List[LegPlan]], legs: Dict[int, List[Leg]], release: Dict[int, float]
+) -> Dict[str, float]:
+    delays = [plan[-1][1] - release[tid] - sum(run for _, _, run in legs[tid]) for tid, plan in plans.items()]
+    return {
+        "total_delay_minutes": round(sum(delays), 2),
+        "max_delay_minutes": round(max(delays, default=0.0), 2),
+    }
+
+
+def route_trains(
+    id_to_train: Dict[int, Train],
+    legs: Dict[int, List[Leg]],
+    release: Dict[int, float],
+    weights: Dict[int, float],
+    single_line: List[bool],  # per block
+    headways: List[float],  # per block
+    stations: List[Optional[Dict[str, Any]]],  # _Station arguments after each block, or None
+    deadline: float,
+) -> Tuple[Dict[int, List[LegPlan]], float, int]:
+    """
+    Route every train by priority, then reorder the most delayed trains until the deadline.
+    Returns the leg plans per train, the total weighted completion time and the routing passes.
+    """
+
+    def route_all(routing_order: List[int]):
+        tracks = [{} for _ in single_line]
+        station_state = [_Station(**spec) if spec is not None else None for spec in stations]
+        plans = {}
+        for tid in routing_order:
+            plans[tid] = _route_train(
+                id_to_train[tid], legs[tid], release[tid], single_line, headways, tracks, station_state
+            )
+        return plans, sum(weights[tid] * plan[-1][1] for tid, plan in plans.items())
+
+    order = sorted(id_to_train, key=lambda tid: (-id_to_train[tid].get_priority_score(), release[tid]))
+    plans, cost = route_all(order)
+    passes = 1
+    tried = set()
+    while time.monotonic() < deadline:
+        # Most delayed train, by weighted delay against running unimpeded, not yet tried
+        delays = {
+            tid: weights[tid] * (plan[-1][1] - release[tid] - sum(run for _, _, run in legs[tid]))
+            for tid, plan in plans.items()
+        }
+        candidates = [tid for tid in sorted(delays, key=delays.get, reverse=True) if delays[tid] > 1e-6 and tid not in tried]
+        if not candidates:
+            break
+        tid = candidates[0]
+        tried.add(tid)
+        idx = order.index(tid)
+        if idx == 0:
+            continue
+        trial = list(order)
+        trial.insert(idx // 2, trial.pop(idx))
+        trial_plans, trial_cost = route_all(trial)
+        passes += 1
+        if trial_cost < cost - 1e-6:
+            order, plans, cost = trial, trial_plans, trial_cost
+            tried.clear()
+    return plans, cost, passes
+
+
+def _route_train(
+    train: Train,
+    legs: List[Leg],
+    release: float,
+    single_line: List[bool],
+    headways: List[float],
+    tracks: List[Dict[int, _Track]],
+    stations: List[Optional[_Station]],
+) -> List[LegPlan]:
+    """Reserve and return the train's entry, exit and standing track per leg."""
+
+    def track(k: int, direction: int) -> _Track:
+        key = 0 if single_line[k] else direction
+        if key not in tracks[k]:
+            tracks[k][key] = _Track(headways[k])
+        return tracks[k][key]
+
+    m = len(legs)
+    lower = [release] * m
+    entry = [0.0] * m
+    standing: List[Optional[str]] = [None] * m
+    passing: List[Optional[str]] = [None] * m
+    held = [False] * m  # the previous block stays occupied until this entry
+    k = 0
+    while k < m:
+        block, direction, run = legs[k]
+        arrival = entry[k - 1] + legs[k - 1][2] if k > 0 else release
+        s = track(block, direction).earliest(max(lower[k], arrival), run)
+        standing[k], passing[k], held[k] = None, None, False
+        if k > 0:
+            prev_block, prev_direction, prev_run = legs[k - 1]
+            station = stations[min(prev_block, block)]
+            if s > arrival + 1e-9:
+                name = station.track_for(train, arrival, s) if station is not None else None
+                if name is not None:
+                    standing[k] = name
+                elif track(prev_block, prev_direction).is_free(entry[k - 1], s):
+                    held[k] = True
+                else:
+                    # Nowhere to wait: leave the previous station later
+                    lower[k - 1] = s - prev_run
+                    k -= 1
+                    continue
+            if standing[k] is None and station is not None:
+                passing[k] = station.track_for(train, s, s)
+                if passing[k] is None:
+                    # Every track this train may pass on is blocked by a standing train
+                    lower[k] = station.next_clear(train, s)
+                    continue
+        entry[k] = s
+        k += 1
+
+    plan = []
+    for k, (block, direction, run) in enumerate(legs):
+        exit_ = entry[k + 1] if k + 1 < m and held[k + 1] else entry[k] + run
+        track(block, direction).reserve(entry[k], exit_)
+        if standing[k] is not None:
+            stations[min(legs[k - 1][0], block)].reserve(standing[k], entry[k - 1] + legs[k - 1][2], entry[k])
+        elif passing[k] is not None:
+            stations[min(legs[k - 1][0], block)].reserve(passing[k], entry[k], entry[k])
+        plan.append((entry[k], exit_, standing[k]))
+    return plan
+
+
+class CorridorOptimizer:
+    @staticmethod
+    def optimize(
+        trains: List[Train],
+        sections: List[Section],  # ordered chain, each section ends where the next one starts
+        routes: Optional[Dict[int, List[int]]] = None,  # section ids per train_id, in travel order
+        start_time: Optional[datetime] = None,
+        headway_minutes: float = 2.0,
+        section_headways: Optional[Dict[int, float]] = None,  # minutes per section_id
+        holds: Optional[Dict[int, int]] = None,  # minutes per train_id, relative to start_time
+        time_limit_seconds: float = 2.0,
+    ) -> Dict[str, Any]:
+        """
+        Schedule trains through a chain of sections so that a train enters each section only
+        after leaving the previous one:
+        - Each section is one block per track: single_line sections carry one train at a time
+          in either direction, other section types one train per direction
+        - A train may stand between two sections only where the first section in chain order
+          has_crossing_station and the train can_use_loop_line; elsewhere it waits by keeping
+          the section it is in occupied
+        - Trains default to running the whole chain in order; a route may be any contiguous part
+          of the chain, listed in travel order, so reversed routes run in the down direction
+
+        The problem is decomposed train by train: each train is routed at its earliest feasible
+        times through the occupations already reserved, backing up to an earlier departure when it
+        cannot wait where it arrives. Trains are routed by priority first, then the coordination
+        loop moves the most delayed trains earlier in the routing order while this lowers the
+        total weighted completion time, until time_limit_seconds runs out.
+        """
+        if start_time is None:
+            start_time = datetime.utcnow()
+        holds = holds or {}
+        routes = routes or {}
+        section_headways = section_headways or {}
+        deadline = time.monotonic() + time_limit_seconds
+
+        position = {s.id: k for k, s in enumerate(sections)}
+        legs: Dict[int, List[Leg]] = {}
+        for t in trains:
+            route = routes.get(t.id) or [s.id for s in sections]
+            legs[t.id] = CorridorOptimizer._legs(t, route, sections, position)
+        release, weights = release_and_weights(trains, start_time, holds)
+
+        id_to_train = {t.id: t for t in trains}
+        plans, cost, passes = route_trains(
+            id_to_train,
+            legs,
+            release,
+            weights,
+            single_line=[(s.section_type or "single_line") == "single_line" for s in sections],
+            headways=[section_headways.get(s.id, headway_minutes) for s in sections],
+            stations=[{} if s.has_crossing_station else None for s in sections],
+            deadline=deadline,
+        )
+
+        schedule: List[Dict[str, Any]] = []
+        corridor_exits: List[Dict[str, Any]] = []
+        for tid, plan in plans.items():
+            t = id_to_train[tid]
+            arrival = None
+            for (k, direction, run), (entry, exit_, standing) in zip(legs[tid], plan):
+                section = sections[k]
+                item = {
+                    "train_id": tid,
+                    "section_id": section.id,
+                    "direction": "up" if direction > 0 else "down",
+                    "planned_entry": (start_time + timedelta(minutes=entry)).isoformat(),
+                    "planned_exit": (start_time + timedelta(minutes=exit_)).isoformat(),
+                    "effective_speed": min(t.max_speed or 100, section.max_speed_limit),
+                    "wait_minutes": round(entry - arrival, 3) if arrival is not None else 0.0,
+                    "waited_in_loop": standing is not None,
+                }
+                schedule.append(item)
+                arrival = entry + run
+            corridor_exits.append(schedule[-1])
+
+        schedule.sort(key=lambda x: x["planned_entry"])
+        metrics = HeuristicOptimizer.metrics_from_schedule(corridor_exits)
+        metrics.update(delay_metrics(plans, legs, release))
+        metrics.update({"sections": len(sections), "coordination_passes": passes})
+        return {"objective": cost, "schedule": schedule, "metrics": metrics}
+
+    @staticmethod
+    def _legs(train: Train, route: List[int], sections: List[Section], position: Dict[int, int]) -> List[Leg]:
+        if any(sid not in position for sid in route):
+            raise ValueError(f"Route of train {train.id} leaves the corridor")
+        idx = [position[sid] for sid in route]
+        direction = 1 if len(idx) == 1 or idx[1] > idx[0] else -1
+        if any(b - a != direction for a, b in zip(idx, idx[1:])):
+            raise ValueError(f"Route of train {train.id} is not a contiguous run of the corridor")
+        legs = []
+        for k in idx:
+            section = sections[k]
+            run = section.get_travel_time_minutes(min(train.max_speed or 100, section.max_speed_limit))
+            legs.append((k, direction, max(0.1, float(run))))
+        return legs
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from app.models.train import Train
+from app.models.section import Section
+from app.services.optimization.heuristic import HeuristicOptimizer
+from app.services.optimization.corridor import (
+    CROSSING_LOOP_CAPACITY, Leg, delay_metrics, release_and_weights, route_trains,
+)
+
+
+class CrossingOptimizer:
+    @staticmethod
+    def direction_of(train: Train, section: Section) -> int:
+        """+1 for trains running start_station -> end_station, -1 for the reverse."""
+        if train.origin_station == section.end_station or train.destination_station == section.start_station:
+            return -1
+        return 1
+
+    @staticmethod
+    def optimize(
+        trains: List[Train],
+        section: Section,
+        start_time: Optional[datetime] = None,
+        directions: Optional[Dict[int, int]] = None,  # +1/-1 per train_id, overrides direction_of
+        headway_minutes: float = 2.0,
+        loop_count: int = CROSSING_LOOP_CAPACITY,
+        platform_loops: Optional[int] = None,  # loops with a platform, defaults to all of them
+        holds: Optional[Dict[int, int]] = None,  # minutes per train_id, relative to start_time
+        time_limit_seconds: float = 1.0,
+    ) -> Dict[str, Any]:
+        """
+        Plan crossings of opposing trains on a single-line section:
+        - The crossing station splits the section into two single-line blocks; the section has
+          no station chainage, so it is placed at mid-section
+        - A train waiting for an opposing train stands on one of loop_count loops if it
+          can_use_loop_line, otherwise on the main line, which blocks through trains meanwhile
+        - Trains that requires_platform only stand where there is a platform: the main line and
+          the first platform_loops loops
+        - Without a free standing track a train waits on the approach block, keeping it occupied
+        Trains are routed with the corridor decomposition of CorridorOptimizer.
+        """
+        if start_time is None:
+            start_time = datetime.utcnow()
+        directions = directions or {}
+        deadline = time.monotonic() + time_limit_seconds
+
+        with_station = bool(section.has_crossing_station) and loop_count > 0
+        legs: Dict[int, List[Leg]] = {}
+        for t in trains:
+            direction = directions.get(t.id) or CrossingOptimizer.direction_of(t, section)
+            run = max(0.1, float(section.get_travel_time_minutes(min(t.max_speed or 100, section.max_speed_limit))))
+            if with_station:
+                blocks = [0, 1] if direction > 0 else [1, 0]
+                legs[t.id] = [(block, direction, run / 2) for block in blocks]
+            else:
+                legs[t.id] = [(0, direction, run)]
+        release, weights = release_and_weights(trains, start_time, holds or {})
+
+        id_to_train = {t.id: t for t in trains}
+        station_spec = dict(loop_count=loop_count, platform_loops=platform_loops, main_line_standing=True)
+        plans, cost, passes = route_trains(
+            id_to_train,
+            legs,
+            release,
+            weights,
+            single_line=[True, True] if with_station else [True],
+            headways=[headway_minutes, headway_minutes] if with_station else [headway_minutes],
+            stations=[station_spec, None] if with_station else [None],
+            deadline=deadline,
+        )
+
+        def at(minutes: float) -> str:
+            return (start_time + timedelta(minutes=minutes)).isoformat()
+
+        plan_items: List[Dict[str, Any]] = []
+        standing_at_station = []
+        station_passes = []
+        for tid, plan in plans.items():
+            t = id_to_train[tid]
+            direction = legs[tid][0][1]
+            item = {
+                "train_id": tid,
+                "section_id": section.id,
+                "direction": "up" if direction > 0 else "down",
+                "planned_entry": at(plan[0][0]),
+                "planned_exit": at(plan[-1][1]),
+                "effective_speed": min(t.max_speed or 100, section.max_speed_limit),
+                "priority": t.priority.name if getattr(t, "priority", None) else "MEDIUM",
+            }
+            if with_station:
+                arrival = plan[0][0] + legs[tid][0][2]
+                departure = plan[1][0]
+                standing = plan[1][2]
+                if standing is not None:
+                    wait_location = standing
+                    standing_at_station.append((arrival, departure, tid, direction))
+                elif departure > arrival + 1e-9:
+                    wait_location = "approach"
+                else:
+                    wait_location = None
+                    station_passes.append((departure, tid, direction))
+                item.update({
+                    "crossing_station": section.crossing_station_name,
+                    "station_arrival": at(arrival),
+                    "station_departure": at(departure),
+                    "wait_minutes": round(departure - arrival, 3),
+                    "wait_location": wait_location,
+                })
+            plan_items.append(item)
+        plan_items.sort(key=lambda x: x["planned_entry"])
+
+        # An opposing train running through while another stands at the station crosses it there
+        crossings = [
+            {"standing_train_id": s_tid, "passing_train_id": p_tid, "time": at(p_time)}
+            for s_arr, s_dep, s_tid, s_dir in standing_at_station
+            for p_time, p_tid, p_dir in station_passes
+            if p_dir != s_dir and s_arr <= p_time <= s_dep
+        ]
+        crossings.sort(key=lambda x: x["time"])
+
+        metrics = HeuristicOptimizer.metrics_from_schedule(plan_items)
+        metrics.update(delay_metrics(plans, legs, release))
+        metrics.update({"crossings": len(crossings), "coordination_passes": passes})
+        return {"objective": cost, "crossing_plan": plan_items, "crossings": crossings, "metrics": metrics}
@@ -1,18 +1,54 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
 
 from app.models.train import Train
 from app.models.section import Section
+from app.services.optimization.local_search import LocalSearch, LOCAL_SEARCH_DEFAULT_BUDGET_MS
 
 class HeuristicOptimizer:
     @staticmethod
-    def precedence_order(trains: List[Train]) -> List[int]:
+    def precedence_order(
+        trains: List[Train],
+        previous_order: Optional[List[int]] = None,
+        affected_ids: Optional[Iterable[int]] = None,
+    ) -> List[int]:
         # Sort trains by priority score, then by scheduled_departure
         def sort_key(t: Train):
             sched_dep = t.scheduled_departure or datetime.utcnow()
             return (-t.get_priority_score(), sched_dep)
-        ordered = sorted(trains, key=sort_key)
-        return [t.id for t in ordered]
+        if not previous_order:
+            ordered = sorted(trains, key=sort_key)
+            return [t.id for t in ordered]
+
+        # Warm start: keep the previous relative order of unaffected trains and
+        # re-insert only new or affected trains by priority
+        id_to_train = {t.id: t for t in trains}
+        affected = set(affected_ids or [])
+        kept = [tid for tid in previous_order if tid in id_to_train and tid not in affected]
+        kept_set = set(kept)
+        inserts = sorted((t for t in trains if t.id not in kept_set), key=sort_key)
+
+        order: List[int] = []
+        k = 0
+        for t in inserts:
+            key = sort_key(t)
+            while k < len(kept) and sort_key(id_to_train[kept[k]]) <= key:
+                order.append(kept[k])
+                k += 1
+            order.append(t.id)
+        order.extend(kept[k:])
+        return order
+
+    @staticmethod
+    def order_from_details(details: Optional[Dict[str, Any]]) -> List[int]:
+        """Extract the train order stored in a Decision's details, if any."""
+        if not details:
+            return []
+        if details.get("precedence_order"):
+            return [int(tid) for tid in details["precedence_order"]]
+        items = details.get("schedule") or details.get("crossing_plan") or []
+        items = sorted(items, key=lambda x: x.get("planned_entry", ""))
+        return [int(item["train_id"]) for item in items if "train_id" in item]
 
     @staticmethod
     def build_schedule(
@@ -21,6 +57,10 @@ class HeuristicOptimizer:
         start_time: Optional[datetime] = None,
         holds: Optional[Dict[int, int]] = None,  # minutes by train_id
         section_speed_limit: Optional[int] = None,
+        previous_order: Optional[List[int]] = None,
+        affected_ids: Optional[Iterable[int]] = None,
+        improvement: Optional[str] = None,  # local search method, see LocalSearch.improve
+        improvement_budget_ms: int = LOCAL_SEARCH_DEFAULT_BUDGET_MS,
     ) -> List[Dict[str, Any]]:
         if start_time is None:
             start_time = datetime.utcnow()
@@ -29,9 +69,23 @@ class HeuristicOptimizer:
         effective_section_speed = min(section.max_speed_limit, section_speed_limit) if section_speed_limit else section.max_speed_limit
 
         # Determine order
-        order = HeuristicOptimizer.precedence_order(trains)
+        order = HeuristicOptimizer.precedence_order(trains, previous_order, affected_ids)
         id_to_train = {t.id: t for t in trains}
 
+        release: Dict[int, float] = {}
+        if improvement:
+            # Released at scheduled departure or end of hold, as in ORLinearOptimizer; the loop
+            # below uses the same release times so the searched order is timed as evaluated
+            travel, weights = {}, {}
+            for t in trains:
+                r_time = max(start_time, t.scheduled_departure or start_time)
+                if holds.get(t.id, 0) > 0:
+                    r_time = max(r_time, start_time + timedelta(minutes=holds[t.id]))
+                release[t.id] = (r_time - start_time).total_seconds() / 60.0
+                travel[t.id] = section.get_travel_time_minutes(min(t.max_speed or 100, effective_section_speed))
+                weights[t.id] = float(getattr(t.priority, "value", 2))
+            order = LocalSearch.improve(order, release, travel, weights, improvement, improvement_budget_ms)
+
         schedule = []
         current_time = start_time
 
@@ -45,8 +99,10 @@ class HeuristicOptimizer:
 
             # Enforce priority-first entry: ignore scheduled_departure so higher priority enters first
             planned_entry = current_time
+            if tid in release:
+                planned_entry = max(planned_entry, start_time + timedelta(minutes=release[tid]))
             # Still respect any explicit hold if provided
-            if tid in holds and holds[tid] > 0:
+            elif tid in holds and holds[tid] > 0:
                 planned_entry = max(planned_entry, start_time + timedelta(minutes=holds[tid]))
 
             planned_exit = planned_entry + timedelta(minutes=travel_minutes)
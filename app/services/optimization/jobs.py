@@ -0,0 +1,198 @@
+from __future__ import annotations
+import multiprocessing
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from app.core.config import settings
+from app.services.optimization.or_linear import ORLinearOptimizer
+from app.services.optimization.rolling_horizon import RollingHorizonOptimizer
+from app.services.simulation.sweep import ScenarioSweep
+
+SOLVERS = {
+    "or_linear": ORLinearOptimizer.optimize,
+    "rolling_horizon": RollingHorizonOptimizer.optimize,
+    "what_if": ScenarioSweep.evaluate,
+}
+
+
+# Set in each worker process: where it reports (job_id, started_at) when a job begins
+_started: Optional[multiprocessing.SimpleQueue] = None
+
+
+def _init_worker(started: multiprocessing.SimpleQueue):
+    global _started
+    _started = started
+
+
+def _run_solver(job_id: str, kind: str, payload: bytes) -> Dict[str, Any]:
+    """Worker entry point; arguments arrive pickled so ORM rows are detached snapshots."""
+    started_at = time.time()
+    if _started is not None:
+        _started.put((job_id, started_at))
+    result = SOLVERS[kind](**pickle.loads(payload))
+    return {"started_at": started_at, "finished_at": time.time(), "result": result}
+
+
+class SolverJob:
+    def __init__(self, job_id: str, kind: str, future: Future, submitted_at: float):
+        self.job_id = job_id
+        self.kind = kind
+        self.future = future
+        self.submitted_at = submitted_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+
+    @property
+    def status(self) -> str:
+        if self.cancelled or self.future.cancelled():
+            return "cancelled"
+        if self.future.done():
+            return "failed" if self.future.exception() is not None else "completed"
+        return "running" if self.started_at is not None else "queued"
+
+    @property
+    def wait_seconds(self) -> float:
+        if self.started_at is not None:
+            return self.started_at - self.submitted_at
+        return time.time() - self.submitted_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        status = self.status
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "result": self.future.result()["result"] if status == "completed" else None,
+            "error": str(self.future.exception()) if status == "failed" else None,
+        }
+
+
+class SolverJobQueue:
+    """
+    Bounded process pool for solver runs. Jobs are tracked in memory and kept for
+    retention_seconds after they finish. A running CBC solve cannot be interrupted,
+    so cancelling a running job discards its result once it finishes. The pool marks a
+    future as running as soon as it is moved to the worker call queue, so workers report
+    when they actually start a job over a queue that a listener thread reads; started_at,
+    the running/queued split and queue_depth come from those reports.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int, retention_seconds: int):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, SolverJob] = {}
+        self._lock = threading.Lock()
+        self._started: Optional[multiprocessing.SimpleQueue] = None
+        self._listener: Optional[threading.Thread] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._started = multiprocessing.SimpleQueue()
+            self._listener = threading.Thread(target=self._listen, args=(self._started,),
+                                              name="solver-job-starts", daemon=True)
+            self._listener.start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=_init_worker, initargs=(self._started,)
+            )
+        return self._executor
+
+    def _listen(self, started: multiprocessing.SimpleQueue):
+        while True:
+            report = started.get()
+            if report is None:
+                return
+            job_id, started_at = report
+            # submit registers the job under the lock, so a fast worker cannot report first
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None and job.started_at is None:
+                job.started_at = started_at
+
+    def submit(self, kind: str, kwargs: Dict[str, Any]) -> SolverJob:
+        if kind not in SOLVERS:
+            raise ValueError(f"Unknown solver '{kind}'")
+        payload = pickle.dumps(kwargs)
+        with self._lock:
+            self._prune()
+            if self.queue_depth() >= self.max_queued:
+                raise OverflowError("Solver queue is full")
+            job_id, submitted_at = uuid.uuid4().hex, time.time()
+            future = self._get_executor().submit(_run_solver, job_id, kind, payload)
+            job = SolverJob(job_id, kind, future, submitted_at)
+            self._jobs[job.job_id] = job
+        future.add_done_callback(lambda f, job=job: self._on_done(job, f))
+        return job
+
+    def _on_done(self, job: SolverJob, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            job.finished_at = time.time()
+            return
+        # The result can overtake the start report
+        out = future.result()
+        job.started_at = out["started_at"]
+        job.finished_at = out["finished_at"]
+
+    def get(self, job_id: str) -> Optional[SolverJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[SolverJob]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if not job.future.done():
+            job.future.cancel()
+            job.cancelled = True
+        return job
+
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "queued")
+
+    def metrics(self) -> Dict[str, Any]:
+        jobs: List[SolverJob] = list(self._jobs.values())
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        for job in jobs:
+            counts[job.status] += 1
+        waits = [job.wait_seconds for job in jobs if job.started_at is not None]
+        runs = [job.finished_at - job.started_at for job in jobs
+                if job.started_at is not None and job.finished_at is not None]
+        queued_waits = [job.wait_seconds for job in jobs if job.status == "queued"]
+        return {
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "queue_depth": counts["queued"],
+            **counts,
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "max_wait_seconds": round(max(waits + queued_waits), 3) if waits or queued_waits else 0.0,
+            "avg_run_seconds": round(sum(runs) / len(runs), 3) if runs else 0.0,
+        }
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.job_id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._started.put(None)
+            self._started = self._listener = None
+
+
+# Shared queue for the API process
+solver_jobs = SolverJobQueue(
+    max_workers=settings.MAX_WORKERS,
+    max_queued=settings.SOLVER_QUEUE_MAX_DEPTH,
+    retention_seconds=settings.SOLVER_JOB_RETENTION_SECONDS,
+)
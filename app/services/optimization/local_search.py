@@ -0,0 +1,209 @@
+from __future__ import annotations
+import bisect
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+LOCAL_SEARCH_METHODS = ("descent", "tabu", "annealing")
+LOCAL_SEARCH_DEFAULT_BUDGET_MS = 50
+MAX_MOVE_DISTANCE = 8
+MAX_BLOCK_LENGTH = 3
+TABU_TENURE = 7
+TABU_CANDIDATES = 200
+ANNEALING_COOLING = 0.999
+
+# (position, block length, signed distance): move order[i:i+length] by distance places
+Move = Tuple[int, int, int]
+
+
+class LocalSearch:
+    """
+    Improve a single-section precedence order for total weighted completion time.
+    Trains run back to back and a train cannot enter before its release time, matching
+    HeuristicOptimizer.build_schedule.
+
+    Moves are adjacent swaps, single-train insertions and or-opt block moves (2-3 trains),
+    all limited to MAX_MOVE_DISTANCE places, so evaluating a move only re-times the span it
+    touches. The shift this causes further down the order is applied through prefix sums of
+    the weights and only changes at trains with a positive release time, so the rest of the
+    order costs one step per such train until an idle wait before a release absorbs the
+    shift. Constant time per move therefore only holds when every train is already released
+    (no hold, departure not in the future); with scheduled departures ahead, as in live
+    use, a move costs up to one step per later train while the section stays busy.
+    """
+
+    def __init__(
+        self,
+        order: List[int],
+        release: Dict[int, float],  # minutes from start_time
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+    ):
+        self.order = list(order)
+        self.release = release
+        self.travel = travel
+        self.weights = weights
+        self._refresh()
+
+    def _refresh(self):
+        """Recompute completion times and prefix sums after the order changed."""
+        self.completion: List[float] = []
+        self.weight_prefix = [0.0]
+        self.cost_prefix = [0.0]
+        self.released: List[int] = []  # positions whose train has a positive release time
+        t = 0.0
+        for k, tid in enumerate(self.order):
+            if self.release[tid] > 0:
+                self.released.append(k)
+            t = max(t, self.release[tid]) + self.travel[tid]
+            self.completion.append(t)
+            self.weight_prefix.append(self.weight_prefix[-1] + self.weights[tid])
+            self.cost_prefix.append(self.cost_prefix[-1] + self.weights[tid] * t)
+        self.cost = self.cost_prefix[-1]
+
+    def _segment(self, move: Move) -> Tuple[int, List[int]]:
+        """First position and new contents of the span a move rearranges."""
+        i, length, distance = move
+        block = self.order[i:i + length]
+        if distance > 0:
+            return i, self.order[i + length:i + length + distance] + block
+        return i + distance, block + self.order[i + distance:i]
+
+    def delta(self, move: Move) -> float:
+        a, segment = self._segment(move)
+        b = a + len(segment) - 1
+        t = self.completion[a - 1] if a > 0 else 0.0
+        span_cost = 0.0
+        for tid in segment:
+            t = max(t, self.release[tid]) + self.travel[tid]
+            span_cost += self.weights[tid] * t
+        delta = span_cost - (self.cost_prefix[b + 1] - self.cost_prefix[a])
+
+        shift = t - self.completion[b]
+        k = b + 1
+        n = len(self.order)
+        idx = bisect.bisect_left(self.released, k)
+        while abs(shift) > 1e-9 and k < n:
+            # Trains up to the next released one move by exactly the same shift
+            nxt = self.released[idx] if idx < len(self.released) else n
+            delta += shift * (self.weight_prefix[nxt] - self.weight_prefix[k])
+            if nxt == n:
+                break
+            tid = self.order[nxt]
+            before = self.completion[nxt - 1] + shift
+            shift = max(before, self.release[tid]) + self.travel[tid] - self.completion[nxt]
+            delta += self.weights[tid] * shift
+            k = nxt + 1
+            idx += 1
+        return delta
+
+    def apply(self, move: Move):
+        a, segment = self._segment(move)
+        self.order[a:a + len(segment)] = segment
+        self._refresh()
+
+    def moves(self) -> List[Move]:
+        n = len(self.order)
+        result = []
+        for length in range(1, MAX_BLOCK_LENGTH + 1):
+            for i in range(n - length + 1):
+                for distance in range(1, MAX_MOVE_DISTANCE + 1):
+                    if i + length + distance <= n:
+                        result.append((i, length, distance))
+                    # A backward single-train step is the same swap as a forward one
+                    if i - distance >= 0 and not (length == 1 and distance == 1):
+                        result.append((i, length, -distance))
+        return result
+
+    def descent(self, deadline: float):
+        """First-improvement descent until no move improves or the deadline passes."""
+        improved = True
+        while improved:
+            improved = False
+            for move in self.moves():
+                if time.perf_counter() >= deadline:
+                    return
+                if self.delta(move) < -1e-9:
+                    self.apply(move)
+                    improved = True
+
+    def tabu(self, deadline: float, rng: random.Random):
+        """
+        Take the best sampled move each iteration, even if it worsens the order. Trains
+        moved recently are tabu for TABU_TENURE iterations unless moving them beats the
+        best order found.
+        """
+        best_order, best_cost = list(self.order), self.cost
+        tabu_until: Dict[int, int] = {}
+        iteration = 0
+        all_moves = self.moves()
+        while time.perf_counter() < deadline:
+            iteration += 1
+            candidates = all_moves if len(all_moves) <= TABU_CANDIDATES else rng.sample(all_moves, TABU_CANDIDATES)
+            chosen, chosen_delta = None, math.inf
+            for move in candidates:
+                i, length, _ = move
+                d = self.delta(move)
+                is_tabu = any(tabu_until.get(tid, 0) >= iteration for tid in self.order[i:i + length])
+                if is_tabu and self.cost + d >= best_cost - 1e-9:
+                    continue
+                if d < chosen_delta:
+                    chosen, chosen_delta = move, d
+            if chosen is None:
+                continue
+            i, length, _ = chosen
+            for tid in self.order[i:i + length]:
+                tabu_until[tid] = iteration + TABU_TENURE
+            self.apply(chosen)
+            if self.cost < best_cost - 1e-9:
+                best_order, best_cost = list(self.order), self.cost
+        self.order = best_order
+        self._refresh()
+
+    def annealing(self, deadline: float, rng: random.Random):
+        """Simulated annealing over random moves, starting at the mean uphill delta."""
+        all_moves = self.moves()
+        sample = [self.delta(m) for m in rng.sample(all_moves, min(len(all_moves), 100))]
+        uphill = [d for d in sample if d > 0]
+        temperature = sum(uphill) / len(uphill) if uphill else 1.0
+        best_order, best_cost = list(self.order), self.cost
+        while time.perf_counter() < deadline and temperature > 1e-6:
+            move = rng.choice(all_moves)
+            d = self.delta(move)
+            if d < 0 or rng.random() < math.exp(-d / temperature):
+                self.apply(move)
+                if self.cost < best_cost - 1e-9:
+                    best_order, best_cost = list(self.order), self.cost
+            temperature *= ANNEALING_COOLING
+        self.order = best_order
+        self._refresh()
+
+    @staticmethod
+    def improve(
+        order: List[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+        method: str = "descent",
+        budget_ms: int = LOCAL_SEARCH_DEFAULT_BUDGET_MS,
+        seed: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Return an order at least as good as order within budget_ms:
+        - "descent": swap, insertion and or-opt moves until a local optimum
+        - "tabu": tabu search continued from the descent optimum
+        - "annealing": simulated annealing continued from the descent optimum
+        """
+        if method not in LOCAL_SEARCH_METHODS:
+            raise ValueError(f"Unknown local search method '{method}', expected one of {LOCAL_SEARCH_METHODS}")
+        if len(order) < 2:
+            return list(order)
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        search = LocalSearch(order, release, travel, weights)
+        search.descent(deadline)
+        if method == "tabu":
+            search.tabu(deadline, random.Random(seed))
+        elif method == "annealing":
+            search.annealing(deadline, random.Random(seed))
+        return search.order
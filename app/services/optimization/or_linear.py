@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Set, Tuple
 
 import pulp
 
@@ -9,6 +9,20 @@ from app.models.section import Section
 from app.services.optimization.heuristic import HeuristicOptimizer
 
 
+FORMULATIONS = ("full", "compact")
+COMPACT_MIP_GAP = 0.02
+WARM_START_NEIGHBOURHOOD = 3  # positions around each changed train that are re-solved
+
+
+def solve_status(prob: pulp.LpProblem) -> str:
+    """LpStatus name of a solve; "Feasible" when CBC hit the time limit with a solution."""
+    # CBC reports status Optimal for a timed-out run that kept an incumbent; only
+    # sol_status tells the two apart
+    if prob.sol_status == pulp.LpSolutionIntegerFeasible:
+        return "Feasible"
+    return pulp.LpStatus[prob.status]
+
+
 class ORLinearOptimizer:
     @staticmethod
     def optimize(
@@ -19,24 +33,141 @@ class ORLinearOptimizer:
         holds: Optional[Dict[int, int]] = None,  # minutes per train_id
         section_speed_limit: Optional[int] = None,
         time_limit_seconds: int = 10,
+        formulation: str = "full",
+        previous_order: Optional[List[int]] = None,
+        affected_ids: Optional[Iterable[int]] = None,
     ) -> Dict[str, Any]:
         """
         Build a MILP to minimize weighted completion time subject to:
         - Non-overlap between any two trains with headway
         - Start times not earlier than release times (scheduled departure/now)
         Weights are based on train priority (higher priority => larger weight in objective).
+
+        formulation="full" creates one ordering binary per train pair with a global big-M.
+        formulation="compact" seeds the solver with a heuristic incumbent and bounds each
+        train's start by what any schedule at least as good as the incumbent must satisfy, so
+        no optimum is cut off. Pairs whose windows cannot overlap are dropped, dominated orders
+        are fixed and each pair gets its own big-M. The solve stops at a relative gap of
+        COMPACT_MIP_GAP; dense sections can still run into time_limit_seconds, in which case
+        status is "Feasible" and the best solution found is returned.
+
+        previous_order warm-starts either formulation from an earlier precedence order. New and
+        affected trains are inserted at their cheapest position, the result is passed to CBC as
+        a MIP start, and only pairs within WARM_START_NEIGHBOURHOOD positions of a changed train
+        keep a free ordering decision; every other pair keeps its warm-start order.
         """
+        if formulation not in FORMULATIONS:
+            raise ValueError(f"Unknown formulation '{formulation}', expected one of {FORMULATIONS}")
         if start_time is None:
             start_time = datetime.utcnow()
         holds = holds or {}
 
-        # Precompute travel times and release times in minutes from start_time
+        ids, release, travel, weights, effective_section_speed = ORLinearOptimizer.problem_data(
+            trains, section, start_time, holds, section_speed_limit
+        )
+
+        n = len(ids)
+        if n <= 1:
+            # Trivial schedule
+            schedule = ORLinearOptimizer.schedule_from_starts(
+                ids, release, start_time, release, travel, weights, section.id, effective_section_speed
+            )
+            metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+            return {"schedule": schedule, "metrics": metrics}
+
+        # Warm start from a previous order
+        warm_order, free_ids = None, None
+        if previous_order:
+            warm_order, free_ids = ORLinearOptimizer.warm_start_order(
+                ids, previous_order, affected_ids or [], release, travel, weights, headway_minutes
+            )
+
+        prob, t_vars = ORLinearOptimizer.build_problem(
+            ids, release, travel, weights, headway_minutes, formulation, warm_order, free_ids,
+        )
+
+        # Solve
+        if formulation == "compact" or warm_order:
+            # The incumbent is usually within a few percent; stop once CBC proves a small gap.
+            # CBC preprocessing is disabled because it can crash on large MIP starts.
+            solver = pulp.PULP_CBC_CMD(
+                msg=False,
+                timeLimit=time_limit_seconds,
+                warmStart=True,
+                gapRel=COMPACT_MIP_GAP if formulation == "compact" else None,
+                options=["preprocess off"],
+            )
+        else:
+            solver = pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit_seconds)
+        prob.solve(solver)
+
+        # Build schedule; if not optimal, still use current solution if available
+        status = solve_status(prob)
+        starts = {tid: pulp.value(t_vars[tid]) for tid in ids}
+        schedule = ORLinearOptimizer.schedule_from_starts(
+            ids, starts, start_time, release, travel, weights, section.id, effective_section_speed
+        )
+        metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+
+        return {
+            "status": status,
+            "objective": pulp.value(prob.objective),
+            "schedule": schedule,
+            "metrics": metrics,
+        }
+
+    @staticmethod
+    def incumbent(
+        trains: List[Train],
+        section: Section,
+        start_time: datetime,
+        headway_minutes: float = 2.0,
+        holds: Optional[Dict[int, int]] = None,
+        section_speed_limit: Optional[int] = None,
+        previous_order: Optional[List[int]] = None,
+        affected_ids: Optional[Iterable[int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        The schedule optimize would hand CBC as its MIP start, without solving: the warm-start
+        order when previous_order survives, the WSPT list schedule otherwise. Same result shape
+        as optimize, with status "Heuristic".
+        """
+        ids, release, travel, weights, effective_section_speed = ORLinearOptimizer.problem_data(
+            trains, section, start_time, holds or {}, section_speed_limit
+        )
+        warm_order = None
+        if previous_order and len(ids) > 1:
+            warm_order, _ = ORLinearOptimizer.warm_start_order(
+                ids, previous_order, affected_ids or [], release, travel, weights, headway_minutes
+            )
+        if warm_order:
+            starts = ORLinearOptimizer._sequence_schedule(warm_order, release, travel, headway_minutes)
+        else:
+            starts = ORLinearOptimizer._list_schedule(ids, release, travel, weights, headway_minutes)
+        schedule = ORLinearOptimizer.schedule_from_starts(
+            ids, starts, start_time, release, travel, weights, section.id, effective_section_speed
+        )
+        return {
+            "status": "Heuristic",
+            "objective": sum(weights[tid] * (starts[tid] + travel[tid]) for tid in ids),
+            "schedule": schedule,
+            "metrics": HeuristicOptimizer.metrics_from_schedule(schedule),
+        }
+
+    @staticmethod
+    def problem_data(
+        trains: List[Train],
+        section: Section,
+        start_time: datetime,
+        holds: Dict[int, int],
+        section_speed_limit: Optional[int],
+    ) -> Tuple[List[int], Dict[int, float], Dict[int, float], Dict[int, float], int]:
+        """Travel times, release times (minutes from start_time) and priority weights."""
         effective_section_speed = section.max_speed_limit
         if section_speed_limit is not None:
             effective_section_speed = min(effective_section_speed, section_speed_limit)
 
         ids = [t.id for t in trains]
-        idx = {tid: k for k, tid in enumerate(ids)}
 
         travel = {}
         release = {}
@@ -60,62 +191,48 @@ class ORLinearOptimizer:
                 w = 2
             weights[t.id] = float(w)
 
-        n = len(ids)
-        if n <= 1:
-            # Trivial schedule
-            schedule = []
-            for tid in ids:
-                st = start_time + timedelta(minutes=release[tid])
-                et = st + timedelta(minutes=travel[tid])
-                schedule.append({
-                    "train_id": tid,
-                    "section_id": section.id,
-                    "planned_entry": st.isoformat(),
-                    "planned_exit": et.isoformat(),
-                    "effective_speed": effective_section_speed,
-                    "priority_weight": weights[tid],
-                })
-            schedule.sort(key=lambda x: x["planned_entry"])
-            metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
-            return {"schedule": schedule, "metrics": metrics}
+        return ids, release, travel, weights, effective_section_speed
 
-        # Big-M
-        M = max(release.values()) + sum(travel.values()) + headway_minutes + 60.0
-
-        # Problem
+    @staticmethod
+    def build_problem(
+        ids: List[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+        headway_minutes: float,
+        formulation: str,
+        warm_order: Optional[List[int]] = None,
+        free_ids: Optional[Set[int]] = None,
+    ) -> Tuple[pulp.LpProblem, Dict[int, pulp.LpVariable]]:
         prob = pulp.LpProblem("TrainScheduling", pulp.LpMinimize)
 
-        # Variables
-        t_vars = {tid: pulp.LpVariable(f"t_{tid}", lowBound=release[tid], cat=pulp.LpContinuous) for tid in ids}
-        y_vars = {}
-        for i in range(n):
-            for j in range(i + 1, n):
-                ti, tj = ids[i], ids[j]
-                y_vars[(ti, tj)] = pulp.LpVariable(f"y_{ti}_{tj}", lowBound=0, upBound=1, cat=pulp.LpBinary)
+        if formulation == "compact":
+            t_vars = ORLinearOptimizer._add_compact_constraints(
+                prob, ids, release, travel, weights, headway_minutes, warm_order, free_ids,
+            )
+        else:
+            t_vars = ORLinearOptimizer._add_full_constraints(
+                prob, ids, release, travel, headway_minutes, warm_order, free_ids
+            )
 
         # Objective: minimize sum weights * (start + travel)
         prob += pulp.lpSum(weights[tid] * (t_vars[tid] + travel[tid]) for tid in ids)
+        return prob, t_vars
 
-        # Non-overlap constraints with headway
-        for i in range(n):
-            for j in range(i + 1, n):
-                ti, tj = ids[i], ids[j]
-                y = y_vars[(ti, tj)]
-                # If y=1 => i before j
-                prob += t_vars[tj] >= t_vars[ti] + travel[ti] + headway_minutes - M * (1 - y)
-                # If y=0 => j before i
-                prob += t_vars[ti] >= t_vars[tj] + travel[tj] + headway_minutes - M * y
-
-        # Solve
-        solver = pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit_seconds)
-        prob.solve(solver)
-
-        # Build schedule; if not optimal, still use current solution if available
+    @staticmethod
+    def schedule_from_starts(
+        ids: List[int],
+        starts: Dict[int, Optional[float]],
+        start_time: datetime,
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+        section_id: int,
+        effective_section_speed: int,
+    ) -> List[Dict[str, Any]]:
         schedule: List[Dict[str, Any]] = []
-        status = pulp.LpStatus[prob.status]
-
         for tid in ids:
-            start_min = pulp.value(t_vars[tid])
+            start_min = starts.get(tid)
             if start_min is None:
                 # Fallback to release time
                 start_min = release[tid]
@@ -123,7 +240,7 @@ class ORLinearOptimizer:
             et_dt = st_dt + timedelta(minutes=float(travel[tid]))
             schedule.append({
                 "train_id": tid,
-                "section_id": section.id,
+                "section_id": section_id,
                 "planned_entry": st_dt.isoformat(),
                 "planned_exit": et_dt.isoformat(),
                 "effective_speed": effective_section_speed,
@@ -131,11 +248,240 @@ class ORLinearOptimizer:
             })
 
         schedule.sort(key=lambda x: x["planned_entry"])
-        metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+        return schedule
 
-        return {
-            "status": status,
-            "objective": pulp.value(prob.objective),
-            "schedule": schedule,
-            "metrics": metrics,
+    @staticmethod
+    def _add_full_constraints(
+        prob: pulp.LpProblem,
+        ids: List[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        headway_minutes: float,
+        warm_order: Optional[List[int]] = None,
+        free_ids: Optional[Set[int]] = None,
+    ) -> Dict[int, pulp.LpVariable]:
+        n = len(ids)
+
+        # Big-M
+        M = max(release.values()) + sum(travel.values()) + headway_minutes + 60.0
+
+        # Variables
+        t_vars = {tid: pulp.LpVariable(f"t_{tid}", lowBound=release[tid], cat=pulp.LpContinuous) for tid in ids}
+
+        starts = None
+        if warm_order:
+            starts = ORLinearOptimizer._sequence_schedule(warm_order, release, travel, headway_minutes)
+            for tid in ids:
+                t_vars[tid].setInitialValue(starts[tid])
+            # Pairs outside the re-solved neighbourhood keep their previous order
+            for first, second in ORLinearOptimizer._fixed_precedences(warm_order, free_ids):
+                prob += t_vars[second] >= t_vars[first] + travel[first] + headway_minutes
+
+        # Non-overlap constraints with headway
+        for i in range(n):
+            for j in range(i + 1, n):
+                ti, tj = ids[i], ids[j]
+                if starts is not None and (ti not in free_ids or tj not in free_ids):
+                    continue
+
+                y = pulp.LpVariable(f"y_{ti}_{tj}", lowBound=0, upBound=1, cat=pulp.LpBinary)
+                if starts is not None:
+                    y.setInitialValue(1 if starts[ti] < starts[tj] else 0)
+                # If y=1 => i before j
+                prob += t_vars[tj] >= t_vars[ti] + travel[ti] + headway_minutes - M * (1 - y)
+                # If y=0 => j before i
+                prob += t_vars[ti] >= t_vars[tj] + travel[tj] + headway_minutes - M * y
+
+        return t_vars
+
+    @staticmethod
+    def _add_compact_constraints(
+        prob: pulp.LpProblem,
+        ids: List[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+        headway_minutes: float,
+        warm_order: Optional[List[int]] = None,
+        free_ids: Optional[Set[int]] = None,
+    ) -> Dict[int, pulp.LpVariable]:
+        h = headway_minutes
+        weights = {tid: max(w, 1e-6) for tid, w in weights.items()}
+
+        # Start window per train, valid for every schedule at least as good as the incumbent:
+        # - w_i * C_i <= Z_H - sum_{j != i} w_j * (r_j + p_j), since no train finishes before
+        #   its release plus travel time
+        # - S_i <= max_j r_j + sum_{j != i} (p_j + h), since once every train is released an
+        #   idle section could be closed up and lower the objective
+        # The incumbent satisfies both, so it stays a feasible MIP start.
+        if warm_order:
+            incumbent = ORLinearOptimizer._sequence_schedule(warm_order, release, travel, h)
+        else:
+            incumbent = ORLinearOptimizer._list_schedule(ids, release, travel, weights, h)
+        z_incumbent = sum(weights[tid] * (incumbent[tid] + travel[tid]) for tid in ids)
+        lower_total = sum(weights[tid] * (release[tid] + travel[tid]) for tid in ids)
+
+        busy_total = sum(travel[tid] + h for tid in ids)
+        last_release = max(release.values())
+
+        earliest = dict(release)
+        latest = {}
+        for tid in ids:
+            own = weights[tid] * (release[tid] + travel[tid])
+            by_objective = (z_incumbent - (lower_total - own)) / weights[tid] - travel[tid]
+            by_makespan = last_release + busy_total - (travel[tid] + h)
+            # Rounding can leave the bound a hair below the incumbent start
+            latest[tid] = max(incumbent[tid], min(by_objective, by_makespan))
+
+        t_vars = {
+            tid: pulp.LpVariable(f"t_{tid}", lowBound=earliest[tid], upBound=latest[tid], cat=pulp.LpContinuous)
+            for tid in ids
         }
+        for tid in ids:
+            t_vars[tid].setInitialValue(incumbent[tid])
+        if warm_order:
+            # Pairs outside the re-solved neighbourhood keep their previous order
+            for first, second in ORLinearOptimizer._fixed_precedences(warm_order, free_ids):
+                prob += t_vars[second] >= t_vars[first] + travel[first] + h
+
+        def dominates(a: int, b: int) -> bool:
+            # a available no later, no slower and no less important than b => a first in some optimum
+            if release[a] > release[b] or travel[a] > travel[b] or weights[a] < weights[b]:
+                return False
+            if (release[a], travel[a], weights[a]) == (release[b], travel[b], weights[b]):
+                return a < b
+            return True
+
+        n = len(ids)
+        for i in range(n):
+            for j in range(i + 1, n):
+                ti, tj = ids[i], ids[j]
+                # Windows that cannot overlap need no constraint at all
+                if latest[ti] + travel[ti] + h <= earliest[tj] or latest[tj] + travel[tj] + h <= earliest[ti]:
+                    continue
+                if warm_order and (ti not in free_ids or tj not in free_ids):
+                    continue
+                if dominates(ti, tj) and incumbent[ti] < incumbent[tj]:
+                    prob += t_vars[tj] >= t_vars[ti] + travel[ti] + h
+                    continue
+                if dominates(tj, ti) and incumbent[tj] < incumbent[ti]:
+                    prob += t_vars[ti] >= t_vars[tj] + travel[tj] + h
+                    continue
+
+                # Smallest M that deactivates each disjunct over the variable windows
+                m_ij = max(0.0, latest[ti] + travel[ti] + h - earliest[tj])
+                m_ji = max(0.0, latest[tj] + travel[tj] + h - earliest[ti])
+                y = pulp.LpVariable(f"y_{ti}_{tj}", lowBound=0, upBound=1, cat=pulp.LpBinary)
+                y.setInitialValue(1 if incumbent[ti] < incumbent[tj] else 0)
+                # If y=1 => i before j
+                prob += t_vars[tj] >= t_vars[ti] + travel[ti] + h - m_ij * (1 - y)
+                # If y=0 => j before i
+                prob += t_vars[ti] >= t_vars[tj] + travel[tj] + h - m_ji * y
+
+        return t_vars
+
+    @staticmethod
+    def _list_schedule(
+        ids: List[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+        headway_minutes: float,
+    ) -> Dict[int, float]:
+        """Non-delay list schedule: whenever the section frees up, dispatch the released
+        train with the highest weight per minute of occupation (WSPT)."""
+        pending = sorted(ids, key=lambda tid: release[tid])
+        starts: Dict[int, float] = {}
+        clock = 0.0
+        while pending:
+            clock = max(clock, release[pending[0]])
+            ready = [tid for tid in pending if release[tid] <= clock]
+            best = max(ready, key=lambda tid: (weights[tid] / travel[tid], -release[tid], -tid))
+            starts[best] = clock
+            clock += travel[best] + headway_minutes
+            pending.remove(best)
+        return starts
+
+    @staticmethod
+    def _sequence_schedule(
+        order: List[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        headway_minutes: float,
+    ) -> Dict[int, float]:
+        """Earliest start times when trains enter strictly in the given order."""
+        starts: Dict[int, float] = {}
+        clock = 0.0
+        for tid in order:
+            clock = max(clock, release[tid])
+            starts[tid] = clock
+            clock += travel[tid] + headway_minutes
+        return starts
+
+    @staticmethod
+    def warm_start_order(
+        ids: List[int],
+        previous_order: List[int],
+        affected_ids: Iterable[int],
+        release: Dict[int, float],
+        travel: Dict[int, float],
+        weights: Dict[int, float],
+        headway_minutes: float,
+    ) -> Tuple[Optional[List[int]], Optional[Set[int]]]:
+        """Merge a previous order with the current train set.
+
+        Returns the merged order and the trains whose ordering stays free, or (None, None)
+        when too little of the previous order survives or the merged order is worse than
+        a cold heuristic start.
+        """
+        present = set(ids)
+        affected = set(affected_ids)
+        kept = [tid for tid in dict.fromkeys(previous_order) if tid in present and tid not in affected]
+        changed = [tid for tid in ids if tid not in set(kept)]
+        if len(kept) < len(changed):
+            return None, None
+
+        def cost(order: List[int]) -> float:
+            starts = ORLinearOptimizer._sequence_schedule(order, release, travel, headway_minutes)
+            return sum(weights[tid] * (starts[tid] + travel[tid]) for tid in order)
+
+        # Cheapest insertion of new or affected trains, earliest release first
+        order = list(kept)
+        for tid in sorted(changed, key=lambda x: release[x]):
+            best = min(range(len(order) + 1), key=lambda k: cost(order[:k] + [tid] + order[k:]))
+            order.insert(best, tid)
+
+        cold = ORLinearOptimizer._list_schedule(ids, release, travel, weights, headway_minutes)
+        if cost(order) > sum(weights[tid] * (cold[tid] + travel[tid]) for tid in ids):
+            return None, None
+
+        free: Set[int] = set()
+        pos = {tid: k for k, tid in enumerate(order)}
+        for tid in changed:
+            lo = max(0, pos[tid] - WARM_START_NEIGHBOURHOOD)
+            hi = min(len(order), pos[tid] + WARM_START_NEIGHBOURHOOD + 1)
+            free.update(order[lo:hi])
+        return order, free
+
+    @staticmethod
+    def _fixed_precedences(order: List[int], free_ids: Set[int]) -> List[Tuple[int, int]]:
+        """Precedence pairs that pin every pair not fully inside free_ids to the given order.
+
+        Consecutive fixed trains form a chain, and each free train only needs its nearest
+        fixed neighbours; all other fixed pairs follow by transitivity.
+        """
+        pairs: List[Tuple[int, int]] = []
+        prev_fixed = None
+        pending_free: List[int] = []
+        for tid in order:
+            if tid in free_ids:
+                if prev_fixed is not None:
+                    pairs.append((prev_fixed, tid))
+                pending_free.append(tid)
+                continue
+            if prev_fixed is not None:
+                pairs.append((prev_fixed, tid))
+            pairs.extend((f, tid) for f in pending_free)
+            pending_free = []
+            prev_fixed = tid
+        return pairs
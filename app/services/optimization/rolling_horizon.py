@@ -0,0 +1,179 @@
+from __future__ import annotations
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Iterable
+
+from app.models.train import Train, TrainStatus
+from app.models.section import Section
+from app.services.optimization.heuristic import HeuristicOptimizer
+from app.services.optimization.or_linear import ORLinearOptimizer
+
+MIN_WINDOW_SECONDS = 0.5  # shortest CBC solve worth starting for a window
+
+
+class RollingHorizonOptimizer:
+    @staticmethod
+    def optimize(
+        trains: List[Train],
+        section: Section,
+        start_time: Optional[datetime] = None,
+        horizon_minutes: float = 60.0,
+        step_minutes: float = 20.0,
+        headway_minutes: float = 2.0,
+        holds: Optional[Dict[int, int]] = None,  # minutes per train_id, relative to start_time
+        section_speed_limit: Optional[int] = None,
+        time_limit_seconds: int = 10,
+        formulation: str = "compact",
+        previous_order: Optional[List[int]] = None,
+        affected_ids: Optional[Iterable[int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Re-plan a live section with a sliding look-ahead window:
+        - Trains already inside the section are frozen and block it until they exit
+        - Each window solves only trains released within horizon_minutes of the window start
+        - Trains entering within step_minutes are committed, the rest are re-planned
+          in the next window together with newly released trains
+        previous_order/affected_ids warm-start every window as in ORLinearOptimizer.
+        time_limit_seconds bounds the whole re-plan: each window's CBC solve gets what is left
+        of it. Once less than MIN_WINDOW_SECONDS is left, the remaining windows take the MIP
+        start CBC would have begun from (ORLinearOptimizer.incumbent, status "Heuristic") and
+        metrics report budget_exhausted.
+        The objective reported is the weighted completion time of the non-frozen trains,
+        measured from start_time like ORLinearOptimizer.
+        """
+        if step_minutes <= 0 or horizon_minutes < step_minutes:
+            raise ValueError("Require 0 < step_minutes <= horizon_minutes")
+        if start_time is None:
+            start_time = datetime.utcnow()
+        holds = holds or {}
+        affected_ids = list(affected_ids or [])
+
+        effective_section_speed = section.max_speed_limit
+        if section_speed_limit is not None:
+            effective_section_speed = min(effective_section_speed, section_speed_limit)
+
+        schedule: List[Dict[str, Any]] = []
+        available = start_time
+
+        # Freeze trains already occupying the section; they only contribute remaining run time
+        pending: List[Train] = []
+        for t in trains:
+            if t.current_section_id == section.id and t.status in (TrainStatus.RUNNING, TrainStatus.DELAYED):
+                eff_speed = min(t.max_speed or 100, effective_section_speed)
+                remaining_km = max(0.0, section.length_km - (t.current_position_km or 0.0))
+                fraction = remaining_km / section.length_km if section.length_km else 0.0
+                exit_time = start_time + timedelta(minutes=section.get_travel_time_minutes(eff_speed) * fraction)
+                schedule.append({
+                    "train_id": t.id,
+                    "section_id": section.id,
+                    "planned_entry": start_time.isoformat(),
+                    "planned_exit": exit_time.isoformat(),
+                    "effective_speed": eff_speed,
+                    "frozen": True,
+                })
+                available = max(available, exit_time + timedelta(minutes=headway_minutes))
+            else:
+                pending.append(t)
+
+        def release_of(t: Train) -> datetime:
+            r_time = max(start_time, t.scheduled_departure or start_time)
+            if holds.get(t.id, 0) > 0:
+                r_time = max(r_time, start_time + timedelta(minutes=holds[t.id]))
+            return r_time
+
+        release = {t.id: release_of(t) for t in pending}
+        pending.sort(key=lambda t: release[t.id])
+
+        deadline = time.monotonic() + time_limit_seconds
+        budget_exhausted = False
+        statuses = set()
+        windows = 0
+        clock = start_time
+        while pending:
+            # Skip idle time until the next release
+            clock = max(clock, min(release[t.id] for t in pending))
+            window_end = clock + timedelta(minutes=horizon_minutes)
+            window = [t for t in pending if release[t.id] < window_end]
+
+            # Holds are expressed relative to the window start
+            solve_start = max(available, clock)
+            window_holds = {}
+            for t in window:
+                offset = (release[t.id] - solve_start).total_seconds() / 60.0
+                if t.id in holds and offset > 0:
+                    window_holds[t.id] = offset
+
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_WINDOW_SECONDS:
+                budget_exhausted = True
+                res = ORLinearOptimizer.incumbent(
+                    trains=window,
+                    section=section,
+                    start_time=solve_start,
+                    headway_minutes=headway_minutes,
+                    holds=window_holds,
+                    section_speed_limit=section_speed_limit,
+                    previous_order=previous_order,
+                    affected_ids=affected_ids,
+                )
+            else:
+                res = ORLinearOptimizer.optimize(
+                    trains=window,
+                    section=section,
+                    start_time=solve_start,
+                    headway_minutes=headway_minutes,
+                    holds=window_holds,
+                    section_speed_limit=section_speed_limit,
+                    time_limit_seconds=remaining,
+                    formulation=formulation,
+                    previous_order=previous_order,
+                    affected_ids=affected_ids,
+                )
+            windows += 1
+            if res.get("status"):
+                statuses.add(res["status"])
+
+            # Commit trains entering before the next re-plan; always commit at least one
+            planned = sorted(res["schedule"], key=lambda x: x["planned_entry"])
+            commit_before = clock + timedelta(minutes=step_minutes)
+            if len(window) == len(pending):
+                committed = planned
+            else:
+                committed = [
+                    item for item in planned
+                    if datetime.fromisoformat(item["planned_entry"]) < commit_before
+                ] or planned[:1]
+
+            committed_ids = {item["train_id"] for item in committed}
+            schedule.extend(committed)
+            last_exit = max(datetime.fromisoformat(item["planned_exit"]) for item in committed)
+            available = max(available, last_exit + timedelta(minutes=headway_minutes))
+            pending = [t for t in pending if t.id not in committed_ids]
+            clock = commit_before
+
+        schedule.sort(key=lambda x: x["planned_entry"])
+        metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+        metrics["windows_solved"] = windows
+        metrics["budget_exhausted"] = budget_exhausted
+
+        weights = {t.id: float(getattr(t.priority, "value", 2)) for t in trains}
+        objective = 0.0
+        for item in schedule:
+            if item.get("frozen"):
+                continue
+            completion = (datetime.fromisoformat(item["planned_exit"]) - start_time).total_seconds() / 60.0
+            objective += weights[item["train_id"]] * completion
+
+        if not statuses:
+            status = None
+        elif len(statuses) == 1:
+            status = statuses.pop()
+        else:
+            status = "Mixed"
+
+        return {
+            "status": status,
+            "objective": objective,
+            "schedule": schedule,
+            "metrics": metrics,
+        }
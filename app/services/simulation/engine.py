@@ -0,0 +1,387 @@
+from __future__ import annotations
+import heapq
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+from app.models.train import Train
+from app.models.section import Section
+from app.services.optimization.corridor import CROSSING_LOOP_CAPACITY
+
+POLICIES = ("fifo", "priority")
+
+# Train phases
+AT_STATION = 0  # waiting to enter the next section of its route
+IN_BLOCK = 1
+FINISHED = 2
+
+
+class TrainState:
+    __slots__ = (
+        "idx", "train_id", "rank", "legs", "leg", "block", "phase", "station",
+        "wait_since", "entries", "exits", "finished_at",
+    )
+
+    def __init__(self, idx: int, train_id: int, rank: float, legs: List["Leg"]):
+        self.idx = idx
+        self.train_id = train_id
+        self.rank = rank
+        self.legs = legs
+        self.leg = 0
+        self.block = -1
+        self.phase = AT_STATION
+        self.station: Optional[Tuple[str, int]] = None  # (station, direction) slot held between sections
+        self.wait_since: Optional[float] = None
+        self.entries: List[Optional[float]] = [None] * len(legs)
+        self.exits: List[Optional[float]] = [None] * len(legs)
+        self.finished_at: Optional[float] = None
+
+
+class BlockState:
+    __slots__ = ("occupant", "waiters")
+
+    def __init__(self):
+        self.occupant: Optional[int] = None
+        self.waiters: List[int] = []
+
+
+class Leg:
+    __slots__ = ("section", "direction", "planned_entry", "planned_exit", "dwell", "block_minutes", "exit_station")
+
+    def __init__(self, section: int, direction: int, planned_entry: float, planned_exit: float, dwell: float,
+                 block_minutes: float, exit_station: str):
+        self.section = section
+        self.direction = direction
+        self.planned_entry = planned_entry
+        self.planned_exit = planned_exit
+        self.dwell = dwell
+        self.block_minutes = block_minutes  # per block at the train's own speed
+        self.exit_station = exit_station
+
+
+class SimulationEngine:
+    """
+    Discrete-event replay of trains running their timetabled sections.
+
+    Each section is cut into fixed blocks of signal_spacing_km; a block holds one train and is
+    released when the train's head enters the next block. single_line sections share their blocks
+    between directions and are entered only when no opposing train is inside; other section types
+    have one set of blocks per direction. Successive entries into a section keep headway_minutes.
+
+    Between sections a train stands at the station it reached, which holds one train per direction
+    on its platform line plus CROSSING_LOOP_CAPACITY per direction on loops if a neighbouring
+    section has_crossing_station. A train reserves its slot at the far station before entering a
+    section, so it never stops inside the section for want of room there, and opposing trains
+    never wait on each other's station slots. It then dwells dwell_time_minutes before departing, never earlier than
+    its planned entry into the next section.
+
+    Section.maintenance_windows is a list of {"start", "end"} in ISO datetimes or daily "HH:MM";
+    no train enters the section during a window. Section.weather_restrictions is a list of
+    {"max_speed_kmh", "start", "end"} with the times optional; trains entering a block while one
+    applies are capped to that speed.
+
+    Waiting trains are served by policy when a resource frees: "fifo" by waiting time,
+    "priority" by priority score, or a dict of train_id -> rank such as an optimizer's order.
+    Trains still waiting when no event is left are reported as deadlocked.
+    """
+
+    def __init__(
+        self,
+        sections: List[Section],
+        start_time: datetime,
+        headway_minutes: float = 2.0,
+        policy: Union[str, Dict[int, int]] = "fifo",
+        horizon_days: int = 2,
+    ):
+        if isinstance(policy, str) and policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {POLICIES} or a rank per train")
+        self.start_time = start_time
+        self.headway = headway_minutes
+        self.policy = policy
+        self.sections = sections
+        self.section_index = {s.id: k for k, s in enumerate(sections)}
+        self.single_line = [(s.section_type or "single_line") == "single_line" for s in sections]
+        self.block_count = [
+            max(1, math.ceil((s.length_km or 0.0) / (s.signal_spacing_km or s.length_km or 1.0))) for s in sections
+        ]
+        self.maintenance = [self._windows(s.maintenance_windows, horizon_days) for s in sections]
+        self.weather = [self._speed_windows(s.weather_restrictions, horizon_days) for s in sections]
+
+        self.station_capacity: Dict[str, int] = {}
+        for s in sections:
+            tracks = 1 + CROSSING_LOOP_CAPACITY if s.has_crossing_station else 1
+            for name in (s.start_station, s.end_station):
+                self.station_capacity[name] = max(self.station_capacity.get(name, 1), tracks)
+        self.station_used: Dict[Tuple[str, int], int] = {}
+        self.station_waiters: Dict[Tuple[str, int], List[int]] = {}
+
+        self.blocks: Dict[Tuple[int, int, int], BlockState] = {}
+        self.in_section: List[Dict[int, int]] = [{1: 0, -1: 0} for _ in sections]
+        self.section_waiters: List[List[int]] = [[] for _ in sections]
+        self.last_entry: Dict[Tuple[int, int], float] = {}
+
+        self.trains: List[TrainState] = []
+        self.max_speed: List[float] = []
+        self.queue: List[Tuple[float, float, int, int]] = []
+        self.seq = 0
+        self.events = 0
+
+    # Setup
+
+    def minutes(self, value: datetime) -> float:
+        return (value - self.start_time).total_seconds() / 60.0
+
+    def _windows(self, spec: Any, days: int) -> List[Tuple[float, float]]:
+        windows = []
+        for item in spec or []:
+            try:
+                start, end = item["start"], item["end"]
+            except (TypeError, KeyError):
+                continue
+            windows.extend(self._expand(start, end, days))
+        return sorted(windows)
+
+    def _speed_windows(self, spec: Any, days: int) -> List[Tuple[float, float, float]]:
+        windows = []
+        for item in spec or []:
+            if not isinstance(item, dict):
+                continue
+            speed = item.get("max_speed_kmh", item.get("max_speed"))
+            if not speed:
+                continue
+            if item.get("start") and item.get("end"):
+                windows.extend((a, b, float(speed)) for a, b in self._expand(item["start"], item["end"], days))
+            else:
+                windows.append((-math.inf, math.inf, float(speed)))
+        return windows
+
+    def _expand(self, start: str, end: str, days: int) -> List[Tuple[float, float]]:
+        """Minutes from start_time of an absolute window, or of a daily "HH:MM" window on each day."""
+        if "T" in start or "-" in start:
+            return [(self.minutes(datetime.fromisoformat(start)), self.minutes(datetime.fromisoformat(end)))]
+        sh, sm = (int(x) for x in start.split(":"))
+        eh, em = (int(x) for x in end.split(":"))
+        day0 = self.start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        windows = []
+        for d in range(-1, days + 1):
+            a = day0 + timedelta(days=d, hours=sh, minutes=sm)
+            b = day0 + timedelta(days=d, hours=eh, minutes=em)
+            if b <= a:
+                b += timedelta(days=1)
+            windows.append((self.minutes(a), self.minutes(b)))
+        return windows
+
+    def add_train(self, train: Train, schedules: List[Any]):
+        """Add a train running its Schedule rows (or objects with the same fields) in planned order."""
+        rows = sorted(
+            (r for r in schedules if r.section_id in self.section_index),
+            key=lambda r: r.planned_entry,
+        )
+        if not rows:
+            return
+        legs = []
+        station = train.origin_station
+        for n, row in enumerate(rows):
+            section = self.sections[self.section_index[row.section_id]]
+            if station == section.end_station:
+                direction = -1
+            elif station == section.start_station:
+                direction = 1
+            elif n + 1 < len(rows):
+                nxt = self.sections[self.section_index[rows[n + 1].section_id]]
+                direction = 1 if section.end_station in (nxt.start_station, nxt.end_station) else -1
+            else:
+                direction = 1
+            exit_station = section.end_station if direction > 0 else section.start_station
+            speed = min(train.max_speed or 100, section.max_speed_limit or 100)
+            block_minutes = section.get_travel_time_minutes(speed) / self.block_count[self.section_index[section.id]]
+            legs.append(Leg(
+                self.section_index[section.id], direction, self.minutes(row.planned_entry),
+                self.minutes(row.planned_exit), float(row.dwell_time_minutes or 0.0), block_minutes, exit_station,
+            ))
+            station = exit_station
+
+        if isinstance(self.policy, dict):
+            rank = float(self.policy.get(train.id, len(self.policy)))
+        elif self.policy == "priority":
+            rank = -float(train.get_priority_score())
+        else:
+            rank = 0.0
+        state = TrainState(len(self.trains), train.id, rank, legs)
+        self.trains.append(state)
+        self.max_speed.append(float(train.max_speed or 100))
+        self._schedule(legs[0].planned_entry, state)
+
+    # Event loop
+
+    def _schedule(self, at: float, state: TrainState):
+        # FIFO serves the longest-waiting train first among those woken at the same time
+        key = state.wait_since if self.policy == "fifo" and state.wait_since is not None else state.rank
+        self.seq += 1
+        heapq.heappush(self.queue, (at, key, self.seq, state.idx))
+
+    def _wake(self, waiters: List[int], now: float):
+        for idx in waiters:
+            self._schedule(now, self.trains[idx])
+        waiters.clear()
+
+    def _block(self, section: int, direction: int, i: int) -> BlockState:
+        key = (section, 0 if self.single_line[section] else direction, i)
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = BlockState()
+        return block
+
+    def _wait(self, state: TrainState, waiters: List[int], now: float):
+        if state.wait_since is None:
+            state.wait_since = now
+        waiters.append(state.idx)
+
+    def _block_minutes(self, state: TrainState, leg: Leg, now: float) -> float:
+        for a, b, speed in self.weather[leg.section]:
+            if a <= now < b:
+                section = self.sections[leg.section]
+                own = min(self.max_speed[state.idx], section.max_speed_limit or 100)
+                if speed < own:
+                    return leg.block_minutes * own / max(speed, 1.0)
+        return leg.block_minutes
+
+    def _try_enter_section(self, state: TrainState, now: float):
+        leg = state.legs[state.leg]
+        k = leg.section
+        if now < leg.planned_entry:
+            self._schedule(leg.planned_entry, state)
+            return
+        for a, b in self.maintenance[k]:
+            if a <= now < b:
+                self._schedule(b, state)
+                return
+        lane = 0 if self.single_line[k] else leg.direction
+        ready = self.last_entry.get((k, lane), -math.inf) + self.headway
+        if now < ready:
+            self._schedule(ready, state)
+            return
+        if self.single_line[k] and self.in_section[k][-leg.direction] > 0:
+            self._wait(state, self.section_waiters[k], now)
+            return
+        first = self._block(k, leg.direction, 0)
+        if first.occupant is not None:
+            self._wait(state, first.waiters, now)
+            return
+        last_leg = state.leg == len(state.legs) - 1
+        if not last_leg:
+            slot = (leg.exit_station, leg.direction)
+            if self.station_used.get(slot, 0) >= self.station_capacity.get(leg.exit_station, 1):
+                self._wait(state, self.station_waiters.setdefault(slot, []), now)
+                return
+            self.station_used[slot] = self.station_used.get(slot, 0) + 1
+
+        if state.station is not None:
+            self.station_used[state.station] -= 1
+            self._wake(self.station_waiters.get(state.station, []), now)
+            state.station = None
+        first.occupant = state.idx
+        self.in_section[k][leg.direction] += 1
+        self.last_entry[(k, lane)] = now
+        state.phase = IN_BLOCK
+        state.block = 0
+        state.wait_since = None
+        state.entries[state.leg] = now
+        self._schedule(now + self._block_minutes(state, leg, now), state)
+
+    def _try_advance(self, state: TrainState, now: float):
+        leg = state.legs[state.leg]
+        k = leg.section
+        current = self._block(k, leg.direction, state.block)
+        if state.block + 1 < self.block_count[k]:
+            nxt = self._block(k, leg.direction, state.block + 1)
+            if nxt.occupant is not None:
+                self._wait(state, nxt.waiters, now)
+                return
+            nxt.occupant = state.idx
+            current.occupant = None
+            self._wake(current.waiters, now)
+            state.block += 1
+            state.wait_since = None
+            self._schedule(now + self._block_minutes(state, leg, now), state)
+            return
+
+        # Leaving the section into the station reserved on entry, or off the modelled network
+        current.occupant = None
+        self._wake(current.waiters, now)
+        self.in_section[k][leg.direction] -= 1
+        if self.in_section[k][leg.direction] == 0:
+            self._wake(self.section_waiters[k], now)
+        state.exits[state.leg] = now
+        state.wait_since = None
+        if state.leg == len(state.legs) - 1:
+            state.phase = FINISHED
+            state.finished_at = now
+            return
+        state.station = (leg.exit_station, leg.direction)
+        state.leg += 1
+        state.phase = AT_STATION
+        self._schedule(now + leg.dwell, state)
+
+    def run(self, until: Optional[float] = None) -> Dict[str, Any]:
+        """Process events up to until (minutes from start_time) and summarise the replay."""
+        started = time.perf_counter()
+        now = 0.0
+        while self.queue:
+            if until is not None and self.queue[0][0] > until:
+                break
+            at, _, _, idx = heapq.heappop(self.queue)
+            now = at
+            self.events += 1
+            state = self.trains[idx]
+            if state.phase == AT_STATION:
+                self._try_enter_section(state, now)
+            elif state.phase == IN_BLOCK:
+                self._try_advance(state, now)
+        wall_seconds = time.perf_counter() - started
+        return self._summary(now, wall_seconds, stalled=not self.queue)
+
+    def _summary(self, now: float, wall_seconds: float, stalled: bool) -> Dict[str, Any]:
+        trains = []
+        delays = []
+        deadlocked = []
+        for state in self.trains:
+            delay = None
+            if state.finished_at is not None:
+                delay = max(0.0, state.finished_at - state.legs[-1].planned_exit)
+                delays.append(delay)
+            elif stalled:
+                deadlocked.append(state.train_id)
+            trains.append({
+                "train_id": state.train_id,
+                "completed": state.finished_at is not None,
+                "delay_minutes": round(delay, 2) if delay is not None else None,
+                "legs": [
+                    {
+                        "section_id": self.sections[leg.section].id,
+                        "actual_entry": (self.start_time + timedelta(minutes=entry)).isoformat() if entry is not None else None,
+                        "actual_exit": (self.start_time + timedelta(minutes=exit_)).isoformat() if exit_ is not None else None,
+                    }
+                    for leg, entry, exit_ in zip(state.legs, state.entries, state.exits)
+                ],
+            })
+
+        delays.sort()
+        first_entry = min((s.entries[0] for s in self.trains if s.entries[0] is not None), default=0.0)
+        simulated_minutes = max(0.0, now - first_entry)
+        return {
+            "trains": trains,
+            "metrics": {
+                "trains": len(self.trains),
+                "completed": len(delays),
+                "deadlocked": deadlocked,
+                "average_delay_minutes": round(sum(delays) / len(delays), 2) if delays else 0.0,
+                "p90_delay_minutes": round(delays[int(0.9 * (len(delays) - 1))], 2) if delays else 0.0,
+                "throughput_per_hour": round(len(delays) / (simulated_minutes / 60.0), 2) if simulated_minutes > 0 else 0.0,
+                "events": self.events,
+                "simulated_minutes": round(simulated_minutes, 2),
+                "wall_seconds": round(wall_seconds, 4),
+                "realtime_factor": round(simulated_minutes * 60.0 / wall_seconds, 1) if wall_seconds > 0 else None,
+            },
+        }
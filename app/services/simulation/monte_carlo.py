@@ -0,0 +1,108 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from app.models.train import Train
+from app.models.section import Section
+from app.services.optimization.heuristic import HeuristicOptimizer
+
+
+class MonteCarloSimulator:
+    @staticmethod
+    def run(
+        trains: List[Train],
+        section: Section,
+        start_time: Optional[datetime] = None,
+        holds: Optional[Dict[int, int]] = None,
+        section_speed_limit: Optional[int] = None,
+        scenarios: int = 1000,
+        delay_probability: float = 0.3,
+        delay_mean_minutes: float = 5.0,
+        speed_restriction_probability: float = 0.1,
+        speed_restriction_kmh: int = 50,
+        dwell_mean_minutes: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Sample disturbed runs of the build_schedule plan and summarise their spread.
+        Each scenario is one row and each train, in planned order, one column:
+        - A train is late to its planned entry with delay_probability, by an exponential
+          delay of mean delay_mean_minutes
+        - With speed_restriction_probability the whole section runs at speed_restriction_kmh
+        - Every train dwells an exponential dwell_mean_minutes extra in the section
+        Trains keep the planned order and cannot enter before the previous train exits. A
+        conflict is a train ready to enter while the previous one still occupies the section.
+        """
+        if start_time is None:
+            start_time = datetime.utcnow()
+        holds = holds or {}
+        plan = HeuristicOptimizer.build_schedule(
+            trains, section, start_time, holds=holds, section_speed_limit=section_speed_limit
+        )
+        id_to_train = {t.id: t for t in trains}
+        n = len(plan)
+
+        def minutes(value: str) -> float:
+            return (datetime.fromisoformat(value) - start_time).total_seconds() / 60.0
+
+        planned_entry = np.array([minutes(item["planned_entry"]) for item in plan])
+        planned_exit = np.array([minutes(item["planned_exit"]) for item in plan])
+        speeds = np.array([float(item["effective_speed"]) for item in plan])
+        travel = planned_exit - planned_entry
+        restricted_travel = travel * speeds / np.clip(speeds, 1.0, float(speed_restriction_kmh))
+
+        rng = np.random.default_rng(seed)
+        late = rng.random((scenarios, n)) < delay_probability
+        ready = planned_entry + np.where(late, rng.exponential(delay_mean_minutes, (scenarios, n)), 0.0)
+        restricted = rng.random((scenarios, 1)) < speed_restriction_probability
+        run = np.where(restricted, restricted_travel, travel)
+        if dwell_mean_minutes > 0:
+            run = run + rng.exponential(dwell_mean_minutes, (scenarios, n))
+
+        # Single pass over trains, vectorised over scenarios
+        exits = np.empty((scenarios, n))
+        conflicts = np.zeros((scenarios, n), dtype=bool)
+        previous_exit = np.zeros(scenarios)
+        for k in range(n):
+            conflicts[:, k] = previous_exit > ready[:, k]
+            exits[:, k] = np.maximum(previous_exit, ready[:, k]) + run[:, k]
+            previous_exit = exits[:, k]
+
+        delays = np.maximum(exits - planned_exit, 0.0)
+        total_delay = delays.sum(axis=1)
+        span_hours = (exits.max(axis=1) - exits.min(axis=1)) / 60.0 if n > 1 else np.ones(scenarios)
+        throughput = np.where(span_hours > 0, n / np.where(span_hours > 0, span_hours, 1.0), float(n))
+
+        def distribution(values: np.ndarray) -> Dict[str, float]:
+            p50, p90 = np.percentile(values, [50, 90])
+            return {
+                "mean": round(float(values.mean()), 2),
+                "p50": round(float(p50), 2),
+                "p90": round(float(p90), 2),
+                "max": round(float(values.max()), 2),
+            }
+
+        train_p50, train_p90 = np.percentile(delays, [50, 90], axis=0)
+        train_conflicts = conflicts.mean(axis=0)
+        per_train = [
+            {
+                "train_id": item["train_id"],
+                "train_number": id_to_train[item["train_id"]].train_number,
+                "p50_delay_minutes": round(float(train_p50[k]), 2),
+                "p90_delay_minutes": round(float(train_p90[k]), 2),
+                "conflict_probability": round(float(train_conflicts[k]), 4),
+            }
+            for k, item in enumerate(plan)
+        ]
+
+        return {
+            "scenarios": scenarios,
+            "planned_schedule": plan,
+            "train_delay_minutes": distribution(delays),
+            "total_delay_minutes": distribution(total_delay),
+            "throughput_per_hour": distribution(throughput),
+            "conflict_probability": round(float(conflicts.any(axis=1).mean()), 4),
+            "trains": per_train,
+        }
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import itertools
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from app.models.train import Train
+from app.models.section import Section
+from app.services.optimization.heuristic import HeuristicOptimizer
+
+# metric -> True when larger is better
+RANK_METRICS = {
+    "objective": False,
+    "makespan_minutes": False,
+    "throughput_per_hour": True,
+}
+
+
+class ScenarioSweep:
+    @staticmethod
+    def expand(
+        base_holds: Dict[int, int],
+        base_speed_limit: Optional[int],
+        variants: Optional[List[Dict[str, Any]]] = None,
+        grid_holds: Optional[Dict[int, List[int]]] = None,
+        grid_speed_limits: Optional[List[Optional[int]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Scenarios to evaluate: each listed variant, then every combination of the grid.
+        Variant and grid holds are applied on top of the base holds; a speed limit replaces the base one.
+        """
+        scenarios = []
+        for n, variant in enumerate(variants or []):
+            holds = dict(base_holds)
+            holds.update(variant.get("holds") or {})
+            speed_limit = variant.get("section_speed_limit")
+            scenarios.append({
+                "name": variant.get("name") or f"variant-{n + 1}",
+                "holds": holds,
+                "section_speed_limit": speed_limit if speed_limit is not None else base_speed_limit,
+            })
+
+        grid_holds = grid_holds or {}
+        if grid_holds or grid_speed_limits:
+            hold_ids = sorted(grid_holds)
+            speed_options = grid_speed_limits or [base_speed_limit]
+            for minutes in itertools.product(*(grid_holds[tid] for tid in hold_ids)):
+                for speed_limit in speed_options:
+                    holds = dict(base_holds)
+                    holds.update(zip(hold_ids, minutes))
+                    label = [f"hold {tid}={m}" for tid, m in zip(hold_ids, minutes)]
+                    if speed_limit is not None:
+                        label.append(f"speed {speed_limit}")
+                    scenarios.append({
+                        "name": ", ".join(label) or "base",
+                        "holds": holds,
+                        "section_speed_limit": speed_limit if speed_limit is not None else base_speed_limit,
+                    })
+        return scenarios
+
+    @staticmethod
+    def evaluate(
+        trains: List[Train],
+        section: Section,
+        start_time: datetime,
+        holds: Optional[Dict[int, int]] = None,
+        section_speed_limit: Optional[int] = None,
+        improvement: Optional[str] = None,
+        improvement_budget_ms: int = 50,
+    ) -> Dict[str, Any]:
+        """Run one what-if and score it; this is the worker side of a sweep."""
+        schedule = HeuristicOptimizer.build_schedule(
+            trains,
+            section,
+            start_time=start_time,
+            holds=holds,
+            section_speed_limit=section_speed_limit,
+            improvement=improvement,
+            improvement_budget_ms=improvement_budget_ms,
+        )
+        metrics = HeuristicOptimizer.metrics_from_schedule(schedule)
+
+        weights = {t.id: float(getattr(t.priority, "value", 2)) for t in trains}
+        exits = {item["train_id"]: (datetime.fromisoformat(item["planned_exit"]) - start_time).total_seconds() / 60.0
+                 for item in schedule}
+        metrics["objective"] = round(sum(weights[tid] * minutes for tid, minutes in exits.items()), 2)
+        metrics["makespan_minutes"] = round(max(exits.values(), default=0.0), 2)
+        return {"schedule": schedule, "metrics": metrics}
+
+    @staticmethod
+    def rank(results: List[Dict[str, Any]], rank_by: str) -> List[Dict[str, Any]]:
+        """Order finished scenarios best first by metrics[rank_by], adding their rank."""
+        larger_is_better = RANK_METRICS[rank_by]
+        ordered = sorted(
+            results,
+            key=lambda r: r["metrics"][rank_by],
+            reverse=larger_is_better,
+        )
+        return [{"rank": n + 1, **r} for n, r in enumerate(ordered)]
@@ -1,9 +1,273 @@
-from typing import Optional, Any
-from sqlalchemy.orm import Session
+import enum
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+import structlog
+from sqlalchemy import String, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
 from app.models.audit import AuditLog
 
+logger = structlog.get_logger()
+
+_SPILL_GLOB = "audit-*.spill"
+# Entries the database rejected, kept next to the spill files
+_DEAD_LETTER_FILE = "audit-dead-letter.jsonl"
+
+# Every entry carries every column so a batch is one executemany
+ENTRY_FIELDS = tuple(c.key for c in AuditLog.__table__.columns if c.key != "id")
+# Bounded string columns, truncated on submit so an over-long value cannot fail a batch
+_STRING_LENGTHS = {
+    c.key: c.type.length for c in AuditLog.__table__.columns if isinstance(c.type, String) and c.type.length
+}
+
+
+def _json_default(value: Any):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _decode(entry: Dict[str, Any]) -> Dict[str, Any]:
+    entry = dict(entry)
+    entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+    return entry
+
+
+def _spill_owner_alive(path: Path) -> bool:
+    # audit-<pid>.spill or audit-<pid>-<ms>-<n>.spill
+    try:
+        pid = int(path.stem.split("-")[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditWriter:
+    """
+    Queues audit entries and writes them with one bulk INSERT per batch.
+
+    A background thread flushes once batch_size entries are queued or flush_interval_seconds
+    after the first one, so requests never wait on an audit commit. With a spill directory,
+    every entry is first appended to an append-only JSON-lines file (fsynced when spill_fsync
+    is set). A flush rotates that file and deletes it once its batch is committed. A failed
+    flush retries the batch one entry at a time: entries the database rejects (constraint or
+    data errors) are logged and dead-lettered so they cannot block the queue, and the first
+    other error puts the rest back, together with the file, for the next attempt. Files left
+    by a crash are replayed on start. Spill files carry the writing process id, so workers
+    sharing a directory only replay files of processes that are gone. Delivery is at least
+    once: a crash between commit and delete replays that batch.
+    """
+
+    def __init__(self, batch_size: int, flush_interval_seconds: float,
+                 spill_path: Optional[str] = None, spill_fsync: bool = False):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_seconds
+        self.spill_dir = Path(spill_path) if spill_path else None
+        self.spill_fsync = spill_fsync
+        self._pending: List[Dict[str, Any]] = []
+        self._segments: List[Path] = []  # rotated spill files covering _pending
+        self._spill = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._rotations = 0
+        self._counts = {"submitted": 0, "written": 0, "batches": 0, "errors": 0, "recovered": 0, "dead_letters": 0}
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            if self.spill_dir is not None:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                self._recover()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._lock:
+            self._thread = None
+
+    @property
+    def _active_path(self) -> Path:
+        return self.spill_dir / f"audit-{os.getpid()}.spill"
+
+    def _rotate_path(self) -> Path:
+        self._rotations += 1
+        return self.spill_dir / f"audit-{os.getpid()}-{int(datetime.utcnow().timestamp() * 1000)}-{self._rotations}.spill"
+
+    def _recover(self):
+        # Entries from files a finished process did not get to commit; lock held
+        for path in sorted(self.spill_dir.glob(_SPILL_GLOB)):
+            if _spill_owner_alive(path) or path in self._segments or (path == self._active_path and self._spill is not None):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                entries = [_decode(json.loads(line)) for line in f if line.strip()]
+            segment = self._rotate_path()
+            os.replace(path, segment)
+            self._pending.extend(entries)
+            self._segments.append(segment)
+            self._counts["recovered"] += len(entries)
+
+    def submit(self, entry: Dict[str, Any]):
+        """Queue one entry; returns at once. Safe from any thread."""
+        if self._thread is None:
+            self.start()
+        entry = {name: entry.get(name) for name in ENTRY_FIELDS}
+        entry["created_at"] = entry["created_at"] or datetime.utcnow()
+        for name, length in _STRING_LENGTHS.items():
+            if isinstance(entry[name], str) and len(entry[name]) > length:
+                entry[name] = entry[name][:length]
+        # JSON-safe details, so one bad value cannot fail a whole batch
+        entry["details"] = json.loads(json.dumps(entry["details"], default=_json_default))
+        with self._lock:
+            if self.spill_dir is not None:
+                if self._spill is None:
+                    self._spill = open(self._active_path, "a", encoding="utf-8")
+                self._spill.write(json.dumps(entry, default=_json_default) + "\n")
+                self._spill.flush()
+                if self.spill_fsync:
+                    os.fsync(self._spill.fileno())
+            self._pending.append(entry)
+            self._counts["submitted"] += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    self._wake.wait()
+                if self._stopping:
+                    return
+                # Give the batch until the interval to fill up
+                if len(self._pending) < self.batch_size:
+                    self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # Already counted and kept for the next attempt; back off before retrying
+                with self._lock:
+                    self._wake.wait(self.flush_interval)
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of entries inserted."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, []
+                if self._spill is not None:
+                    self._spill.close()
+                    self._spill = None
+                    segment = self._rotate_path()
+                    os.replace(self._active_path, segment)
+                    self._segments.append(segment)
+                segments, self._segments = self._segments, []
+            db = SessionLocal()
+            try:
+                db.execute(insert(AuditLog), batch)
+                db.commit()
+                written, retry, error = len(batch), [], None
+            except Exception as e:
+                db.rollback()
+                logger.warning("Audit batch insert failed, retrying entries one at a time",
+                               entries=len(batch), error=str(e))
+                written, retry, error = self._write_each(db, batch)
+            finally:
+                db.close()
+            if retry:
+                with self._lock:
+                    self._pending[:0] = retry
+                    self._segments[:0] = segments
+                    self._counts["written"] += written
+                    self._counts["errors"] += 1
+                    self.last_error = str(error)
+                logger.error("Audit flush failed", entries=len(retry), error=str(error))
+                raise error
+            for segment in segments:
+                segment.unlink(missing_ok=True)
+            with self._lock:
+                self._counts["written"] += written
+                self._counts["batches"] += 1
+            return written
+
+    def _write_each(self, db, batch: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]], Optional[Exception]]:
+        """Insert entries one per transaction; returns (written, entries to retry, their error)."""
+        written = 0
+        for i, entry in enumerate(batch):
+            try:
+                db.execute(insert(AuditLog), [entry])
+                db.commit()
+            except (IntegrityError, DataError) as e:
+                db.rollback()
+                self._dead_letter(entry, e)
+            except Exception as e:
+                # Not the entry's fault (connection, lock timeout): keep the rest for later
+                db.rollback()
+                return written, batch[i:], e
+            else:
+                written += 1
+        return written, [], None
+
+    def _dead_letter(self, entry: Dict[str, Any], error: Exception):
+        line = json.dumps(entry, default=_json_default)
+        logger.error("Audit entry rejected", entry=line, error=str(error))
+        with self._lock:
+            self._counts["dead_letters"] += 1
+            self.last_error = str(error)
+            if self.spill_dir is not None:
+                with open(self.spill_dir / _DEAD_LETTER_FILE, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "pending": len(self._pending),
+                "spill_path": str(self.spill_dir) if self.spill_dir else None,
+                **self._counts,
+                "last_error": self.last_error,
+            }
+
+
+# Shared writer for the API process
+audit_writer = AuditWriter(
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_seconds=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    spill_path=settings.AUDIT_SPILL_PATH or None,
+    spill_fsync=settings.AUDIT_SPILL_FSYNC,
+)
+
+
 def record_audit(
-    db: Session,
     action: str,
     entity_type: str,
     entity_id: Optional[str] = None,
@@ -11,16 +275,16 @@ def record_audit(
     actor_user_id: Optional[int] = None,
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None,
-):
-    log = AuditLog(
-        actor_user_id=actor_user_id,
-        action=action,
-        entity_type=entity_type,
-        entity_id=str(entity_id) if entity_id is not None else None,
-        details=details,
-        ip_address=ip_address,
-        user_agent=user_agent,
-    )
-    db.add(log)
-    db.commit()
-    return log
+) -> Dict[str, Any]:
+    """Queue an audit entry for the batched writer; it is not part of the caller's transaction."""
+    entry = {
+        "actor_user_id": actor_user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": str(entity_id) if entity_id is not None else None,
+        "details": details,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+    }
+    audit_writer.submit(entry)
+    return entry
@@ -0,0 +1,97 @@
+import base64
+import enum
+import json
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import DateTime, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def parse_enum(enum_cls: Type[enum.Enum], value: str):
+    """Enum member by value or name, e.g. "running" or "RUNNING"; ValueError otherwise."""
+    for member in enum_cls:
+        if value == str(member.value) or value.upper() == member.name:
+            return member
+    raise ValueError(f"Unknown {enum_cls.__name__} '{value}', expected one of {', '.join(str(m.value) for m in enum_cls)}")
+
+
+class KeysetListing:
+    """
+    Cursor-paginated listing of one table.
+
+    Rows are ordered by the `order` columns (the last one must be unique, normally id) and a
+    page continues strictly after the previous page's last row, so every page is one index
+    range scan however deep it is and rows inserted meanwhile neither repeat nor shift pages.
+    The cursor is the last row's order values, base64 JSON, opaque to clients. Only the
+    requested columns are selected and rows are returned as plain dicts, without building ORM
+    instances. Order columns must be written from Python: a server default such as now() is
+    stored in a different text form on SQLite and never compares equal to the cursor value.
+    """
+
+    def __init__(self, model, fields: Sequence[str], order: Sequence[str], descending: bool = False):
+        self.table = model.__table__
+        self.fields = tuple(f for f in fields if f in self.table.c)
+        self.order = tuple(self.table.c[name] for name in order)
+        defaulted = [c.key for c in self.order if c.server_default is not None]
+        if defaulted:
+            raise ValueError(f"Keyset order columns {defaulted} have a server default")
+        self.descending = descending
+
+    def columns(self, fields: Optional[str]) -> List[str]:
+        """Field names from a comma separated `fields` parameter; all fields when empty."""
+        if not fields:
+            return list(self.fields)
+        names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}, expected any of {', '.join(self.fields)}")
+        return names
+
+    def encode_cursor(self, row) -> str:
+        values = [getattr(row, c.key) for c in self.order]
+        values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(self.order):
+            raise ValueError("Invalid cursor")
+        try:
+            return [
+                datetime.fromisoformat(v) if isinstance(c.type, DateTime) and v is not None else v
+                for c, v in zip(self.order, values)
+            ]
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    def _after(self, values: List[Any]):
+        # (a, b) > (va, vb) spelled out, which every backend can match against an index; the
+        # redundant a >= va in front gives the planner a range to seek to instead of a full scan
+        clauses = []
+        for i, column in enumerate(self.order):
+            beyond = column < values[i] if self.descending else column > values[i]
+            clauses.append(and_(*[self.order[j] == values[j] for j in range(i)], beyond))
+        first = self.order[0]
+        return and_(first <= values[0] if self.descending else first >= values[0], or_(*clauses))
+
+    def query(self, filters: Sequence[Any], limit: int, cursor: Optional[str] = None, fields: Optional[str] = None):
+        """The SELECT for one page; fetches limit + 1 rows to tell whether another page follows."""
+        names = self.columns(fields)
+        selected = [self.table.c[name] for name in names]
+        selected += [c for c in self.order if c.key not in names]
+        query = select(*selected).where(*filters)
+        if cursor:
+            query = query.where(self._after(self.decode_cursor(cursor)))
+        return query.order_by(*[c.desc() if self.descending else c.asc() for c in self.order]).limit(limit + 1)
+
+    async def page(self, db: AsyncSession, filters: Sequence[Any], limit: int, cursor: Optional[str] = None,
+                   fields: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of rows matching filters, and the cursor for the next page (None on the last)."""
+        names = self.columns(fields)
+        rows = (await db.execute(self.query(filters, limit, cursor, fields))).all()
+        next_cursor = self.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return [{name: getattr(r, name) for name in names} for r in rows[:limit]], next_cursor
@@ -41,6 +41,39 @@ export const api = {
   delete: <T>(path: string) => request<T>(path, { method: 'DELETE' }),
 };
 
+// Push channel: a full snapshot on connect, then diffs. Reconnects after a drop.
+export type LiveMessage = {
+  type: 'snapshot' | 'diff' | 'ping';
+  version?: number;
+  trains?: Train[] | { changed: Train[]; removed: number[] };
+  sections?: Section[] | { changed: Section[]; removed: number[] };
+  kpis?: Partial<KPIs>;
+  decisions?: any[];
+  conflicts?: { added: any[]; resolved: any[] };
+};
+
+export function subscribeLive(onMessage: (msg: LiveMessage) => void): () => void {
+  const base = API_BASE.startsWith('http') ? API_BASE : `${window.location.origin}${API_BASE}`;
+  const url = `${base.replace(/^http/, 'ws')}/live/ws`;
+  let socket: WebSocket | null = null;
+  let closed = false;
+  let retry: ReturnType<typeof setTimeout> | undefined;
+
+  const connect = () => {
+    socket = new WebSocket(url);
+    socket.onmessage = (ev) => onMessage(JSON.parse(ev.data));
+    socket.onclose = () => {
+      if (!closed) retry = setTimeout(connect, 3000);
+    };
+  };
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    socket?.close();
+  };
+}
+
 export type Train = {
   id: number;
   train_number: string;
@@ -51,6 +84,8 @@ export type Train = {
   max_speed?: number;
   origin_station?: string;
   destination_station?: string;
+  current_section_id?: number | null;
+  current_position_km?: number | null;
 };
 
 export type Section = {
@@ -60,6 +95,8 @@ export type Section = {
   start_station: string;
   end_station: string;
   length_km: number;
+  current_occupancy?: number;
+  utilization_percentage?: number;
 };
 
 export type OptimizeResponse = {
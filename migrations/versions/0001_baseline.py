@@ -0,0 +1,183 @@
+"""baseline: tables as created by Base.metadata.create_all before migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 01:37:00.416174
+
+Databases that the application created with create_all already have some or all of these
+tables, so only the missing ones are created; `alembic upgrade head` works on any of them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timestamps():
+    return [
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    # Offline (--sql) scripts cannot inspect and assume an empty database
+    existing = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'sections' not in existing:
+        op.create_table('sections',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('section_code', sa.String(length=20), nullable=False),
+            sa.Column('section_name', sa.String(length=100), nullable=False),
+            sa.Column('section_type', sa.String(length=20), nullable=True),
+            sa.Column('start_station', sa.String(length=50), nullable=False),
+            sa.Column('end_station', sa.String(length=50), nullable=False),
+            sa.Column('length_km', sa.Float(), nullable=False),
+            sa.Column('max_speed_limit', sa.Integer(), nullable=True),
+            sa.Column('signal_spacing_km', sa.Float(), nullable=True),
+            sa.Column('has_automatic_signaling', sa.Boolean(), nullable=True),
+            sa.Column('max_trains_per_hour', sa.Integer(), nullable=True),
+            sa.Column('has_crossing_station', sa.Boolean(), nullable=True),
+            sa.Column('crossing_station_name', sa.String(length=50), nullable=True),
+            sa.Column('electrified', sa.Boolean(), nullable=True),
+            sa.Column('gauge_type', sa.String(length=20), nullable=True),
+            sa.Column('maintenance_windows', sa.JSON(), nullable=True),
+            sa.Column('weather_restrictions', sa.JSON(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('current_occupancy', sa.Integer(), nullable=True),
+            *_timestamps(),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_sections_id', 'sections', ['id'])
+        op.create_index('ix_sections_section_code', 'sections', ['section_code'], unique=True)
+
+    if 'users' not in existing:
+        op.create_table('users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=50), nullable=False),
+            sa.Column('full_name', sa.String(length=100), nullable=True),
+            sa.Column('hashed_password', sa.String(length=255), nullable=False),
+            sa.Column('role', sa.Enum('CONTROLLER', 'SUPERVISOR', 'ADMIN', name='userrole'), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            *_timestamps(),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    if 'audit_logs' not in existing:
+        op.create_table('audit_logs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('actor_user_id', sa.Integer(), nullable=True),
+            sa.Column('action', sa.String(length=100), nullable=False),
+            sa.Column('entity_type', sa.String(length=50), nullable=False),
+            sa.Column('entity_id', sa.String(length=50), nullable=True),
+            sa.Column('details', sa.JSON(), nullable=True),
+            sa.Column('ip_address', sa.String(length=45), nullable=True),
+            sa.Column('user_agent', sa.String(length=255), nullable=True),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(['actor_user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_audit_logs_id', 'audit_logs', ['id'])
+
+    if 'trains' not in existing:
+        op.create_table('trains',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('train_number', sa.String(length=10), nullable=False),
+            sa.Column('train_name', sa.String(length=100), nullable=False),
+            sa.Column('train_type', sa.Enum('PASSENGER', 'EXPRESS', 'SUPERFAST', 'FREIGHT', 'SPECIAL', name='traintype'), nullable=False),
+            sa.Column('status', sa.Enum('SCHEDULED', 'RUNNING', 'DELAYED', 'CANCELLED', 'COMPLETED', name='trainstatus'), nullable=True),
+            sa.Column('current_section_id', sa.Integer(), nullable=True),
+            sa.Column('current_position_km', sa.Float(), nullable=True),
+            sa.Column('scheduled_departure', sa.DateTime(), nullable=True),
+            sa.Column('actual_departure', sa.DateTime(), nullable=True),
+            sa.Column('scheduled_arrival', sa.DateTime(), nullable=True),
+            sa.Column('actual_arrival', sa.DateTime(), nullable=True),
+            sa.Column('priority', sa.Enum('LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='priority'), nullable=True),
+            sa.Column('max_speed', sa.Integer(), nullable=True),
+            sa.Column('length', sa.Float(), nullable=True),
+            sa.Column('weight', sa.Float(), nullable=True),
+            sa.Column('origin_station', sa.String(length=50), nullable=True),
+            sa.Column('destination_station', sa.String(length=50), nullable=True),
+            sa.Column('route_description', sa.Text(), nullable=True),
+            sa.Column('is_passenger_train', sa.Boolean(), nullable=True),
+            sa.Column('requires_platform', sa.Boolean(), nullable=True),
+            sa.Column('can_use_loop_line', sa.Boolean(), nullable=True),
+            *_timestamps(),
+            sa.ForeignKeyConstraint(['current_section_id'], ['sections.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_trains_id', 'trains', ['id'])
+        op.create_index('ix_trains_train_number', 'trains', ['train_number'], unique=True)
+
+    if 'decisions' not in existing:
+        op.create_table('decisions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('decision_type', sa.Enum('PRECEDENCE', 'CROSSING', 'HOLD', 'REROUTE', name='decisiontype'), nullable=False),
+            sa.Column('status', sa.Enum('RECOMMENDED', 'APPROVED', 'OVERRIDDEN', 'IMPLEMENTED', 'REJECTED', name='decisionstatus'), nullable=True),
+            sa.Column('train_id', sa.Integer(), nullable=True),
+            sa.Column('section_id', sa.Integer(), nullable=True),
+            sa.Column('details', sa.JSON(), nullable=True),
+            sa.Column('explanation', sa.Text(), nullable=True),
+            sa.Column('recommended_by', sa.String(length=50), nullable=True),
+            sa.Column('approved_by', sa.String(length=50), nullable=True),
+            *_timestamps(),
+            sa.ForeignKeyConstraint(['section_id'], ['sections.id']),
+            sa.ForeignKeyConstraint(['train_id'], ['trains.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_decisions_id', 'decisions', ['id'])
+
+    if 'schedules' not in existing:
+        op.create_table('schedules',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('train_id', sa.Integer(), nullable=False),
+            sa.Column('section_id', sa.Integer(), nullable=False),
+            sa.Column('planned_entry', sa.DateTime(), nullable=False),
+            sa.Column('planned_exit', sa.DateTime(), nullable=False),
+            sa.Column('actual_entry', sa.DateTime(), nullable=True),
+            sa.Column('actual_exit', sa.DateTime(), nullable=True),
+            sa.Column('platform', sa.String(length=10), nullable=True),
+            sa.Column('track', sa.String(length=10), nullable=True),
+            sa.Column('status', sa.Enum('PLANNED', 'RUNNING', 'COMPLETED', 'DELAYED', 'CANCELLED', name='schedulestatus'), nullable=True),
+            sa.Column('dwell_time_minutes', sa.Float(), nullable=True),
+            *_timestamps(),
+            sa.ForeignKeyConstraint(['section_id'], ['sections.id']),
+            sa.ForeignKeyConstraint(['train_id'], ['trains.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_schedules_id', 'schedules', ['id'])
+
+    if 'kpi_buckets' not in existing:
+        op.create_table('kpi_buckets',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('section_id', sa.Integer(), nullable=False),
+            sa.Column('resolution_seconds', sa.Integer(), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('completed', sa.Integer(), nullable=False),
+            sa.Column('on_time', sa.Integer(), nullable=False),
+            sa.Column('delayed', sa.Integer(), nullable=False),
+            sa.Column('delay_minutes_sum', sa.Float(), nullable=False),
+            *[sa.Column(f'delay_bin_{i}', sa.Integer(), nullable=False) for i in range(7)],
+            sa.ForeignKeyConstraint(['section_id'], ['sections.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('resolution_seconds', 'bucket_start', 'section_id', name='uq_kpi_bucket'),
+        )
+        op.create_index('ix_kpi_buckets_id', 'kpi_buckets', ['id'])
+        op.create_index('ix_kpi_buckets_section', 'kpi_buckets', ['section_id', 'resolution_seconds', 'bucket_start'])
+
+
+def downgrade() -> None:
+    for table in ('kpi_buckets', 'schedules', 'decisions', 'trains', 'audit_logs', 'users', 'sections'):
+        op.drop_table(table)
+    if op.get_bind().dialect.name == 'postgresql':
+        for enum_name in ('schedulestatus', 'decisionstatus', 'decisiontype', 'priority', 'trainstatus', 'traintype', 'userrole'):
+            op.execute(f'DROP TYPE IF EXISTS {enum_name}')
@@ -0,0 +1,52 @@
+"""composite indexes for list, KPI, timeline and archive queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 01:45:00.000000
+
+Each index leads with the filter column and ends with the order the query pages or scans
+in, so a filtered, sorted page is one index range. create_all builds the same indexes on a
+new database, so only the missing ones are created here (PostgreSQL 9.5 or later).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    # table, name, columns
+    ('trains', 'ix_trains_status', ['status', 'id']),
+    ('trains', 'ix_trains_type', ['train_type', 'id']),
+    ('trains', 'ix_trains_section', ['current_section_id', 'id']),
+    ('trains', 'ix_trains_departure', ['scheduled_departure', 'id']),
+    ('schedules', 'ix_schedules_planned_entry', ['planned_entry', 'id']),
+    ('schedules', 'ix_schedules_section_entry', ['section_id', 'planned_entry', 'id']),
+    ('schedules', 'ix_schedules_train_entry', ['train_id', 'planned_entry', 'id']),
+    ('schedules', 'ix_schedules_status_entry', ['status', 'planned_entry', 'id']),
+    ('schedules', 'ix_schedules_actual_exit', ['actual_exit']),
+    ('schedules', 'ix_schedules_archive_at', [sa.text('coalesce(actual_exit, planned_exit)')]),
+    ('decisions', 'ix_decisions_created', ['created_at', 'id']),
+    ('decisions', 'ix_decisions_section', ['section_id', 'id']),
+    ('decisions', 'ix_decisions_train', ['train_id', 'id']),
+    ('decisions', 'ix_decisions_status', ['status', 'id']),
+    ('audit_logs', 'ix_audit_logs_created', ['created_at']),
+]
+
+def upgrade() -> None:
+    # IF NOT EXISTS rather than inspecting: SQLite does not reflect expression indexes
+    for table, name, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+    # Fresh statistics so the planner knows how selective the new indexes are
+    op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    for table, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
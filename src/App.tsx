@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react'
-import { api, Train, Section, OptimizeResponse, KPIs, OROptimizeResult } from './api'
+import { api, subscribeLive, LiveMessage, Train, Section, OptimizeResponse, KPIs, OROptimizeResult } from './api'
 import {
   Avatar,
   Box,
@@ -91,6 +91,24 @@ export default function App() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [])
 
+  // Live updates: apply pushed diffs instead of re-fetching everything
+  useEffect(() => {
+    function merge<T extends { id: number }>(prev: T[], update: T[] | { changed: T[]; removed: number[] }): T[] {
+      if (Array.isArray(update)) return update
+      const changed = new Map(update.changed.map((x) => [x.id, x]))
+      const kept = prev
+        .filter((x) => !update.removed.includes(x.id))
+        .map((x) => (changed.has(x.id) ? { ...x, ...changed.get(x.id)! } : x))
+      const known = new Set(prev.map((x) => x.id))
+      return [...kept, ...update.changed.filter((x) => !known.has(x.id))]
+    }
+    return subscribeLive((msg: LiveMessage) => {
+      if (msg.trains) setTrains((prev) => merge(prev, msg.trains!))
+      if (msg.sections) setSections((prev) => merge(prev, msg.sections!))
+      if (msg.kpis && Object.keys(msg.kpis).length) setKpis((prev) => ({ ...(prev || {}), ...msg.kpis } as KPIs))
+    })
+  }, [])
+
   // Build demo schedule once
   useEffect(() => {
     setDemoSchedule(scheduleSingleJunction(scenario))
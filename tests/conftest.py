@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# The application reads its database URL at import, and any test module may be the first to
+# import it
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
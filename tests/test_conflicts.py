@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.monitoring.conflicts import ScheduleConflictIndex, _Row
+
+START = datetime(2025, 1, 1, 6, 0)
+
+
+def random_row(rng, schedule_id):
+    entry = START + timedelta(minutes=rng.randint(0, 240))
+    return _Row(schedule_id, rng.randint(1, 12), rng.randint(1, 3), rng.choice([None, "UP"]),
+                entry, entry + timedelta(minutes=rng.randint(3, 25)))
+
+
+def copy(row):
+    return _Row(row.schedule_id, row.train_id, row.section_id, row.track, row.entry, row.exit)
+
+
+def keyed(conflicts):
+    return {(c["kind"], *sorted(c["schedule_ids"])): c for c in conflicts}
+
+
+def assert_matches_rebuild(index):
+    rebuilt = ScheduleConflictIndex(headway_minutes=2.0)
+    rebuilt.load([copy(row) for row in index._rows.values()])
+    assert keyed(index.conflicts()) == keyed(rebuilt.conflicts())
+    assert index.stats() == rebuilt.stats()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_incremental_apply_matches_full_rebuild(seed):
+    rng = random.Random(seed)
+    index = ScheduleConflictIndex(headway_minutes=2.0)
+    index.load([random_row(rng, i) for i in range(1, 61)])
+    assert index.stats()["conflicts"] > 0
+    next_id = 61
+
+    for step in range(150):
+        before = keyed(index.conflicts())
+        changes = {}
+        for _ in range(rng.choice([1, 1, 1, 3])):
+            action = rng.choice(["insert", "move", "delete"])
+            existing = sorted(set(index._rows) - set(changes))
+            if action == "insert" or not existing:
+                changes[next_id] = random_row(rng, next_id)
+                next_id += 1
+            elif action == "move":
+                schedule_id = rng.choice(existing)
+                moved = random_row(rng, schedule_id)
+                moved.train_id = index._rows[schedule_id].train_id
+                changes[schedule_id] = moved
+            else:
+                changes[rng.choice(existing)] = None
+
+        added, resolved = index.apply(changes)
+        after = keyed(index.conflicts())
+        assert keyed(added) == {k: c for k, c in after.items() if before.get(k) != c}, step
+        assert keyed(resolved) == {k: c for k, c in before.items() if k not in after}, step
+        assert_matches_rebuild(index)
+
+
+def test_moving_a_row_away_resolves_its_conflicts():
+    index = ScheduleConflictIndex(headway_minutes=2.0)
+    first = _Row(1, 1, 1, None, START, START + timedelta(minutes=10))
+    second = _Row(2, 2, 1, None, START + timedelta(minutes=5), START + timedelta(minutes=15))
+    index.load([first, second])
+    assert [c["kind"] for c in index.conflicts()] == ["overlap"]
+
+    added, resolved = index.apply({2: _Row(2, 2, 1, None, START + timedelta(minutes=11), START + timedelta(minutes=20))})
+    assert [c["kind"] for c in added] == ["headway"]
+    assert [c["kind"] for c in resolved] == ["overlap"]
+
+    added, resolved = index.apply({2: None})
+    assert added == [] and [c["kind"] for c in resolved] == ["headway"]
+    assert index.conflicts() == []
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from app.services.optimization.local_search import LocalSearch
+
+
+def full_cost(order, release, travel, weights):
+    t, cost = 0.0, 0.0
+    for tid in order:
+        t = max(t, release[tid]) + travel[tid]
+        cost += weights[tid] * t
+    return cost
+
+
+def instance(seed, trains, released_share):
+    rng = random.Random(seed)
+    ids = list(range(1, trains + 1))
+    rng.shuffle(ids)
+    travel = {tid: rng.uniform(3, 15) for tid in ids}
+    weights = {tid: float(rng.randint(1, 4)) for tid in ids}
+    # Departures spread over roughly the busy time, so some trains wait and some queue
+    horizon = sum(travel.values())
+    release = {tid: rng.uniform(0, horizon) if rng.random() < released_share else 0.0 for tid in ids}
+    return ids, release, travel, weights
+
+
+@pytest.mark.parametrize("seed, trains, released_share", [(1, 12, 0.0), (2, 12, 1.0), (3, 30, 0.5), (4, 30, 1.0)])
+def test_delta_matches_full_recompute(seed, trains, released_share):
+    order, release, travel, weights = instance(seed, trains, released_share)
+    search = LocalSearch(order, release, travel, weights)
+    assert search.cost == pytest.approx(full_cost(order, release, travel, weights))
+
+    for move in search.moves():
+        a, segment = search._segment(move)
+        moved = search.order[:a] + segment + search.order[a + len(segment):]
+        expected = full_cost(moved, release, travel, weights) - search.cost
+        assert search.delta(move) == pytest.approx(expected, abs=1e-6), move
+
+
+def test_delta_stays_exact_after_applied_moves():
+    order, release, travel, weights = instance(5, 25, 0.7)
+    search = LocalSearch(order, release, travel, weights)
+    rng = random.Random(5)
+    moves = search.moves()
+    for _ in range(50):
+        move = rng.choice(moves)
+        before = search.cost
+        delta = search.delta(move)
+        search.apply(move)
+        assert sorted(search.order) == sorted(order)
+        assert search.cost == pytest.approx(full_cost(search.order, release, travel, weights))
+        assert search.cost - before == pytest.approx(delta, abs=1e-6)
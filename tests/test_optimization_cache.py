@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.train import Priority, TrainStatus, TrainType
+from app.services.monitoring.live_state import LiveNetworkState, SectionRecord, TrainRecord
+from app.services.optimization.cache import OptimizationCache
+from app.services.optimization.heuristic import HeuristicOptimizer
+
+FIRST_START = datetime(2025, 1, 1, 8, 0)
+
+
+@pytest.fixture
+def state():
+    state = LiveNetworkState()
+    section = SectionRecord(id=1, section_code="S1", section_name="S1", length_km=12.0, max_speed_limit=110)
+    trains = [
+        TrainRecord(id=i, train_number=f"T{i}", train_type=TrainType.EXPRESS, status=TrainStatus.SCHEDULED,
+                    priority=list(Priority)[i % len(Priority)], max_speed=60 + 20 * (i % 3),
+                    scheduled_departure=FIRST_START - timedelta(minutes=30 - 5 * i))
+        for i in range(1, 6)
+    ]
+    state.apply([("section", 1, section)] + [("train", t.id, t) for t in trains])
+    return state
+
+
+@pytest.fixture
+def cache(state):
+    cache = OptimizationCache(None, ttl_seconds=60, max_entries=10, lock_timeout_seconds=1.0)
+    state.subscribe(cache.on_live_change)
+    return cache
+
+
+def solve(snapshot, start_time):
+    trains, section = list(snapshot.trains.values()), snapshot.sections[1]
+    schedule = HeuristicOptimizer.build_schedule(trains, section, start_time)
+    return {"schedule": schedule, "metrics": HeuristicOptimizer.metrics_from_schedule(schedule)}
+
+
+def cached(cache, snapshot, start_time):
+    key, tags = cache.problem_key("heuristic", snapshot.trains.values(), snapshot.sections[1], start_time)
+    return cache.get_or_compute(key, tags, lambda: solve(snapshot, start_time), start_time)
+
+
+def test_hit_at_another_start_is_shifted_by_the_difference(state, cache):
+    snapshot = state.snapshot()
+    later = FIRST_START + timedelta(minutes=7, seconds=30)
+
+    first, served = cached(cache, snapshot, FIRST_START)
+    assert served == "miss"
+    second, served = cached(cache, snapshot, later)
+    assert served == "hit"
+
+    assert second == solve(snapshot, later)
+    for before, after in zip(first["schedule"], second["schedule"]):
+        for field in ("planned_entry", "planned_exit"):
+            shift = datetime.fromisoformat(after[field]) - datetime.fromisoformat(before[field])
+            assert shift == later - FIRST_START
+
+
+def test_live_state_change_invalidates_the_entry(state, cache):
+    snapshot = state.snapshot()
+    assert cached(cache, snapshot, FIRST_START)[1] == "miss"
+
+    # Position updates leave the solver inputs alone
+    state.update_position(2, 1, 3.5, TrainStatus.RUNNING)
+    assert cached(cache, snapshot, FIRST_START)[1] == "hit"
+
+    state.apply([("train", 2, state.snapshot().trains[2].replace(max_speed=130))])
+    assert cached(cache, snapshot, FIRST_START)[1] == "miss"
+    assert cache.stats()["invalidations"] == 1
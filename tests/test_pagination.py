@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.decision import Decision, DecisionType
+from app.models.section import Section
+
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for code in ("P1", "P2"):
+        db.add(Section(section_code=code, section_name=code, start_station="A", end_station="B", length_km=10))
+    # created_at comes from the server default, so many rows share one second
+    db.add_all(Decision(decision_type=DecisionType.HOLD, section_id=1 + i % 2) for i in range(25))
+    db.commit()
+    db.close()
+    return TestClient(app)
+
+
+def walk(client, **params):
+    ids, cursor = [], None
+    for _ in range(100):
+        response = client.get("/api/v1/decisions/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+    pytest.fail(f"Pages did not end, ids so far {ids[:20]}")
+
+
+@pytest.mark.parametrize("params", [{"limit": 1}, {"limit": 4, "fields": "id"}, {"limit": 3, "section_id": 2}])
+def test_decision_pages_list_every_row_once(client, params):
+    db = SessionLocal()
+    query = db.query(Decision.id)
+    if "section_id" in params:
+        query = query.filter(Decision.section_id == params["section_id"])
+    expected = sorted((r.id for r in query), reverse=True)
+    db.close()
+
+    assert walk(client, **params) == expected